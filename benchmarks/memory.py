@@ -0,0 +1,174 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Measures the peak resident set size per 10k sections of loading and
+preprocessing a synthetic package, for the `__dict__` based #Section model
+of pydoc-markdown 2.0 and for the slotted model with every `loader_context`
+mode. Every variant runs in a fresh process.
+
+    $ python benchmarks/memory.py --modules 20 --classes 25 --methods 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+
+try:
+  import tracemalloc
+  has_tracemalloc = True
+except ImportError:
+  has_tracemalloc = False  # Python 2
+
+#: The variants: the section model and the `loader_context` mode.
+VARIANTS = [('dict', 'keep'), ('slots', 'keep'), ('slots', 'weak'), ('slots', 'drop')]
+
+
+class DictSection(object):
+  """
+  The #pydocmd.document.Section of pydoc-markdown 2.0, without slots and
+  interned identifiers. The loader context is never released.
+  """
+
+  def __init__(self, doc, identifier=None, title=None, depth=1, content=None):
+    self.doc = doc
+    self.identifier = identifier
+    self.title = title
+    self.depth = depth
+    self.content = content if content is not None else '*Nothing to see here.*'
+
+  @property
+  def index(self):
+    return self.doc.index
+
+  def release_loader_context(self, mode='weak'):
+    pass
+
+
+def max_rss():
+  """
+  Returns the peak resident set size of the process in bytes.
+  """
+
+  import resource
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_variant(model, mode, modules, depth, trace_malloc=False):
+  import gc
+  import importlib
+  from pydocmd import document
+  from pydocmd.build import add_sections, generate_sections
+  from pydocmd.loader import PythonLoader
+  from pydocmd.preprocessor import Preprocessor
+
+  if model == 'dict':
+    document.Section = DictSection
+
+  config = {'sort': 'name', 'filter': ['docstring']}
+  for name in modules:
+    importlib.import_module(name)
+  baseline = max_rss()
+  if trace_malloc:
+    import tracemalloc
+    tracemalloc.start()
+
+  loader = PythonLoader(config)
+  index = document.Index()
+  for name in modules:
+    doc = index.new_document(name + '.md')
+    add_sections(index, doc, name + '+' * depth, loader, config)
+  sections = [s for doc in index.documents.values() for s in doc.sections]
+  generate_sections(sections, loader, Preprocessor(config), loader_context=mode)
+  peak = max_rss()
+  result = {'model': model, 'loader_context': mode, 'sections': len(sections),
+            'baseline_rss': baseline, 'peak_rss': peak,
+            'rss_per_10k_sections': (peak - baseline) * 10000.0 / len(sections)}
+  if trace_malloc:
+    gc.collect()
+    result['retained_per_10k_sections'] = \
+      tracemalloc.get_traced_memory()[0] * 10000.0 / len(sections)
+  return result
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  synthetic.add_arguments(parser)
+  parser.set_defaults(modules=20, classes=25, methods=20)
+  parser.add_argument('--depth', type=int, default=2)
+  parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+  parser.add_argument('--worker', nargs=2, metavar=('MODEL', 'MODE'), help=argparse.SUPPRESS)
+  parser.add_argument('--tracemalloc', action='store_true', help=argparse.SUPPRESS)
+  parser.add_argument('--path', help=argparse.SUPPRESS)
+  args = parser.parse_args(argv)
+
+  if args.worker:
+    sys.path.insert(0, args.path)
+    names = ['{}.mod{}'.format(args.name, i) for i in range(args.modules)]
+    print(json.dumps(run_variant(args.worker[0], args.worker[1], names, args.depth,
+                                 args.tracemalloc)))
+    return
+
+  tempdir = tempfile.mkdtemp()
+  try:
+    synthetic.generate_package(tempdir, **synthetic.package_options(args))
+    def worker(model, mode, *options):
+      command = [sys.executable, os.path.abspath(__file__), '--worker', model, mode,
+                 '--path', tempdir, '--depth', str(args.depth),
+                 '--name', args.name, '--modules', str(args.modules)]
+      output = subprocess.check_output(command + list(options))
+      return json.loads(output.decode('utf8').strip().split('\n')[-1])
+
+    # The memory retained by the build is measured in a separate process,
+    # as tracemalloc itself affects the peak RSS.
+    results = []
+    for model, mode in VARIANTS:
+      result = worker(model, mode)
+      if has_tracemalloc:
+        result['retained_per_10k_sections'] = \
+          worker(model, mode, '--tracemalloc')['retained_per_10k_sections']
+      results.append(result)
+  finally:
+    shutil.rmtree(tempdir)
+
+  print('{} sections, KiB per 10k sections:'.format(results[0]['sections']), file=sys.stderr)
+  print('  {:<14}{:>12}{:>12}'.format('variant', 'peak RSS', 'retained'), file=sys.stderr)
+  for result in results:
+    print('  {:<14}{:>12.1f}{:>12.1f}'.format(
+      result['model'] + '/' + result['loader_context'],
+      result['rss_per_10k_sections'] / 1024,
+      result.get('retained_per_10k_sections', float('nan')) / 1024), file=sys.stderr)
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
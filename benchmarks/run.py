@@ -0,0 +1,279 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Measures the time that pydoc-markdown spends in the phases of a build:
+
+* `import`: importing the documented modules (only measured once)
+* `index`: building the #Index with #pydocmd.build.add_sections()
+* `load`: #pydocmd.loader.PythonLoader.load_section()
+* `classify`: #pydocmd.docstyle.detect_style() for every docstring
+* `preprocess_markdown`: #pydocmd.preprocessor.Preprocessor
+* `preprocess_rest`: #pydocmd.restructuredtext.Preprocessor
+* `preprocess_chain`: both of them as a #pydocmd.preprocessor.PreprocessorChain
+* `render`: #pydocmd.document.Document.render()
+* `write`: writing the documents with #pydocmd.sync.write_file_if_changed()
+
+The corpus is either a synthetic package (see `synthetic.py`), a list of
+importable modules or a selection of the standard library. The results are
+printed as a table and can be saved as JSON to track regressions:
+
+    $ python benchmarks/run.py --modules 50 --classes 20 -o before.json
+    $ python benchmarks/run.py --modules 50 --classes 20 --compare before.json
+    $ python benchmarks/run.py --stdlib -o stdlib.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydocmd import __version__
+from pydocmd.build import add_sections
+from pydocmd.docstyle import detect_style
+from pydocmd.document import Index
+from pydocmd.loader import PythonLoader
+from pydocmd.preprocessor import Preprocessor as MarkdownPreprocessor
+from pydocmd.preprocessor import PreprocessorChain, preprocess_sections
+from pydocmd.restructuredtext import Preprocessor as RestructuredTextPreprocessor
+from pydocmd.sync import write_file_if_changed
+
+import synthetic
+
+try:
+  from time import perf_counter as clock
+except ImportError:
+  clock = time.time  # Python 2
+
+#: Modules of the standard library that are used with `--stdlib`. They are
+#: pure Python, have no side effects on import and don't overlap.
+STDLIB_CORPUS = [
+  'argparse', 'ast', 'calendar', 'collections', 'configparser', 'csv',
+  'datetime', 'decimal', 'difflib', 'email.message', 'email.parser',
+  'fractions', 'ftplib', 'gettext', 'http.client', 'http.server', 'imaplib',
+  'inspect', 'json.decoder', 'json.encoder', 'logging', 'logging.handlers',
+  'mailbox', 'optparse', 'pathlib', 'pickle', 'pydoc', 'shutil', 'smtplib',
+  'statistics', 'string', 'subprocess', 'tarfile', 'tempfile', 'textwrap',
+  'threading', 'tokenize', 'typing', 'unittest.case', 'unittest.loader',
+  'urllib.parse', 'urllib.request', 'uuid', 'xml.dom.minidom', 'zipfile',
+]
+
+#: The phases in the order that they are run in.
+PHASES = ('import', 'index', 'load', 'classify', 'preprocess_markdown', 'preprocess_rest',
+          'preprocess_chain', 'render', 'write')
+
+
+def timed(func, *args):
+  start = clock()
+  func(*args)
+  return clock() - start
+
+
+class Benchmark(object):
+  """
+  Runs the phases of a build for the *modules* and records the time spent
+  in every run of every phase.
+
+  # Arguments
+  modules (list of str): The names of the modules to document, one
+    document per module.
+  depth (int): The number of `+` to add to every module name.
+  repeat (int): How often every phase is run.
+  sort (str): The `sort` option, `name` or `line`.
+  """
+
+  def __init__(self, modules, depth=2, repeat=3, sort='name'):
+    self.modules = modules
+    self.depth = depth
+    self.repeat = repeat
+    self.config = {'sort': sort, 'filter': ['docstring']}
+    self.index = None
+    self.sections = []
+    self.contents = []
+    self.times = {}
+
+  def record(self, phase, func, *args):
+    self.times.setdefault(phase, []).append(timed(func, *args))
+
+  def import_modules(self):
+    for name in list(self.modules):
+      try:
+        importlib.import_module(name)
+      except Exception as exc:
+        print('warning: skipping {}: {}'.format(name, exc), file=sys.stderr)
+        self.modules.remove(name)
+
+  def build_index(self):
+    loader = PythonLoader(self.config)
+    self.index = Index()
+    for name in self.modules:
+      doc = self.index.new_document(name + '.md')
+      add_sections(self.index, doc, name + '+' * self.depth, loader, self.config)
+    self.sections = [s for doc in self.index.documents.values() for s in doc.sections]
+
+  def load(self):
+    loader = PythonLoader(self.config)
+    for section in self.sections:
+      loader.load_section(section)
+    self.contents = [(s.title, s.content) for s in self.sections]
+
+  def classify(self):
+    self.styles = {}
+    for section in self.sections:
+      style = detect_style(section.content)
+      self.styles[style] = self.styles.get(style, 0) + 1
+
+  def reset_contents(self):
+    for section, (title, content) in zip(self.sections, self.contents):
+      section.title = title
+      section.content = content
+
+  def preprocess(self, preprocessor):
+    preprocess_sections(preprocessor, self.sections)
+
+  def render(self):
+    for doc in self.index.documents.values():
+      doc.render_to_string()
+
+  def write(self, directory):
+    for fname, doc in self.index.documents.items():
+      write_file_if_changed(os.path.join(directory, fname), doc.render_to_string())
+
+  def run(self):
+    """
+    Runs all phases and returns the recorded times (in seconds).
+    """
+
+    self.record('import', self.import_modules)
+    for _ in range(self.repeat):
+      self.record('index', self.build_index)
+    for _ in range(self.repeat):
+      self.record('load', self.load)
+    for _ in range(self.repeat):
+      self.record('classify', self.classify)
+    for phase, preprocessor in [
+        ('preprocess_markdown', MarkdownPreprocessor(self.config)),
+        ('preprocess_rest', RestructuredTextPreprocessor(self.config)),
+        ('preprocess_chain', PreprocessorChain([
+          RestructuredTextPreprocessor(self.config), MarkdownPreprocessor(self.config)]))]:
+      for _ in range(self.repeat):
+        self.reset_contents()
+        self.record(phase, self.preprocess, preprocessor)
+    for _ in range(self.repeat):
+      self.record('render', self.render)
+    for _ in range(self.repeat):
+      directory = tempfile.mkdtemp()
+      try:
+        self.record('write', self.write, directory)
+      finally:
+        shutil.rmtree(directory)
+    return self.times
+
+
+def summarize(times):
+  runs = sorted(times)
+  return {'min': runs[0], 'median': runs[len(runs) // 2], 'runs': times}
+
+
+def print_table(result, baseline=None, stream=sys.stderr):
+  print('{} sections in {} documents'.format(
+    result['sections'], result['documents']), file=stream)
+  print('  styles: ' + ', '.join('{} {}'.format(n, style) for style, n in
+                                 sorted(result['styles'].items())), file=stream)
+  for phase in PHASES:
+    value = result['phases'][phase]['min']
+    line = '  {:<22}{:>10.4f}s'.format(phase, value)
+    if baseline and phase in baseline['phases']:
+      old = baseline['phases'][phase]['min']
+      line += '  {:>10.4f}s  {:>6.2f}x'.format(old, value / old if old else float('inf'))
+    print(line, file=stream)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmarks the phases of a pydoc-markdown build.')
+  corpus = parser.add_mutually_exclusive_group()
+  corpus.add_argument('--stdlib', action='store_true', help='document a selection of the standard library')
+  corpus.add_argument('--module', dest='real_modules', action='append', metavar='NAME',
+                      help='document an importable module (can be repeated)')
+  synthetic.add_arguments(parser)
+  parser.add_argument('--depth', type=int, default=2, help='number of `+` per module (default: %(default)s)')
+  parser.add_argument('--repeat', type=int, default=3, help='runs per phase (default: %(default)s)')
+  parser.add_argument('--sort', choices=['name', 'line'], default='name',
+                      help='the sort option of the build (default: %(default)s)')
+  parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+  parser.add_argument('--compare', metavar='FILE', help='compare with the results in FILE')
+  args = parser.parse_args(argv)
+
+  tempdir = None
+  if args.stdlib:
+    modules = list(STDLIB_CORPUS)
+    corpus_info = {'kind': 'stdlib', 'modules': modules}
+  elif args.real_modules:
+    modules = list(args.real_modules)
+    corpus_info = {'kind': 'modules', 'modules': modules}
+  else:
+    tempdir = tempfile.mkdtemp()
+    options = synthetic.package_options(args)
+    modules = synthetic.generate_package(tempdir, **options)
+    sys.path.insert(0, tempdir)
+    corpus_info = dict(options, kind='synthetic')
+
+  try:
+    benchmark = Benchmark(modules, args.depth, args.repeat, args.sort)
+    times = benchmark.run()
+  finally:
+    if tempdir:
+      shutil.rmtree(tempdir)
+
+  result = {
+    'pydocmd_version': __version__,
+    'python': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'platform': platform.platform(),
+    'timestamp': time.time(),
+    'corpus': corpus_info,
+    'depth': args.depth,
+    'repeat': args.repeat,
+    'documents': len(benchmark.index.documents),
+    'sections': len(benchmark.sections),
+    'styles': benchmark.styles,
+    'phases': {phase: summarize(times[phase]) for phase in PHASES},
+  }
+
+  baseline = None
+  if args.compare:
+    with open(args.compare) as fp:
+      baseline = json.load(fp)
+  print_table(result, baseline)
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(result, fp, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
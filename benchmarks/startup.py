@@ -0,0 +1,134 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Measures the wall time of `pydocmd simple` on a tiny module, in fresh
+processes, minus the startup time of the bare interpreter. Fails if it
+exceeds the budget or if the command imports modules that it does not need.
+
+    $ python benchmarks/startup.py --repeat 20 --budget 0.3
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#: Modules that `pydocmd simple` must not import. (shutil is imported by
+#: argparse.)
+UNNEEDED_MODULES = ['yaml', 'subprocess', 'multiprocessing',
+                    'sqlite3', 'ctypes', 'concurrent.futures', 'mkdocs']
+
+TINY_MODULE = '''
+"""
+A tiny module.
+"""
+
+def function(a, b=None):
+  """
+  Does nothing with *a* and *b*.
+  """
+
+class Class(object):
+  """
+  A class.
+  """
+
+  def method(self):
+    """
+    A method.
+    """
+'''
+
+
+def run_command(command, cwd):
+  """
+  Runs *command* and returns its wall time and its stderr.
+  """
+
+  env = dict(os.environ, PYTHONPATH=ROOT)
+  start = time.time()
+  proc = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE)
+  stderr = proc.communicate()[1]
+  elapsed = time.time() - start
+  if proc.returncode != 0:
+    raise RuntimeError('{} failed:\n{}'.format(' '.join(command), stderr.decode('utf8')))
+  return elapsed, stderr.decode('utf8')
+
+
+def imported_modules(command, cwd):
+  """
+  Returns the names of the modules that *command* imports, or #None if the
+  interpreter can not report them (before Python 3.7).
+  """
+
+  if sys.version_info < (3, 7):
+    return None
+  stderr = run_command([command[0], '-X', 'importtime'] + command[1:], cwd)[1]
+  return set(line.split('|')[-1].strip() for line in stderr.splitlines()
+             if line.startswith('import time:'))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--repeat', type=int, default=10, help='runs (default: %(default)s)')
+  parser.add_argument('--budget', type=float, default=0.5,
+                      help='maximum median time in seconds (default: %(default)s)')
+  parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+  args = parser.parse_args(argv)
+
+  tempdir = tempfile.mkdtemp()
+  try:
+    with open(os.path.join(tempdir, 'tinymod.py'), 'w') as fp:
+      fp.write(TINY_MODULE)
+    command = [sys.executable, '-m', 'pydocmd', 'simple', 'tinymod++']
+    baseline = sorted(run_command([sys.executable, '-c', 'pass'], tempdir)[0]
+                      for i in range(args.repeat))
+    times = sorted(run_command(command, tempdir)[0] for i in range(args.repeat))
+    modules = imported_modules(command, tempdir)
+  finally:
+    shutil.rmtree(tempdir)
+
+  median = times[len(times) // 2] - baseline[len(baseline) // 2]
+  unneeded = sorted(x for x in UNNEEDED_MODULES if modules and x in modules)
+  result = {'runs': times, 'interpreter_runs': baseline, 'median': median,
+            'budget': args.budget, 'unneeded_modules': unneeded}
+  print('pydocmd simple: {:.4f}s median over the interpreter startup (budget {:.4f}s)'
+        .format(median, args.budget), file=sys.stderr)
+  if unneeded:
+    print('  unneeded modules imported: {}'.format(', '.join(unneeded)), file=sys.stderr)
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(result, fp, indent=2, sort_keys=True)
+  if median > args.budget or unneeded:
+    sys.exit(1)
+  return result
+
+
+if __name__ == '__main__':
+  main()
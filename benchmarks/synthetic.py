@@ -0,0 +1,221 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Generates synthetic Python packages of configurable size to benchmark
+pydoc-markdown with. Every package consists of a number of modules that
+each contain classes with methods, properties and module-level functions,
+documented in the Markdown style of pydoc-markdown, reStructuredText, the
+Google or the NumPy style, or a mix of them.
+
+    $ python benchmarks/synthetic.py /tmp/bench --modules 50 --classes 20
+
+The generated code is deterministic for a given set of parameters.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+
+#: The supported docstring styles.
+STYLES = ('markdown', 'rest', 'google', 'numpy', 'mixed')
+
+_WORDS = ('the', 'value', 'object', 'returns', 'a', 'of', 'for', 'is', 'to',
+          'instance', 'list', 'with', 'and', 'data', 'by', 'index', 'name',
+          'this', 'result', 'when', 'string', 'number', 'section', 'file')
+
+
+def _sentence(rng, min_words=4, max_words=12):
+  words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+  return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng, lines):
+  return [_sentence(rng) for _ in range(lines)]
+
+
+def make_docstring(rng, style, lines, args=(), returns=True, refs=()):
+  """
+  Returns the lines of a docstring in the specified *style* with *lines*
+  lines of prose, an argument list for *args* and cross-references to
+  the names in *refs*.
+  """
+
+  result = _paragraph(rng, lines)
+  if refs:
+    result.append('See also ' + ', '.join('#' + ref for ref in refs) + '.')
+  if style == 'markdown':
+    if args:
+      result += ['', '# Arguments']
+      result += ['{} (int): {}'.format(arg, _sentence(rng)) for arg in args]
+    if returns:
+      result += ['', '# Returns', 'int: ' + _sentence(rng)]
+  elif style == 'google':
+    if args:
+      result += ['', 'Args:']
+      result += ['  {} (int): {}'.format(arg, _sentence(rng)) for arg in args]
+    if returns:
+      result += ['', 'Returns:', '  int: ' + _sentence(rng)]
+  elif style == 'numpy':
+    if args:
+      result += ['', 'Parameters', '----------']
+      for arg in args:
+        result += ['{} : int'.format(arg), '    ' + _sentence(rng)]
+    if returns:
+      result += ['', 'Returns', '-------', 'int', '    ' + _sentence(rng)]
+  else:
+    if args or returns:
+      result.append('')
+    for arg in args:
+      result.append(':param {}: {}'.format(arg, _sentence(rng)))
+      result.append(':type {}: int'.format(arg))
+    if returns:
+      result.append(':return: ' + _sentence(rng))
+      result.append(':rtype: int')
+  return result
+
+
+def _format_docstring(lines, indent):
+  prefix = ' ' * indent
+  body = '\n'.join((prefix + line) if line else '' for line in lines)
+  return '{0}"""\n{1}\n{0}"""\n'.format(prefix, body)
+
+
+def make_module(rng, name, classes, methods, functions, docstring_lines, style):
+  """
+  Returns the source code of a module with *classes* classes that have
+  *methods* methods each, and *functions* module-level functions.
+  """
+
+  def pick_style():
+    if style == 'mixed':
+      return rng.choice(STYLES[:-1])
+    return style
+
+  parts = [_format_docstring(make_docstring(
+    rng, pick_style(), docstring_lines, returns=False), 0), '\n\n']
+  for i in range(functions):
+    args = ['arg{}'.format(j) for j in range(rng.randint(0, 3))]
+    parts.append('def function_{}({}):\n'.format(i, ', '.join(args)))
+    parts.append(_format_docstring(make_docstring(
+      rng, pick_style(), docstring_lines, args, refs=['Class0']), 2))
+    parts.append('  return 0\n\n\n')
+  for i in range(classes):
+    parts.append('class Class{}(object):\n'.format(i))
+    parts.append(_format_docstring(make_docstring(
+      rng, pick_style(), docstring_lines, returns=False,
+      refs=['Class{}.method_0()'.format(i), '::{}.function_0'.format(name)]), 2))
+    parts.append('\n  def __init__(self, value=None):\n    self.value = value\n\n')
+    parts.append('  @property\n  def value_property(self):\n')
+    parts.append(_format_docstring(['The value of the instance.'], 4))
+    parts.append('    return self.value\n\n')
+    for j in range(methods):
+      args = ['self'] + ['arg{}'.format(k) for k in range(rng.randint(0, 3))]
+      parts.append('  def method_{}({}):\n'.format(j, ', '.join(args)))
+      parts.append(_format_docstring(make_docstring(
+        rng, pick_style(), docstring_lines, args[1:], refs=['value_property']), 4))
+      parts.append('    return 0\n\n')
+    parts.append('\n')
+  return ''.join(parts)
+
+
+def generate_package(directory, name='synthpkg', modules=10, classes=10,
+                     methods=10, functions=5, docstring_lines=3,
+                     style='markdown', seed=0):
+  """
+  Writes a synthetic package to *directory*.
+
+  # Arguments
+  directory (str): The directory to create the package in. It must be
+    added to #sys.path to import the package.
+  name (str): The name of the package.
+  modules (int): The number of modules in the package.
+  classes (int): The number of classes per module.
+  methods (int): The number of methods per class.
+  functions (int): The number of module-level functions per module.
+  docstring_lines (int): The number of lines of prose in every docstring.
+  style (str): One of #STYLES.
+  seed (int): The seed for the random contents of the docstrings.
+
+  # Returns
+  list of str: The names of the generated modules.
+
+  # Raises
+  ValueError: If *style* is invalid.
+  """
+
+  if style not in STYLES:
+    raise ValueError('invalid docstring style: {!r}'.format(style))
+  rng = random.Random(seed)
+  package_dir = os.path.join(directory, name)
+  if not os.path.isdir(package_dir):
+    os.makedirs(package_dir)
+  with open(os.path.join(package_dir, '__init__.py'), 'w') as fp:
+    fp.write('"""\nThe synthetic {} package.\n"""\n'.format(name))
+  names = []
+  for i in range(modules):
+    module_name = '{}.mod{}'.format(name, i)
+    source = make_module(rng, module_name, classes, methods, functions,
+                         docstring_lines, style)
+    with open(os.path.join(package_dir, 'mod{}.py'.format(i)), 'w') as fp:
+      fp.write(source)
+    names.append(module_name)
+  return names
+
+
+def add_arguments(parser):
+  """
+  Adds the arguments of #generate_package() to an #argparse.ArgumentParser.
+  """
+
+  parser.add_argument('--name', default='synthpkg', help='package name (default: %(default)s)')
+  parser.add_argument('--modules', type=int, default=10, help='number of modules (default: %(default)s)')
+  parser.add_argument('--classes', type=int, default=10, help='classes per module (default: %(default)s)')
+  parser.add_argument('--methods', type=int, default=10, help='methods per class (default: %(default)s)')
+  parser.add_argument('--functions', type=int, default=5, help='functions per module (default: %(default)s)')
+  parser.add_argument('--docstring-lines', type=int, default=3, help='lines of prose per docstring (default: %(default)s)')
+  parser.add_argument('--style', choices=STYLES, default='markdown', help='docstring style (default: %(default)s)')
+  parser.add_argument('--seed', type=int, default=0)
+
+
+def package_options(args):
+  """
+  Returns the keyword arguments for #generate_package() from the parsed
+  arguments of #add_arguments().
+  """
+
+  return dict(name=args.name, modules=args.modules, classes=args.classes,
+              methods=args.methods, functions=args.functions,
+              docstring_lines=args.docstring_lines, style=args.style,
+              seed=args.seed)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('directory')
+  add_arguments(parser)
+  args = parser.parse_args(argv)
+  names = generate_package(args.directory, **package_options(args))
+  print('Generated {} modules in {}'.format(len(names), args.directory))
+
+
+if __name__ == '__main__':
+  main()
@@ -19,22 +19,28 @@
 # THE SOFTWARE.
 
 from __future__ import print_function
-from .document import Index
-from .imp import import_object, dir_object
+from .build import (add_placeholder_sections, add_sections, generate_sections,
+                    iter_pages, splice_document, DocumentWriter,
+                    MarkdownStream, Selection, INDEX_LAYOUT_FILE)
+from .document import Index, LOADER_CONTEXT_MODES
+from .imp import import_object, ModuleEvictor
+from .importhooks import install_stubs, profiler
+from .preprocessor import load_preprocessor
+from .trace import Progress, print_timings, span, tracer
 from argparse import ArgumentParser
 
 import atexit
 import os
-import shutil
-import signal
-import subprocess
 import sys
-import yaml
+
+# The modules that only some commands need (yaml, mkdocs, the cache, worker
+# processes, file syncing and watching) are imported where they are used, so
+# that frequent `pydocmd simple` calls start up quickly.
 
 PYDOCMD_CONFIG = 'pydocmd.yml'
 parser = ArgumentParser()
-parser.add_argument('command', choices=['generate', 'build', 'gh-deploy',
-                                        'json', 'new', 'serve', 'simple'])
+parser.add_argument('command', choices=['generate', 'build', 'daemon', 'gh-deploy',
+                                        'json', 'new', 'query', 'serve', 'simple'])
 parser.add_argument('subargs', nargs='...')
 
 
@@ -43,8 +49,12 @@ def read_config():
   Reads and preprocesses the pydoc-markdown configuration file.
   """
 
+  import yaml
+  # The same (full) loader as before, so that MkDocs-style tags such as
+  # `!!python/name:` keep working, but the libyaml version if available.
+  loader = getattr(yaml, 'CLoader', yaml.Loader)
   with open(PYDOCMD_CONFIG) as fp:
-    config = yaml.load(fp)
+    config = yaml.load(fp, Loader=loader)
   return default_config(config)
 
 
@@ -56,20 +66,50 @@ def default_config(config):
   config.setdefault('loader', 'pydocmd.loader.PythonLoader')
   config.setdefault('preprocessor', 'pydocmd.preprocessor.Preprocessor')
   config.setdefault('additional_search_paths', [])
+  config.setdefault('cache_file', None)
+  config.setdefault('copy_mode', 'copy')
+  config.setdefault('copy_jobs', 8)
+  config.setdefault('prune_gens_dir', False)
+  config.setdefault('jobs', 1)
+  config.setdefault('loader_context', 'drop')
+  config.setdefault('pipeline', False)
+  config.setdefault('evict_modules', False)
+  config.setdefault('mock_modules', [])
+  config.setdefault('output', None)
+  config.setdefault('preprocess_memo', 0)
   return config
 
 
+def config_flag(config, key):
+  """
+  Returns the boolean value of the configuration key *key*, which may also
+  be a string if it has been set with the `-c` option.
+  """
+
+  value = config.get(key)
+  if isinstance(value, str):
+    return value.lower() in ('1', 'true', 'yes', 'on')
+  return bool(value)
+
+
 def write_temp_mkdocs_config(inconf):
   """
   Generates a configuration for MkDocs on-the-fly from the pydoc-markdown
   configuration and makes sure it gets removed when this program exists.
   """
 
-  config = {key: inconf[key] for key in ('site_name', 'site_dir', 'theme')}
-  config['docs_dir'] = inconf['gens_dir']
-  for key in ('markdown_extensions', 'pages', 'repo_url'):
-    if key in inconf:
-      config[key] = inconf[key]
+  import yaml
+  try:
+    # MkDocs 1.0 and newer, which renamed `pages` to `nav`.
+    from .mkdocs_site import mkdocs_config
+  except ImportError:
+    config = {key: inconf[key] for key in ('site_name', 'site_dir', 'theme')}
+    config['docs_dir'] = inconf['gens_dir']
+    for key in ('markdown_extensions', 'pages', 'repo_url'):
+      if key in inconf:
+        config[key] = inconf[key]
+  else:
+    config = mkdocs_config(inconf)
 
   with open('mkdocs.yml', 'w') as fp:
     yaml.dump(config, fp)
@@ -77,36 +117,28 @@ def write_temp_mkdocs_config(inconf):
   atexit.register(lambda: os.remove('mkdocs.yml'))
 
 
-def makedirs(path):
-  """
-  Create the directory *path* if it does not already exist.
-  """
-
-  if not os.path.isdir(path):
-    os.makedirs(path)
-
-
-def copy_source_files(config):
+def source_file_pairs(config):
   """
-  Copies all files from the `docs_dir` to the `gens_dir` defined in the
-  *config*. It also takes the MkDocs `pages` configuration into account
-  and converts the special `<< INFILE` syntax by copying them to the
-  `gens_dir` as well.
+  Returns the `(src, dst)` pairs of the files from the `docs_dir` that
+  belong in the `gens_dir`, with *dst* relative to the `gens_dir`. It also
+  takes the MkDocs `pages` configuration into account and converts the
+  special `<< INFILE` syntax, whose files belong in the `gens_dir` as well.
   """
 
   for path in config['additional_search_paths']:
     path = os.path.abspath(path)
-    sys.path.append(path)
+    if path not in sys.path:
+      sys.path.append(path)
 
-  # Copy all template files from the source directory into our
-  # generated files directory.
+  # Collect all template files from the source directory that we need
+  # in our generated files directory.
   log('Started copying source files...')
+  pairs = []
   for root, dirs, files in os.walk(config['docs_dir']):
     rel_root = os.path.relpath(root, config['docs_dir'])
     for fname in files:
-      dest_fname = os.path.join(config['gens_dir'], rel_root, fname)
-      makedirs(os.path.dirname(dest_fname))
-      shutil.copyfile(os.path.join(root, fname), dest_fname)
+      rel_path = os.path.normpath(os.path.join(rel_root, fname))
+      pairs.append((os.path.join(root, fname), rel_path))
 
   # Also process all pages to copy files outside of the docs_dir
   # to the gens_dir.
@@ -116,9 +148,7 @@ def copy_source_files(config):
       if isinstance(filename, str) and '<<' in filename:
         filename, source = filename.split('<<')
         filename, source = filename.rstrip(), source.lstrip()
-        outfile = os.path.join(config['gens_dir'], filename)
-        makedirs(os.path.dirname(outfile))
-        shutil.copyfile(source, outfile)
+        pairs.append((source, os.path.normpath(filename)))
         data[key] = filename
       elif isinstance(filename, dict):
         process_pages(filename)
@@ -126,6 +156,29 @@ def copy_source_files(config):
         [process_pages(x) for x in filename]
   for page in config['pages']:
     process_pages(page)
+  return pairs
+
+
+def copy_source_files(config):
+  """
+  Copies the #source_file_pairs() to the `gens_dir` defined in the *config*.
+
+  Only files that changed since the last build are copied. The `copy_mode`
+  option can be set to `hardlink` or `symlink` to link the files instead,
+  and `copy_jobs` controls how many threads copy files in parallel.
+
+  # Returns
+  set of str: The paths of the files in the `gens_dir`, relative to it.
+  """
+
+  from .sync import sync_files
+
+  pairs = source_file_pairs(config)
+  updated = sync_files(
+    [(src, os.path.join(config['gens_dir'], dst)) for src, dst in pairs],
+    config['copy_mode'], int(config['copy_jobs']))
+  log('Updated {} of {} source files.'.format(updated, len(pairs)))
+  return set(dst for src, dst in pairs)
 
 
 def new_project():
@@ -138,18 +191,157 @@ def log(*args, **kwargs):
   print(*args, **kwargs)
 
 
-def main():
-  args = parser.parse_args()
+def finish_trace(trace_file, timings):
+  """
+  Saves the trace to *trace_file* and prints the *timings* slowest sections
+  and modules, if specified.
+  """
+
+  if timings:
+    print_timings(timings)
+  if trace_file:
+    tracer.save(trace_file)
+    log('Saved trace to {}'.format(trace_file))
+
+
+def run_daemon(subargs):
+  """
+  Implements `pydocmd daemon [--socket PATH] [--stop | --status]`.
+  """
+
+  from .client import default_socket_path, ping, stop
+
+  path = None
+  action = 'serve'
+  it = iter(subargs)
+  for value in it:
+    if value == '--socket':
+      try: path = next(it)
+      except StopIteration: parser.error('missing value to option --socket')
+    elif value.startswith('--socket='):
+      path = value[9:]
+    elif value in ('--stop', '--status'):
+      action = value[2:]
+    else:
+      parser.error('unknown option {}'.format(value))
+  if path is None:
+    try:
+      path = default_socket_path()
+    except RuntimeError as exc:
+      parser.error(str(exc))
+
+  if action == 'stop':
+    if not stop(path):
+      log('No daemon is listening on {}'.format(path))
+      return 1
+    return 0
+  if action == 'status':
+    status = ping(path)
+    if status is None:
+      log('No daemon is listening on {}'.format(path))
+      return 1
+    log('Daemon on {} for {}: {} requests, {} modules reloaded.'.format(
+      path, status['cwd'], status['requests'], status['reloaded']))
+    return 0
+
+  from .daemon import Daemon
+  try:
+    Daemon(path, main, log).serve()
+  except RuntimeError as exc:
+    parser.error(str(exc))
+  return 0
+
+
+def main(argv=None, session=None):
+  """
+  Runs the command-line interface with the arguments *argv* (defaults to
+  #sys.argv). The daemon passes its #pydocmd.daemon.Session as *session*,
+  which provides the loader and the cache of the build.
+  """
+
+  args = parser.parse_args(argv)
   if args.command == 'new':
     new_project()
     return
+  if args.command == 'daemon':
+    return run_daemon(args.subargs)
+
+  # Send the command to the daemon with --daemon, query always does.
+  if session is None:
+    socket_path = None
+    subargs = []
+    for value in args.subargs:
+      if value == '--daemon' or value.startswith('--daemon='):
+        socket_path = value[9:] or True
+      else:
+        subargs.append(value)
+    if socket_path or args.command == 'query':
+      from .client import default_socket_path, request, NoDaemonError
+      try:
+        if socket_path is True or socket_path is None:
+          socket_path = default_socket_path()
+        return request(socket_path, [args.command] + subargs)
+      except (NoDaemonError, RuntimeError) as exc:
+        parser.error(str(exc))
+  elif args.command not in ('generate', 'simple', 'json', 'query'):
+    parser.error('the daemon only runs generate, simple, json and query')
+  # query runs like json on the named objects, in the daemon.
+  if args.command == 'query':
+    args.command = 'json'
+    if not args.subargs:
+      parser.error('need at least one argument')
+
+  # Tracing options, available for all commands.
+  trace_file = None
+  timings = 0
+  imports = 0
+  subargs = []
+  it = iter(args.subargs)
+  for value in it:
+    if value == '--trace':
+      try: trace_file = next(it)
+      except StopIteration: parser.error('missing value to option --trace')
+    elif value.startswith('--trace='):
+      trace_file = value[8:]
+    elif value == '--timings':
+      timings = 10
+    elif value.startswith('--timings='):
+      try: timings = int(value[10:])
+      except ValueError: parser.error('invalid option value: {!r}'.format(value))
+    elif value == '--imports':
+      imports = 10
+    elif value.startswith('--imports='):
+      try: imports = int(value[10:])
+      except ValueError: parser.error('invalid option value: {!r}'.format(value))
+    else:
+      subargs.append(value)
+  args.subargs = subargs
+  if session and (trace_file or timings or imports):
+    parser.error('--trace, --timings and --imports are not supported by the daemon')
+  if trace_file or timings:
+    tracer.enable()
+    atexit.register(finish_trace, trace_file, timings)
+  if imports:
+    profiler.enable()
+    atexit.register(profiler.report, imports)
+
   if args.command == 'simple' and not args.subargs:
     parser.error('need at least one argument')
 
-  config = read_config() if args.command != 'simple' else default_config({})
+  # The json command works without a configuration file, like simple.
+  with span('build', 'config'):
+    if args.command == 'simple' or (args.command == 'json' and
+                                    not os.path.isfile(PYDOCMD_CONFIG)):
+      config = default_config({})
+    else:
+      config = read_config()
 
   # Parse options.
-  if args.command in ('generate', 'simple'):
+  watch = False
+  output = None
+  only = []
+  select = []
+  if args.command in ('generate', 'simple', 'json'):
     modspecs = []
     it = iter(args.subargs)
     while True:
@@ -162,20 +354,83 @@ def main():
         if value.startswith('['):
           if not value.endswith(']'):
             parser.error('invalid option value: {!r}'.format(value))
-            value = value[1:-1].split(',')
+          value = value[1:-1].split(',')
         config[key] = value
+      elif value in ('-j', '--jobs') or value.startswith(('-j', '--jobs=')):
+        if value in ('-j', '--jobs'):
+          try: value = next(it)
+          except StopIteration: parser.error('missing value to option -j')
+        else:
+          value = value[2:] if value.startswith('-j') else value[7:]
+        config['jobs'] = value
+      elif value == '--watch' and args.command == 'generate' and not session:
+        watch = True
+      elif value == '--pipeline' and args.command == 'generate':
+        config['pipeline'] = True
+      elif value in ('--only', '--select') or value.startswith(('--only=', '--select=')):
+        name, value = value.partition('=')[::2]
+        if not value:
+          try: value = next(it)
+          except StopIteration: parser.error('missing value to option {}'.format(name))
+        if name == '--only' and args.command != 'simple':
+          only.append(value)
+        elif name == '--select':
+          select.append(value)
+        else:
+          parser.error('unknown option --only')
+      elif value in ('-o', '--output') and args.command in ('generate', 'json'):
+        try: output = next(it)
+        except StopIteration: parser.error('missing value to option -o')
       else:
         modspecs.append(value)
     args.subargs = modspecs
 
-  loader = import_object(config['loader'])(config)
-  preproc = import_object(config['preprocessor'])(config)
+  if config['loader_context'] not in LOADER_CONTEXT_MODES:
+    parser.error('invalid loader_context: {!r}'.format(config['loader_context']))
 
-  if args.command != 'simple':
-    copy_source_files(config)
+  if session:
+    loader = session.loader(config)
+  else:
+    loader = import_object(config['loader'])(config)
+  preproc = load_preprocessor(config)
+
+  # Selective builds (--only, --select) only write the selected documents
+  # and leave everything else in the gens_dir untouched.
+  selective = bool(only or select)
+  select = Selection(select) if select else None
+
+  # build and gh-deploy run MkDocs in-process if possible. Unless there is a
+  # mkdocs.yml, the generated documents are then passed to it in memory.
+  mkdocs_site = mkdocs_options = None
+  in_memory = False
+  if args.command in ('build', 'gh-deploy'):
+    try:
+      from . import mkdocs_site
+    except ImportError:
+      pass
+    else:
+      mkdocs_options = mkdocs_site.parse_options(args.command, args.subargs)
+    in_memory = mkdocs_options is not None and not os.path.isfile('mkdocs.yml')
+
+  # generate -o writes the documents and source files to an archive instead
+  # of the gens_dir.
+  if args.command == 'generate':
+    output = output or config['output']
+    if output and watch:
+      parser.error('--watch can not be combined with -o')
+  archive_pairs = None
+
+  if args.command not in ('simple', 'json') and not selective:
+    with span('build', 'copy_source_files'):
+      if output:
+        archive_pairs = source_file_pairs(config)
+        source_files = set(dst for src, dst in archive_pairs)
+      else:
+        source_files = copy_source_files(config)
 
-    # Generate MkDocs configuration if it doesn't exist.
-    if not os.path.isfile('mkdocs.yml'):
+    # Generate MkDocs configuration if it doesn't exist. The daemon never
+    # runs MkDocs.
+    if not os.path.isfile('mkdocs.yml') and not session and mkdocs_options is None:
       log('Generating temporary MkDocs config...')
       write_temp_mkdocs_config(config)
 
@@ -184,82 +439,239 @@ def main():
   log('Building index...')
   index = Index()
 
-  def add_sections(doc, object_names, depth=1):
-    if isinstance(object_names, list):
-      [add_sections(doc, x, depth) for x in object_names]
-    elif isinstance(object_names, dict):
-      for key, subsections in object_names.items():
-        add_sections(doc, key, depth)
-        add_sections(doc, subsections, depth + 1)
-    elif isinstance(object_names, str):
-      # Check how many levels of recursion we should be going.
-      expand_depth = len(object_names)
-      object_names = object_names.rstrip('+')
-      expand_depth -= len(object_names)
-
-      def create_sections(name, level):
-        if level > expand_depth:
-          return
-        index.new_section(doc, name, depth=depth + level)
-        sort_order = config.get('sort')
-        if sort_order not in ('line', 'name'):
-          sort_order = 'line'
-        need_docstrings = 'docstring' in config.get('filter', ['docstring'])
-        for sub in dir_object(name, sort_order, need_docstrings):
-          sub = name + '.' + sub
-          sec = create_sections(sub, level + 1)
-
-      create_sections(object_names, 0)
-    else:
-      raise RuntimeError(object_names)
-
   # Make sure that we can find modules from the current working directory,
   # and have them take precedence over installed modules.
-  sys.path.insert(0, '.')
-
-  if args.command == 'simple':
-    # In simple mode, we generate a single document from the import
-    # names specified on the command-line.
-    doc = index.new_document('main.md')
-    add_sections(doc, args.subargs)
-  else:
-    for pages in config.get('generate') or []:
-      for fname, object_names in pages.items():
+  if sys.path[:1] != ['.']:
+    sys.path.insert(0, '.')
+
+  # Dependencies that we don't document don't need to be imported.
+  stubs = install_stubs(config['mock_modules'])
+
+  # Modules that are imported from now on may be evicted again when the
+  # documents are generated one after another.
+  pipeline = args.command == 'generate' and config_flag(config, 'pipeline')
+  evictor = None
+  if pipeline and config_flag(config, 'evict_modules') and not session:
+    evictor = ModuleEvictor()
+
+  with span('build', 'index'):
+    if args.command == 'simple' or (args.command == 'json' and args.subargs):
+      # In simple mode, we generate a single document from the import
+      # names specified on the command-line.
+      doc = index.new_document('main.md')
+      add_sections(index, doc, args.subargs, loader, config, select=select)
+    else:
+      for fname, object_names in iter_pages(config, only):
         doc = index.new_document(fname)
-        add_sections(doc, object_names)
-
-  # Load the docstrings and fill the sections.
+        add_sections(index, doc, object_names, loader, config, select=select)
+        if select and not doc.sections:
+          del index.documents[fname]
+
+  # Sections that are not selected are still linked to, as per the layout
+  # of the index of the last complete build.
+  layout_file = os.path.join(config['gens_dir'], INDEX_LAYOUT_FILE)
+  if selective and args.command != 'simple' and not args.subargs:
+    import json
+    try:
+      with open(layout_file) as fp:
+        add_placeholder_sections(index, json.load(fp))
+    except (IOError, OSError, ValueError):
+      log('No index of a complete build, references to other documents are not linked.')
+  if selective:
+    log('Selected {} documents, {} sections.'.format(len(index.documents),
+      sum(len(doc.sections) for doc in index.documents.values())))
+
+  # Load the docstrings and fill the sections. Sections whose source
+  # did not change since the last build are taken from the cache.
   log('Started generating documentation...')
+  cache = None
+  if session:
+    cache = session.cache(config, loader, index)
+  elif config['cache_file']:
+    from .cache import BuildCache
+    cache = BuildCache(config['cache_file'], config, loader, index)
+  pending = []
   for doc in index.documents.values():
-    for section in filter(lambda s: s.identifier, doc.sections):
-      loader.load_section(section)
-      preproc.preprocess_section(section)
+    for section in filter(lambda s: s.identifier and s.alias_of is None, doc.sections):
+      if not (cache and cache.load(section)):
+        pending.append(section)
+
+  try:
+    jobs = int(config['jobs'])
+  except ValueError:
+    parser.error('invalid number of jobs: {!r}'.format(config['jobs']))
+  # Worker processes would not share the state of the daemon.
+  if session:
+    jobs = 1
+  if jobs != 1:
+    from .parallel import cpu_count, load_sections
+    jobs = jobs or cpu_count()
+
+  # Documents are rendered on the main thread and written by a background
+  # thread. In the gens_dir, documents that did not change are not touched,
+  # so that `mkdocs serve` and sync tools ignore them.
+  sink = writer = None
+  if args.command not in ('simple', 'json'):
+    from .output import ArchiveSink, BackgroundWriter, DirectorySink, MemorySink
+    if output:
+      try:
+        sink = ArchiveSink(output)
+      except ValueError as exc:
+        parser.error(str(exc))
+    elif in_memory:
+      sink = MemorySink()
+    else:
+      sink = DirectorySink(config['gens_dir'], config['copy_mode'])
+    writer = BackgroundWriter(sink)
+    for src, dst in archive_pairs or ():
+      writer.copy(src, dst)
+
+  def write_document(fname, doc, sink=None):
+    sink = sink or writer
+    with span('render', fname):
+      content = None
+      if select:
+        # Only replace the selected sections of the document.
+        content = sink.read(fname)
+        if content is not None:
+          content = splice_document(content, doc)
+      if content is None:
+        content = doc.render_to_string()
+    sink.write(fname, content)
+
+  # Sections are output as soon as they are complete: simple renders them to
+  # stdout, json exports them and in pipeline mode, every document is written
+  # as soon as all of its sections are complete. The sections are released
+  # afterwards, so memory usage does not grow with the documentation size.
+  stream = None
+  if args.command == 'simple':
+    stream = MarkdownStream(sys.stdout, index, pending)
+  elif args.command == 'json':
+    from .export import JsonLinesWriter
+    outfile = open(output, 'w') if output else sys.stdout
+    stream = JsonLinesWriter(outfile, index, loader, pending)
+  elif pipeline:
+    on_document = None
+    if evictor:
+      evictor.expect(s.identifier for s in pending)
+      on_document = lambda fname, doc: evictor.evict()
+      # The loader may hold on to the objects that it walked for the index.
+      loader = import_object(config['loader'])(config)
+    stream = DocumentWriter(index, write_document, pending, on_document)
+
+  def callback(section):
+    if cache:
+      cache.store(section)
+    if evictor:
+      evictor.section_done(section.identifier)
+    if stream:
+      stream.section_done(section)
+
+  progress = Progress(len(pending), 'sections')
+  with span('build', 'generate', sections=len(pending), jobs=jobs):
+    if jobs > 1 and len(pending) > 1:
+      load_sections(index, pending, config, jobs, progress, callback,
+                    preproc if hasattr(preproc, 'hits') else None)
+    else:
+      generate_sections(pending, loader, preproc, progress, callback,
+                        config['loader_context'])
+    if stream:
+      stream.close()
+  progress.close()
+
+  if cache:
+    cache.close()
+    log('Cache: {} hits, {} misses'.format(cache.hits, cache.misses))
+  if hasattr(preproc, 'summary') and preproc.hits + preproc.misses:
+    log(preproc.summary())
+  if stubs and stubs.stubbed:
+    log('Stubbed {} modules.'.format(len(stubs.stubbed)))
 
   if args.command == 'simple':
-    for section in doc.sections:
-      section.render(sys.stdout)
     return 0
 
-  # Write out all the generated documents.
-  for fname, doc in index.documents.items():
-    fname = os.path.join(config['gens_dir'], fname)
-    makedirs(os.path.dirname(fname))
-    with open(fname, 'w') as fp:
-      for section in doc.sections:
-        section.render(fp)
+  if args.command == 'json':
+    if output:
+      outfile.close()
+      log('Exported {} records to {}'.format(stream.written, output))
+    return 0
+
+  if pipeline:
+    if evictor:
+      log('Evicted {} modules.'.format(evictor.evicted))
+  else:
+    for fname, doc in index.documents.items():
+      write_document(fname, doc)
+  with span('build', 'write'):
+    writer.close()
+
+  if output:
+    log('Wrote {} documents and {} source files to {}'.format(
+      sink.written, len(archive_pairs or ()), output))
+    return 0
+
+  # Remember the structure of the index for selective builds.
+  from .sync import prune_directory, write_file_if_changed
+  if not selective:
+    import json
+    from .parallel import index_layout
+    write_file_if_changed(layout_file, json.dumps(index_layout(index)))
+
+  # Remove files from previous builds that we no longer produce.
+  removed = []
+  if config['prune_gens_dir'] and not selective:
+    keep = set(source_files)
+    if not in_memory:
+      keep.update(os.path.normpath(x) for x in index.documents)
+    keep.add(INDEX_LAYOUT_FILE)
+    removed = prune_directory(config['gens_dir'], keep)
+    for fname in removed:
+      log('Removed stale file {}'.format(fname))
+
+  if in_memory:
+    log('Documents: {} generated in memory, {} removed.'.format(sink.written, len(removed)))
+  else:
+    log('Documents: {} changed, {} unchanged, {} removed.'.format(
+      sink.changed, sink.written - sink.changed, len(removed)))
+
+  # Regenerate documents when the Python sources change.
+  if watch or args.command == 'serve':
+    from .watch import Watcher
+    watcher = Watcher(config, index, dict(iter_pages(config, only)),
+                      lambda fname, doc: write_document(fname, doc, sink), log, select)
 
   if args.command == 'generate':
+    if watch:
+      watcher.run()
     return 0
 
+  if mkdocs_options is not None:
+    log("Running 'mkdocs {}' in-process".format(args.command))
+    with span('mkdocs', args.command):
+      pages = sink.files if in_memory else None
+      return mkdocs_site.run(args.command, config, pages, mkdocs_options, log)
+
+  import signal
+  import subprocess
   log("Running 'mkdocs {}'".format(args.command))
   sys.stdout.flush()
 
   args = ['mkdocs', args.command] + args.subargs
-  try:
-    return subprocess.call(args)
-  except KeyboardInterrupt:
-    return signal.SIGINT
+  with span('mkdocs', ' '.join(args)):
+    if args[1] == 'serve':
+      proc = subprocess.Popen(args)
+      try:
+        watcher.run(lambda: proc.poll() is None)
+      finally:
+        if proc.poll() is None:
+          proc.terminate()
+      return proc.wait()
+
+    try:
+      return subprocess.call(args)
+    except KeyboardInterrupt:
+      return signal.SIGINT
 
 
 if __name__ == '__main__':
-  main()
+  sys.exit(main())
@@ -0,0 +1,342 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the steps of a build that are shared between the
+command-line interface and the watch mode, most importantly building the
+#Index from the `generate` configuration.
+"""
+
+import fnmatch
+import io
+import re
+
+from .document import Document
+from .imp import dir_object
+from .trace import span
+
+#: The file in the `gens_dir` that remembers the structure of the index of
+#: the last complete build, see #add_placeholder_sections().
+INDEX_LAYOUT_FILE = '.pydocmd-index.json'
+
+_WILDCARD = re.compile(r'[*?[]')
+_ANCHOR = re.compile(r'^<a name="([^"]*)"></a>$', re.M)
+
+
+def sort_options(config):
+  """
+  Returns the sort order and whether members need docstrings to be
+  documented with the `+` syntax, as per the `sort` and `filter` options.
+  """
+
+  sort_order = config.get('sort')
+  if sort_order not in ('line', 'name'):
+    sort_order = 'line'
+  need_docstrings = 'docstring' in config.get('filter', ['docstring'])
+  return sort_order, need_docstrings
+
+
+def iter_pages(config, only=None):
+  """
+  Yields the `(filename, object_names)` pairs of the `generate` option. If
+  *only* is specified, only the filenames that match one of these wildcard
+  patterns are yielded (`--only`).
+  """
+
+  for pages in config.get('generate') or []:
+    for fname, object_names in pages.items():
+      if only and not any(fnmatch.fnmatchcase(fname, p) for p in only):
+        continue
+      yield fname, object_names
+
+
+class Selection(object):
+  """
+  Matches section identifiers against shell-style wildcard *patterns*, as
+  given with the `--select` option.
+  """
+
+  def __init__(self, patterns):
+    self.patterns = list(patterns)
+    self._regex = re.compile('|'.join('(?:{})'.format(fnmatch.translate(p))
+                                      for p in self.patterns))
+    # The part of every pattern before the first wildcard.
+    self._prefixes = [_WILDCARD.split(p, 1)[0] for p in self.patterns]
+
+  def match(self, identifier):
+    return self._regex.match(identifier) is not None
+
+  def may_contain(self, name):
+    """
+    Returns #False if no member of *name* (at any depth) can match.
+    """
+
+    name += '.'
+    for prefix in self._prefixes:
+      n = min(len(name), len(prefix))
+      if name[:n] == prefix[:n]:
+        return True
+    return False
+
+
+def add_placeholder_sections(index, layout):
+  """
+  Adds the sections of an index *layout* (see
+  #pydocmd.parallel.index_layout()) whose identifiers are not yet in
+  *index*. They are part of documents that are not in `index.documents`,
+  so they are not generated, but cross-references to them are resolved.
+  This is used by selective builds, with the layout of the last complete
+  build.
+  """
+
+  for fname, url, sections in layout:
+    doc = Document(index, url, fname)
+    for identifier, depth in sections:
+      if identifier not in index.sections:
+        index.new_section(doc, identifier, depth=depth)
+
+
+def splice_document(text, doc):
+  """
+  Replaces the sections of *doc* in *text*, a document that was rendered
+  by a previous build, and returns the result. Every section of a rendered
+  document begins with its anchor. Sections of *doc* that *text* does not
+  contain are added to the end. This is used to write the documents of
+  selective builds, which contain only the selected sections.
+  """
+
+  starts = [m.start() for m in _ANCHOR.finditer(text)]
+  chunks = [text[:starts[0]]] if starts else [text]
+  positions = {}
+  for start, end in zip(starts, starts[1:] + [len(text)]):
+    identifier = _ANCHOR.match(text, start).group(1)
+    positions.setdefault(identifier, len(chunks))
+    chunks.append(text[start:end])
+  for section in doc.sections:
+    stream = io.StringIO()
+    section.render(stream)
+    if section.identifier in positions:
+      chunks[positions[section.identifier]] = stream.getvalue()
+    else:
+      chunks.append(stream.getvalue())
+  return ''.join(chunks)
+
+
+def add_sections(index, doc, object_names, loader, config, depth=1, select=None):
+  """
+  Adds the sections for *object_names* to *doc*. *object_names* can be a
+  single name, a list of names or a dictionary that maps names to the names
+  of their subsections, as in the `generate` option. Names can be suffixed
+  with `+` to include their members (`++` for the members' members, etc.).
+
+  Loaders may enumerate the members themselves (eg. without importing them)
+  with a `dir_object()` method, otherwise we fall back to importing the
+  objects with #pydocmd.imp.dir_object().
+
+  Objects that are reached by more than one name (re-exports, or the same
+  name listed twice) are documented once, with link sections for the other
+  names (see #Index.new_object_section()). The members of these are not
+  added again. Loaders identify the objects with an `object_key()` method.
+
+  If a #Selection is specified, only sections that match it are added, and
+  members are not enumerated for objects that can not contain matches.
+  """
+
+  dir_members = getattr(loader, 'dir_object', dir_object)
+  object_key = getattr(loader, 'object_key', None)
+  sort_order, need_docstrings = sort_options(config)
+
+  def recurse(object_names, depth):
+    if isinstance(object_names, list):
+      [recurse(x, depth) for x in object_names]
+    elif isinstance(object_names, dict):
+      for key, subsections in object_names.items():
+        recurse(key, depth)
+        recurse(subsections, depth + 1)
+    elif isinstance(object_names, str):
+      # Check how many levels of recursion we should be going.
+      expand_depth = len(object_names)
+      object_names = object_names.rstrip('+')
+      expand_depth -= len(object_names)
+
+      def create_sections(name, level):
+        if level > expand_depth:
+          return
+        if select is None or select.match(name):
+          key = object_key(name) if object_key else None
+          section = index.new_object_section(doc, name, key, depth=depth + level)
+          if section.alias_of is not None:
+            return
+        elif not select.may_contain(name):
+          return
+        if level == expand_depth:
+          return
+        with span('dir_object', name):
+          members = dir_members(name, sort_order, need_docstrings)
+        for sub in members:
+          create_sections(name + '.' + sub, level + 1)
+
+      create_sections(object_names, 0)
+    else:
+      raise RuntimeError(object_names)
+
+  recurse(object_names, depth)
+
+
+class SectionStream(object):
+  """
+  Passes the documents and sections of an #Index to #begin_document(),
+  #write_section() and #end_document() in the order of the index, as soon
+  as the sections (and all sections before them) are complete. Subclasses
+  implement these methods to output the documentation while the remaining
+  sections are still being loaded, see #generate_sections().
+
+  # Arguments
+  index (Index): The index to output.
+  pending (iterable of Section): The sections that still need to be loaded.
+    All other sections are considered complete.
+  """
+
+  def __init__(self, index, pending=()):
+    pending = set(id(section) for section in pending)
+    self._items = []
+    self._ready = []
+    self._positions = {}
+    for fname, doc in index.documents.items():
+      self._items.append((fname, doc, None))
+      self._ready.append(True)
+      for section in doc.sections:
+        self._positions[id(section)] = len(self._items)
+        self._items.append((fname, doc, section))
+        self._ready.append(id(section) not in pending)
+      self._items.append((fname, doc, False))
+      self._ready.append(True)
+    self._next = 0
+
+  def section_done(self, section):
+    """
+    Marks *section* as complete and outputs everything up to the next
+    section that is not complete yet.
+    """
+
+    self._ready[self._positions[id(section)]] = True
+    self.flush()
+
+  def flush(self):
+    """
+    Outputs everything up to the next section that is not complete yet.
+    """
+
+    while self._next < len(self._items) and self._ready[self._next]:
+      fname, doc, section = self._items[self._next]
+      self._items[self._next] = None
+      self._next += 1
+      if section is None:
+        self.begin_document(fname, doc)
+      elif section is False:
+        self.end_document(fname, doc)
+      else:
+        self.write_section(fname, doc, section)
+
+  def close(self):
+    """
+    Outputs everything that is left, regardless of whether the sections are
+    complete.
+    """
+
+    self._ready = [True] * len(self._ready)
+    self.flush()
+
+  def begin_document(self, fname, doc):
+    pass
+
+  def write_section(self, fname, doc, section):
+    pass
+
+  def end_document(self, fname, doc):
+    pass
+
+  @staticmethod
+  def release_section(section):
+    """
+    Releases the content and the loader context of *section* after it
+    has been written.
+    """
+
+    section.content = None
+    section.release_loader_context('drop')
+
+
+class MarkdownStream(SectionStream):
+  """
+  Renders the sections to a text *stream* as soon as they are complete and
+  releases them afterwards (`pydocmd simple`).
+  """
+
+  def __init__(self, stream, index, pending=()):
+    SectionStream.__init__(self, index, pending)
+    self.stream = stream
+
+  def write_section(self, fname, doc, section):
+    section.render(self.stream)
+    self.stream.flush()
+    self.release_section(section)
+
+
+class DocumentWriter(SectionStream):
+  """
+  Calls *write_document* with the filename and the #Document as soon as
+  all sections of a document are complete, and then releases the sections
+  of the document (`pydocmd generate --pipeline`). The sink that the
+  documents are written to counts the changed documents.
+  """
+
+  def __init__(self, index, write_document, pending=(), on_document=None):
+    SectionStream.__init__(self, index, pending)
+    self.write_document = write_document
+    self.on_document = on_document
+
+  def end_document(self, fname, doc):
+    self.write_document(fname, doc)
+    for section in doc.sections:
+      self.release_section(section)
+    if self.on_document is not None:
+      self.on_document(fname, doc)
+
+
+def generate_sections(sections, loader, preproc, progress=None, callback=None,
+                      loader_context='keep'):
+  """
+  Loads and preprocesses *sections*. If specified, *progress* is updated
+  for every section (see #pydocmd.trace.Progress) and *callback* is called
+  with every completed section. The `loader_context` of every section is
+  released after preprocessing as per *loader_context*, see
+  #Section.release_loader_context().
+  """
+
+  for section in sections:
+    with span('load', section.identifier):
+      loader.load_section(section)
+    with span('preprocess', section.identifier):
+      preproc.preprocess_section(section)
+    section.release_loader_context(loader_context)
+    if progress is not None:
+      progress.update()
+    if callback is not None:
+      callback(section)
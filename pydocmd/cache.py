@@ -0,0 +1,260 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the persistent build cache that is enabled with the
+`cache_file` configuration key. It stores the loaded and preprocessed title
+and content of every section in an SQLite database, keyed on the section
+identifier, the contents of the source file that defines it and the parts
+of the configuration that affect the result. Every entry also records what
+the cross-references of the section link to, see #link_digest().
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from . import __version__
+
+#: The configuration keys that affect the content of a section.
+CONFIG_KEYS = ('loader', 'preprocessor', 'filter', 'sort')
+
+_SCHEMA = '''
+  CREATE TABLE IF NOT EXISTS sections (
+    identifier TEXT NOT NULL,
+    config TEXT NOT NULL,
+    source TEXT NOT NULL,
+    links TEXT NOT NULL,
+    refs TEXT,
+    title TEXT,
+    content TEXT,
+    PRIMARY KEY (identifier, config)
+  );
+  CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+  );
+'''
+
+
+def _digest(data):
+  data = json.dumps(data, sort_keys=True, default=repr)
+  return hashlib.sha1(data.encode('utf8')).hexdigest()
+
+
+def config_digest(config):
+  """
+  Returns a digest of the configuration values listed in #CONFIG_KEYS and
+  the pydoc-markdown version.
+  """
+
+  data = {key: config.get(key) for key in CONFIG_KEYS}
+  data['__version__'] = __version__
+  return _digest(data)
+
+
+def index_digest(index):
+  """
+  Returns a digest of which document every section of *index* is in. This
+  includes the placeholder sections of selective builds, so that they share
+  the cache with complete builds.
+  """
+
+  return _digest(sorted(
+    (s.doc.filename, identifier) for identifier, s in index.sections.items()))
+
+
+def link_digest(section, references):
+  """
+  Returns a digest of what the cross-references of *section* link to: the
+  section and document that every reference in *references* (see
+  `Section.references`) resolves to in the index of *section*, and the
+  document of *section* itself, as links are relative to it. Other changes
+  to the index don't affect the digest.
+
+  # Returns
+  str, None: #None if *references* is #None, ie. if the preprocessor does
+    not report them. The content of the section may then depend on any
+    section in the index, see #index_digest().
+  """
+
+  if references is None:
+    return None
+  if not references or section.doc is None:
+    return _digest(references)
+  resolver = section.index.resolver
+  data = [section.doc.filename]
+  for ref, absolute in references:
+    target = resolver.resolve(ref, section.identifier, absolute)
+    data.append(None if target is None else (target.identifier, target.doc.filename))
+  return _digest(data)
+
+
+class BuildCache(object):
+  """
+  A cache for loaded and preprocessed sections. It can be shared by builds
+  that run at the same time, SQLite takes care of the locking.
+
+  # Arguments
+  filename (str): The SQLite database file. Parent directories are created.
+  config (dict): The pydoc-markdown configuration.
+  loader (object): The loader of the build. It must implement a
+    `source_file(identifier)` method, otherwise no section will be cached.
+  index (Index): The index of the build. Sections whose preprocessor does
+    not report their references are only reused if no section of the index
+    moved, see #link_digest().
+
+  # Attributes
+  hits (int): The number of sections that were served from the cache.
+  misses (int): The number of sections that had to be generated.
+  """
+
+  def __init__(self, filename, config, loader, index=None):
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+      os.makedirs(dirname)
+    self.filename = filename
+    self.config = config_digest(config)
+    self.hits = 0
+    self.misses = 0
+    self._index = index
+    self._index_digest = None
+    self._source_file = getattr(loader, 'source_file', None)
+    self._digests = {}
+    self._pending = 0
+    self._db = sqlite3.connect(filename, timeout=60)
+    try:
+      self._db.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.DatabaseError:
+      pass  # eg. on network file systems, fall back to the default journal
+    with self._db:
+      self._db.executescript(_SCHEMA)
+
+  def close(self):
+    """
+    Commits pending changes and closes the database.
+    """
+
+    self._db.commit()
+    self._db.close()
+
+  def source_digest(self, identifier):
+    """
+    Returns the digest of the source file that defines *identifier*, or
+    #None if the file is unknown to the loader.
+    """
+
+    if self._source_file is None:
+      return None
+    try:
+      filename = self._source_file(identifier)
+    except Exception:
+      return None
+    if not filename:
+      return None
+    try:
+      return self._digests[filename]
+    except KeyError:
+      pass
+    digest = self._file_digest(filename)
+    self._digests[filename] = digest
+    return digest
+
+  def _file_digest(self, filename):
+    try:
+      st = os.stat(filename)
+    except OSError:
+      return None
+    row = self._db.execute('SELECT mtime, size, digest FROM files WHERE path = ?',
+                           (filename,)).fetchone()
+    if row and row[0] == st.st_mtime and row[1] == st.st_size:
+      return row[2]
+    hasher = hashlib.sha1()
+    with open(filename, 'rb') as fp:
+      for chunk in iter(lambda: fp.read(65536), b''):
+        hasher.update(chunk)
+    digest = hasher.hexdigest()
+    self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                     (filename, st.st_mtime, st.st_size, digest))
+    self._written()
+    return digest
+
+  def _written(self):
+    # Commit in batches, but often enough that concurrent builds don't
+    # wait for the write lock for too long.
+    self._pending += 1
+    if self._pending >= 256:
+      self._db.commit()
+      self._pending = 0
+
+  def links(self, section, references):
+    """
+    Returns the #link_digest() of *section*, or the #index_digest() of the
+    build if *references* is #None.
+    """
+
+    digest = link_digest(section, references)
+    if digest is None and self._index is not None:
+      if self._index_digest is None:
+        self._index_digest = index_digest(self._index)
+      digest = self._index_digest
+    return digest or ''
+
+  def load(self, section):
+    """
+    Fills in the title, content and references of *section* from the cache.
+
+    # Returns
+    bool: #True on a cache hit, #False if the section must be generated.
+    """
+
+    digest = self.source_digest(section.identifier)
+    if digest is not None:
+      row = self._db.execute(
+        'SELECT links, refs, title, content FROM sections WHERE identifier = ? '
+        'AND config = ? AND source = ?',
+        (section.identifier, self.config, digest)).fetchone()
+      if row:
+        references = None if row[1] is None else [tuple(x) for x in json.loads(row[1])]
+        if row[0] == self.links(section, references):
+          section.title, section.content = row[2:]
+          section.references = references
+          self.hits += 1
+          return True
+    self.misses += 1
+    return False
+
+  def store(self, section):
+    """
+    Stores the title, content and references of the generated *section*.
+    """
+
+    digest = self.source_digest(section.identifier)
+    if digest is None:
+      return
+    references = section.references
+    self._db.execute('INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (section.identifier, self.config, digest,
+                      self.links(section, references),
+                      None if references is None else json.dumps(references),
+                      section.title, section.content))
+    self._written()
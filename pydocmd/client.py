@@ -0,0 +1,207 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the thin client of `pydocmd daemon` (see
+#pydocmd.daemon). It only depends on the standard library, so that sending
+a request is cheap.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+
+class NoDaemonError(Exception):
+  """
+  Raised if no daemon is listening on the socket.
+  """
+
+
+#: The environment variable that overrides the default socket path.
+SOCKET_VARIABLE = 'PYDOCMD_SOCKET'
+
+
+def socket_dir():
+  """
+  Returns the directory for the sockets of the daemons of the current user:
+  `$XDG_RUNTIME_DIR/pydocmd`, or `pydocmd-<uid>` in the temporary directory.
+  It is created if it does not exist, and only the user may access it.
+
+  # Raises
+  RuntimeError: If the directory belongs to another user or others may
+    access it.
+  """
+
+  uid = os.getuid() if hasattr(os, 'getuid') else 0
+  runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+  if runtime_dir and os.path.isdir(runtime_dir):
+    path = os.path.join(runtime_dir, 'pydocmd')
+  else:
+    path = os.path.join(tempfile.gettempdir(), 'pydocmd-{}'.format(uid))
+  try:
+    os.mkdir(path, 0o700)
+  except OSError:
+    pass  # Checked below.
+  if hasattr(os, 'getuid'):
+    try:
+      st = os.lstat(path)
+    except OSError as exc:
+      raise RuntimeError('can not create {} ({})'.format(path, exc))
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != uid or st.st_mode & 0o077:
+      raise RuntimeError('{} must be a directory that only you can access'.format(path))
+  return path
+
+
+def default_socket_path(cwd=None):
+  """
+  Returns the path of the socket of the daemon for the project in *cwd*
+  (defaults to the current directory): the `PYDOCMD_SOCKET` environment
+  variable, or a socket in the #socket_dir() that is unique per project.
+
+  # Raises
+  RuntimeError: See #socket_dir().
+  """
+
+  path = os.environ.get(SOCKET_VARIABLE)
+  if path:
+    return path
+  cwd = os.path.realpath(cwd or os.getcwd())
+  project = hashlib.sha1(cwd.encode('utf8')).hexdigest()[:16]
+  return os.path.join(socket_dir(), '{}.sock'.format(project))
+
+
+def peer_uid(sock):
+  """
+  Returns the user id of the process on the other end of the Unix socket
+  *sock*, or #None if the platform does not tell (`SO_PEERCRED`).
+  """
+
+  if not hasattr(socket, 'SO_PEERCRED'):
+    return None
+  creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+  return struct.unpack('3i', creds)[1]
+
+
+def _send(sock, record):
+  sock.sendall((json.dumps(record) + '\n').encode('utf8'))
+
+
+def _receive(sock):
+  data = []
+  while True:
+    chunk = sock.recv(65536)
+    if not chunk:
+      break
+    data.append(chunk)
+    if chunk.endswith(b'\n'):
+      break
+  return b''.join(data).decode('utf8')
+
+
+def _request(path, record):
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(path)
+    # Don't send our command line to another user's process.
+    uid = peer_uid(sock)
+    if uid is not None and uid != os.getuid():
+      raise IOError('the daemon is run by another user ({})'.format(uid))
+  except BaseException:
+    sock.close()
+    raise
+  _send(sock, record)
+  return sock, sock.makefile('rb')
+
+
+def request(path, argv, cwd=None):
+  """
+  Runs the command *argv* (eg. `['simple', 'pkg.mod+']`) in the daemon that
+  listens on *path*, in the working directory *cwd*, and relays its output
+  to #sys.stdout and #sys.stderr.
+
+  # Returns
+  int: The exit code of the command.
+
+  # Raises
+  NoDaemonError: If there is no daemon listening on *path*.
+  """
+
+  try:
+    sock, fp = _request(path, {'argv': list(argv), 'cwd': cwd or os.getcwd()})
+  except (IOError, OSError) as exc:
+    raise NoDaemonError('can not connect to the daemon on {} ({})'.format(path, exc))
+  try:
+    for line in fp:
+      record = json.loads(line.decode('utf8'))
+      if 'stdout' in record:
+        sys.stdout.write(record['stdout'])
+        sys.stdout.flush()
+      if 'stderr' in record:
+        sys.stderr.write(record['stderr'])
+      if 'exit' in record:
+        return record['exit']
+    return 1
+  finally:
+    fp.close()
+    sock.close()
+
+
+def ping(path):
+  """
+  Returns the status of the daemon that listens on *path* as a dictionary,
+  or #None if there is none.
+  """
+
+  try:
+    sock, fp = _request(path, {'ping': True})
+  except (IOError, OSError):
+    return None
+  try:
+    line = fp.readline()
+    return json.loads(line.decode('utf8')) if line else None
+  finally:
+    fp.close()
+    sock.close()
+
+
+def stop(path):
+  """
+  Stops the daemon that listens on *path*.
+
+  # Returns
+  bool: #False if there is no daemon listening on *path*.
+  """
+
+  try:
+    sock, fp = _request(path, {'stop': True})
+  except (IOError, OSError):
+    return False
+  try:
+    fp.readline()
+  finally:
+    fp.close()
+    sock.close()
+  return True
@@ -0,0 +1,357 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements `pydocmd daemon`, a resident process that runs the
+`generate`, `simple`, `json` and `query` commands on behalf of a thin client
+(`--daemon`). The documented modules stay imported between requests, and
+the loaders (with their #SymbolGraph) and the preprocessed sections are kept
+in a #Session. Before every request, the modules whose source files changed
+are reloaded and everything that was derived from them is dropped.
+
+Modules are imported by name, so a daemon only serves the directory that it
+was started in: other projects may have modules of the same name. Requests
+from other directories are rejected. By default, every project has its own
+socket, see #pydocmd.client.default_socket_path().
+
+The client sends one JSON object per connection and receives JSON Lines:
+
+    {"argv": ["simple", "pkg.mod+"], "cwd": "/src/project"}
+
+    {"stdout": "..."}
+    {"stderr": "..."}
+    {"exit": 0}
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import socket
+import sys
+import traceback
+
+from .cache import config_digest, index_digest, link_digest, CONFIG_KEYS
+from .client import peer_uid, ping, _receive, _send
+from .imp import import_object
+from .watch import PollingObserver, reload_modules
+
+
+def _module_file(module):
+  filename = getattr(module, '__file__', None)
+  if not filename:
+    return None
+  if filename.endswith(('.pyc', '.pyo')):
+    filename = filename[:-1]
+  return os.path.abspath(filename)
+
+
+class SessionCache(object):
+  """
+  A cache for loaded and preprocessed sections with the same interface as
+  #pydocmd.cache.BuildCache, backed by the memory of a #Session. It holds
+  the latest version of every section, which is used if it was generated
+  with the same #config_digest() and its references still link to the same
+  sections (see #link_digest()). Entries are dropped by #Session.refresh()
+  when their source file changes.
+  """
+
+  def __init__(self, sections, config, loader, index=None):
+    self.config = config_digest(config)
+    self.hits = 0
+    self.misses = 0
+    self._index = index
+    self._index_digest = None
+    self._sections = sections
+    self._source_file = getattr(loader, 'source_file', None)
+
+  def close(self):
+    pass
+
+  def source_file(self, identifier):
+    if self._source_file is None:
+      return None
+    try:
+      return self._source_file(identifier)
+    except Exception:
+      return None
+
+  def links(self, section, references):
+    digest = link_digest(section, references)
+    if digest is None and self._index is not None:
+      if self._index_digest is None:
+        self._index_digest = index_digest(self._index)
+      digest = self._index_digest
+    return digest or ''
+
+  def load(self, section):
+    entry = self._sections.get(section.identifier)
+    if entry is not None and entry[0] == self.config and \
+        entry[2] == self.links(section, entry[3]):
+      section.title, section.content = entry[4:]
+      section.references = entry[3]
+      self.hits += 1
+      return True
+    self.misses += 1
+    return False
+
+  def store(self, section):
+    filename = self.source_file(section.identifier)
+    if filename:
+      references = section.references
+      self._sections[section.identifier] = (self.config, filename,
+        self.links(section, references), references, section.title, section.content)
+
+
+class Session(object):
+  """
+  The state that the daemon keeps between requests. It is passed to
+  #pydocmd.__main__.main(), which takes its loaders and cache from it.
+
+  # Attributes
+  reloaded (int): The number of modules that have been reloaded.
+  """
+
+  def __init__(self):
+    self.reloaded = 0
+    self._loaders = {}
+    self._sections = {}
+    self._observer = PollingObserver()
+    # Only the modules imported by requests are checked for changes.
+    self._baseline = set(sys.modules)
+
+  def loader(self, config):
+    """
+    Returns the loader for *config*, which is reused by all requests from
+    the same directory with the same loader configuration.
+    """
+
+    key = (os.getcwd(), json.dumps({k: config.get(k) for k in CONFIG_KEYS},
+                                   sort_keys=True, default=repr))
+    try:
+      return self._loaders[key]
+    except KeyError:
+      loader = self._loaders[key] = import_object(config['loader'])(config)
+      return loader
+
+  def cache(self, config, loader, index):
+    """
+    Returns a #SessionCache for a build with *config*, *loader* and *index*.
+    """
+
+    return SessionCache(self._sections, config, loader, index)
+
+  def _files(self):
+    # The source files of imported modules, and those of the stored sections,
+    # which loaders like the StaticLoader read without importing them.
+    files = set()
+    for name, module in list(sys.modules.items()):
+      if name not in self._baseline:
+        filename = _module_file(module)
+        if filename:
+          files.add(filename)
+    for entry in list(self._sections.values()):
+      files.add(entry[1])
+    return files
+
+  def track(self):
+    """
+    Remembers the state of the source files of the modules that have been
+    imported and of the sections that have been stored since the last call.
+    Called after every request.
+    """
+
+    self._observer.set_files(self._files())
+
+  def refresh(self, log=print):
+    """
+    Reloads the modules whose source files changed since the last call of
+    #track() and drops the loaders and the sections that may depend on them.
+    Called before every request.
+
+    # Returns
+    set of str: The changed files.
+    """
+
+    changed = self._observer.wait(timeout=0)
+    if not changed:
+      return changed
+
+    modules = sum(1 for m in list(sys.modules.values()) if _module_file(m) in changed)
+    try:
+      reload_modules(changed)
+    except Exception:
+      log(traceback.format_exc())
+      log('Failed to reload {}'.format(', '.join(sorted(changed))))
+    self.reloaded += modules
+    self._loaders.clear()
+    for identifier, entry in list(self._sections.items()):
+      if entry[1] in changed:
+        del self._sections[identifier]
+    log('Reloaded {} modules.'.format(modules))
+    return changed
+
+
+class _SocketWriter(object):
+  """
+  A text stream that sends what is written to it to the client as
+  `{"<name>": "..."}` records, on every #flush() (and on every line for
+  `stderr`). Once the client went away, everything is discarded.
+  """
+
+  def __init__(self, sock, name):
+    self.sock = sock
+    self.name = name
+    self.closed = False
+    self._buffer = []
+
+  def isatty(self):
+    return False
+
+  def write(self, data):
+    if self.closed:
+      return
+    self._buffer.append(data)
+    if self.name == 'stderr' and '\n' in data:
+      self.flush()
+
+  def flush(self):
+    if self._buffer and not self.closed:
+      data = ''.join(self._buffer)
+      self._buffer = []
+      try:
+        _send(self.sock, {self.name: data})
+      except (IOError, OSError):
+        self.closed = True
+
+
+class Daemon(object):
+  """
+  Serves requests on the Unix socket *path* one after another, with a
+  shared #Session. Only requests from the current directory are served.
+
+  # Arguments
+  path (str): The path of the socket.
+  main (callable): Runs a command, called with the command-line arguments
+    and the #Session (see #pydocmd.__main__.main()).
+  log (callable): Used to report the state of the daemon.
+  """
+
+  def __init__(self, path, main, log=print):
+    self.path = path
+    self.main = main
+    self.log = log
+    self.cwd = os.path.realpath(os.getcwd())
+    self.session = Session()
+    self.requests = 0
+
+  def serve(self):
+    """
+    Serves requests until a `stop` request is received or the user
+    interrupts the process.
+    """
+
+    if os.path.exists(self.path):
+      if ping(self.path):
+        raise RuntimeError('a daemon is already listening on {}'.format(self.path))
+      os.remove(self.path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      server.bind(self.path)
+      # Requests run arbitrary code, only the user may connect.
+      os.chmod(self.path, 0o600)
+      server.listen(8)
+      self.log('Listening on {}'.format(self.path))
+      while True:
+        conn = server.accept()[0]
+        try:
+          if not self.handle(conn):
+            break
+        except Exception:
+          self.log(traceback.format_exc())
+        finally:
+          conn.close()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      server.close()
+      if os.path.exists(self.path):
+        os.remove(self.path)
+    self.log('Stopped after {} requests.'.format(self.requests))
+
+  def handle(self, conn):
+    """
+    Handles a request on the connection *conn*.
+
+    # Returns
+    bool: #False if the daemon should stop.
+    """
+
+    uid = peer_uid(conn)
+    if uid is not None and uid != os.getuid():
+      self.log('Rejected a connection from user {}'.format(uid))
+      return True
+    try:
+      request = json.loads(_receive(conn))
+    except ValueError:
+      return True
+    if request.get('stop'):
+      _send(conn, {'exit': 0})
+      return False
+    if request.get('ping'):
+      _send(conn, {'exit': 0, 'cwd': self.cwd, 'requests': self.requests,
+                   'reloaded': self.session.reloaded})
+      return True
+    if os.path.realpath(request['cwd']) != self.cwd:
+      _send(conn, {'stderr': 'the daemon serves {}, not {}\n'.format(
+        self.cwd, request['cwd'])})
+      _send(conn, {'exit': 2})
+      return True
+
+    self.requests += 1
+    stdout, stderr = _SocketWriter(conn, 'stdout'), _SocketWriter(conn, 'stderr')
+    old_cwd = os.getcwd()
+    old_path = list(sys.path)
+    old_streams = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+      os.chdir(self.cwd)
+      self.session.refresh(lambda *a: print(*a, file=stderr))
+      status = self.main(request['argv'], self.session) or 0
+    except SystemExit as exc:
+      if exc.code is None or isinstance(exc.code, int):
+        status = exc.code or 0
+      else:
+        print(exc.code, file=stderr)
+        status = 1
+    except Exception:
+      traceback.print_exc(file=stderr)
+      status = 1
+    finally:
+      self.session.track()
+      sys.stdout, sys.stderr = old_streams
+      sys.path[:] = old_path
+      os.chdir(old_cwd)
+    try:
+      stdout.flush()
+      stderr.flush()
+      _send(conn, {'exit': int(status)})
+    except (IOError, OSError):
+      pass  # The client went away.
+    return True
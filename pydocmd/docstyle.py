@@ -0,0 +1,72 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module detects the style of a docstring, so that preprocessors can
+skip docstrings that they have nothing to do for. The styles are:
+
+* `rest`: reStructuredText field lists (`:param x: ...`)
+* `numpy`: NumPy sections (`Parameters` underlined with dashes)
+* `google`: Google sections (`Args:`)
+* `markdown`: the Markdown-like style of pydoc-markdown (`# Arguments` and
+  `#references`)
+* `plain`: none of the above
+"""
+
+import re
+
+#: The reST fields that #pydocmd.restructuredtext.Preprocessor converts.
+REST_FIELDS = ('param', 'parameter', 'arg', 'argument', 'key', 'keyword',
+               'type', 'raise', 'raises', 'except', 'exception', 'return',
+               'returns', 'rtype', 'ivar', 'var', 'cvar', 'vartype')
+
+_NUMPY_SECTIONS = ('Parameters', 'Other Parameters', 'Returns', 'Yields',
+                   'Raises', 'Warns', 'Attributes', 'Methods', 'See Also',
+                   'Notes', 'References', 'Examples')
+_GOOGLE_SECTIONS = ('Args', 'Arguments', 'Keyword Args', 'Keyword Arguments',
+                    'Returns', 'Yields', 'Raises', 'Attributes', 'Example',
+                    'Examples', 'Note', 'Notes', 'Todo')
+
+#: The styles returned by #detect_style().
+STYLES = ('rest', 'numpy', 'google', 'markdown', 'plain')
+
+_REST = re.compile(r'^[ \t]*:(?:{})\b[^:\n]*:'.format('|'.join(REST_FIELDS)), re.M)
+_NUMPY = re.compile(r'^[ \t]*(?:{})[ \t]*\n[ \t]*-{{3,}}[ \t]*$'.format(
+  '|'.join(_NUMPY_SECTIONS)), re.M)
+_GOOGLE = re.compile(r'^[ \t]*(?:{}):[ \t]*$'.format('|'.join(_GOOGLE_SECTIONS)), re.M)
+
+
+def detect_style(content):
+  """
+  Returns the style of the docstring *content*, one of #STYLES. The styles
+  are checked in that order, as docstrings may mix them (eg. reST fields and
+  #references). Every check is a substring test, and a regular expression
+  search over the whole string only if that succeeds, which is much cheaper
+  than preprocessing the docstring line by line.
+  """
+
+  if ':' in content and _REST.search(content):
+    return 'rest'
+  if '---' in content and _NUMPY.search(content):
+    return 'numpy'
+  if ':' in content and _GOOGLE.search(content):
+    return 'google'
+  if '#' in content:
+    return 'markdown'
+  return 'plain'
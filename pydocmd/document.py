@@ -25,6 +25,51 @@ from this structured representation.
 
 from __future__ import print_function
 import os
+import posixpath
+import sys
+import weakref
+
+try:
+  intern = sys.intern
+except AttributeError:
+  intern = intern  # Python 2
+
+#: The supported values for the `loader_context` configuration key, see
+#: #Section.release_loader_context().
+LOADER_CONTEXT_MODES = ('keep', 'weak', 'drop')
+
+
+class _WeakContext(object):
+  """
+  Holds weak references to a loader context, or to the values of a loader
+  context that is a dictionary. Values that can not be weakly referenced
+  are dropped.
+  """
+
+  __slots__ = ('refs', 'is_dict')
+
+  def __init__(self, context):
+    self.is_dict = isinstance(context, dict)
+    if self.is_dict:
+      self.refs = {key: self._ref(value) for key, value in context.items()}
+    else:
+      self.refs = self._ref(context)
+
+  @staticmethod
+  def _ref(value):
+    try:
+      return weakref.ref(value)
+    except TypeError:
+      return None
+
+  @staticmethod
+  def _deref(ref):
+    return ref() if ref is not None else None
+
+  def resolve(self):
+    if self.is_dict:
+      return {key: self._deref(ref) for key, ref in self.refs.items()}
+    return self._deref(self.refs)
 
 
 class Section(object):
@@ -43,31 +88,87 @@ class Section(object):
   depth (int): The depth of the section, defaults to 1. Currently only affects
     the header-size that is rendered for the `section.title`.
   content (str): The Markdown-formatted content of the section.
+  loader_context (any): Arbitrary data that the loader attached to the
+    section, eg. the documented object. See #release_loader_context().
+  alias_of (Section, None): For link sections, the section that documents
+    the object, see #Index.new_link_section(). Link sections are not loaded.
+  references (list, None): The cross-references that the preprocessor
+    resolved in the content, as `(ref, absolute)` tuples, or #None if the
+    preprocessor does not report them. See #pydocmd.cache.link_digest().
   """
 
+  # Documentations can have hundreds of thousands of sections.
+  __slots__ = ('doc', 'identifier', 'title', 'depth', 'content', '_loader_context',
+               'alias_of', 'references')
+
   def __init__(self, doc, identifier=None, title=None, depth=1, content=None):
     self.doc = doc
-    self.identifier = identifier
+    self.identifier = intern(identifier) if isinstance(identifier, str) else identifier
     self.title = title
     self.depth = depth
     self.content = content if content is not None else '*Nothing to see here.*'
+    self._loader_context = None
+    self.alias_of = None
+    self.references = None
+
+  @property
+  def loader_context(self):
+    context = self._loader_context
+    if isinstance(context, _WeakContext):
+      return context.resolve()
+    return context
+
+  @loader_context.setter
+  def loader_context(self, context):
+    self._loader_context = context
+
+  def release_loader_context(self, mode='weak'):
+    """
+    Releases the `loader_context` once the section has been preprocessed,
+    so that it no longer keeps the documented objects alive.
+
+    # Arguments
+    mode (str): One of #LOADER_CONTEXT_MODES. With `'weak'`, the context
+      (or the values of a dictionary context) is only weakly referenced
+      from now on, with `'drop'` it is removed, and `'keep'` does nothing.
+
+    # Raises
+    ValueError: If *mode* is invalid.
+    """
+
+    if mode not in LOADER_CONTEXT_MODES:
+      raise ValueError('invalid loader_context mode: {!r}'.format(mode))
+    context = self._loader_context
+    if mode == 'drop':
+      self._loader_context = None
+    elif mode == 'weak' and context is not None and not isinstance(context, _WeakContext):
+      self._loader_context = _WeakContext(context)
 
   def render(self, stream):
     """
     Render the section into *stream*.
     """
 
-    print('#' * self.depth, self.title, file = stream)
-    print(self.content, file=stream)
+    stream.write(self.render_to_string())
+
+  def render_to_string(self):
+    """
+    Render the section into a string.
+    """
+
+    header = '{} {}\n{}\n'.format('#' * self.depth, self.title, self.content)
+    if self.identifier:
+      return '<a name="{}"></a>\n'.format(self.identifier) + header
+    return header
 
   @property
   def index(self):
     """
     Returns the #Index that this section is associated with, accessed via
-    `section.document`.
+    `section.doc`.
     """
 
-    return self.document.index
+    return self.doc.index
 
 
 class Document(object):
@@ -78,13 +179,33 @@ class Document(object):
   # Attributes
   index (Index): The index that the document belongs to.
   url (str): The relative URL of the document.
+  filename (str, None): The filename of the document, relative to the
+    `gens_dir`. Used to link to the document from other documents.
   """
 
-  def __init__(self, index, url):
+  __slots__ = ('index', 'url', 'filename', 'sections')
+
+  def __init__(self, index, url, filename=None):
     self.index = index
     self.url = url
+    self.filename = filename
     self.sections = []
 
+  def render(self, stream):
+    """
+    Render all sections of the document into *stream*.
+    """
+
+    for section in self.sections:
+      section.render(stream)
+
+  def render_to_string(self):
+    """
+    Render the document into a string.
+    """
+
+    return ''.join(section.render_to_string() for section in self.sections)
+
 
 class Index(object):
   """
@@ -93,13 +214,28 @@ class Index(object):
   from other sections.
 
   # Attributes
-  documents (dict):
-  sections (dict):
+  documents (dict): Maps filenames to #Document#s.
+  sections (dict): Maps section identifiers to #Section#s.
+  objects (dict): Maps the identity keys of documented objects to the
+    #Section that documents them, see #new_object_section().
   """
 
   def __init__(self):
     self.documents = {}
     self.sections = {}
+    self.objects = {}
+    self._resolver = None
+
+  @property
+  def resolver(self):
+    """
+    The #ReferenceResolver for the sections in the index. It is built on
+    first access and rebuilt after sections were added or removed.
+    """
+
+    if self._resolver is None:
+      self._resolver = ReferenceResolver(self)
+    return self._resolver
 
   def new_document(self, filename, url=None):
     """
@@ -125,7 +261,7 @@ class Index(object):
     if not url:
       url = filename[:-3]
 
-    doc = Document(self, url)
+    doc = Document(self, url, filename)
     self.documents[filename] = doc
     return doc
 
@@ -144,5 +280,153 @@ class Index(object):
         raise ValueError('section identifier {!r} already used'
           .format(section.identifier))
       self.sections[section.identifier] = section
+      self._resolver = None
     doc.sections.append(section)
     return section
+
+  def new_object_section(self, doc, identifier, key=None, depth=1):
+    """
+    Creates a section for the object *identifier* in *doc*, unless the
+    object is already documented: if the identifier is already used, or
+    another section documents an object with the same identity *key* (eg.
+    the same class re-exported by another module), a link section to that
+    section is created instead, see #new_link_section().
+
+    # Arguments
+    doc (Document): The document to add the section to.
+    identifier (str): The absolute name of the object.
+    key (hashable, None): Identifies the object independent of the name
+      that it is reached by (see the `object_key()` method of the loaders).
+      #None if the identity of the object is unknown.
+    depth (int): The depth of the section.
+
+    # Returns
+    Section: The new section. Its `alias_of` is set if it is a link section.
+    """
+
+    target = self.sections.get(identifier)
+    if target is None and key is not None:
+      target = self.objects.get(key)
+    if target is not None:
+      if identifier in self.sections:
+        identifier = None
+      return self.new_link_section(doc, target, identifier, depth=depth)
+    section = self.new_section(doc, identifier, depth=depth)
+    if key is not None:
+      self.objects[key] = section
+    return section
+
+  def new_link_section(self, doc, target, identifier=None, depth=1):
+    """
+    Creates a section in *doc* that only links to the section *target*.
+    Its content is complete, it is not loaded or preprocessed.
+    """
+
+    name = identifier or target.identifier
+    section = self.new_section(doc, identifier, title=name.rsplit('.', 1)[-1], depth=depth)
+    section.alias_of = target
+    url = '#' + target.identifier
+    if target.doc is not doc and target.doc.filename:
+      if doc.filename:
+        url = posixpath.relpath(target.doc.filename, posixpath.dirname(doc.filename) or '.') + url
+      else:
+        url = target.doc.filename + url
+    section.content = 'Alias of [`{}`]({}).'.format(target.identifier, url)
+    return section
+
+  def clear_document(self, doc):
+    """
+    Removes all sections from *doc* (and their identifiers from the index),
+    eg. to rebuild the document.
+    """
+
+    removed = set()
+    for section in doc.sections:
+      removed.add(id(section))
+      if section.identifier and self.sections.get(section.identifier) is section:
+        del self.sections[section.identifier]
+    for key, section in list(self.objects.items()):
+      if id(section) in removed:
+        del self.objects[key]
+    del doc.sections[:]
+    self._resolver = None
+
+
+class ReferenceResolver(object):
+  """
+  Resolves cross-references to the sections of an #Index. Besides the
+  identifiers of the index, it precomputes a table of all unambiguous
+  trailing parts of the identifiers (eg. `Class.method` for
+  `pkg.mod.Class.method`), so that resolving a reference takes a few
+  dictionary lookups, independent of the number of sections.
+
+  # Attributes
+  index (Index): The index that references are resolved in.
+  suffixes (dict): Maps the trailing parts of identifiers to the full
+    identifier, or #None if the suffix is ambiguous.
+  """
+
+  def __init__(self, index):
+    self.index = index
+    self.suffixes = {}
+    self._links = {}
+    for identifier in index.sections:
+      parts = identifier.split('.')
+      for i in range(1, len(parts)):
+        suffix = '.'.join(parts[i:])
+        self.suffixes[suffix] = None if suffix in self.suffixes else identifier
+
+  def resolve(self, ref, scope=None, absolute=False):
+    """
+    Resolves the reference *ref* to a #Section.
+
+    # Arguments
+    ref (str): The referenced name, eg. `Class.method`.
+    scope (str, None): The identifier of the section that contains the
+      reference. The name is looked up in this scope and its parent scopes
+      first.
+    absolute (bool): If #True, *ref* must be a complete identifier.
+
+    # Returns
+    Section: The referenced section, or #None if it could not be found.
+    """
+
+    sections = self.index.sections
+    if absolute:
+      return sections.get(ref)
+    if scope:
+      parts = scope.split('.')
+      for i in range(len(parts), 0, -1):
+        section = sections.get('.'.join(parts[:i]) + '.' + ref)
+        if section is not None:
+          return section
+    section = sections.get(ref)
+    if section is None:
+      identifier = self.suffixes.get(ref)
+      if identifier is not None:
+        section = sections.get(identifier)
+    return section
+
+  def link(self, section, from_doc=None):
+    """
+    Returns the URL of the anchor of *section*, relative to the document
+    *from_doc*.
+    """
+
+    anchor = '#' + section.identifier
+    target = section.doc
+    if target is None or target is from_doc or not target.filename:
+      return anchor
+    source = from_doc.filename if from_doc is not None else None
+    if source == target.filename:
+      return anchor
+    key = (source, target.filename)
+    try:
+      path = self._links[key]
+    except KeyError:
+      if source:
+        path = posixpath.relpath(target.filename, posixpath.dirname(source) or '.')
+      else:
+        path = target.filename
+      self._links[key] = path
+    return path + anchor
@@ -0,0 +1,110 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the `pydocmd json` command, which exports the
+documents and sections of the #Index as JSON Lines: one JSON object per
+line, either a document or a section record. Sections are written as soon
+as they (and all sections before them) are loaded, so consumers can start
+reading before the build has finished.
+
+    {"type": "document", "filename": "api.md", "url": "api", "sections": 2}
+    {"type": "section", "document": "api.md", "identifier": "pkg.mod",
+     "title": "pkg.mod", "depth": 1, "content": "...",
+     "source_file": "/src/pkg/mod.py", "source_line": 1}
+
+A document record is followed by the records of its `sections`, the
+number of which it states. Sections that are not defined in a source file
+known to the loader have #None (`null`) as `source_file` and `source_line`.
+"""
+
+import json
+
+from .build import SectionStream
+
+
+class JsonLinesWriter(SectionStream):
+  """
+  Writes the records for the documents and sections of an #Index to a text
+  stream in the order of the index, as the sections are completed. Sections
+  are released once they have been written.
+
+  # Arguments
+  stream (file): The text stream to write to.
+  index (Index): The index to export.
+  loader (object): The loader of the build. If it implements
+    `source_file(identifier)` and `source_line(identifier)`, the source
+    location of every section is exported as well.
+  pending (iterable of Section): The sections that still need to be loaded.
+    All other sections are considered complete.
+
+  # Attributes
+  written (int): The number of records written.
+  """
+
+  def __init__(self, stream, index, loader=None, pending=()):
+    SectionStream.__init__(self, index, pending)
+    self.stream = stream
+    self.loader = loader
+    self.written = 0
+
+  def close(self):
+    """
+    Writes the remaining records, regardless of whether the sections are
+    complete, and flushes the stream.
+    """
+
+    SectionStream.close(self)
+    self.stream.flush()
+
+  def begin_document(self, fname, doc):
+    self._write(self.document_record(fname, doc))
+
+  def write_section(self, fname, doc, section):
+    self._write(self.section_record(fname, section))
+    self.release_section(section)
+
+  def _write(self, record):
+    self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+    self.written += 1
+
+  def document_record(self, fname, doc):
+    return {'type': 'document', 'filename': fname, 'url': doc.url,
+            'sections': len(doc.sections)}
+
+  def section_record(self, fname, section):
+    record = {
+      'type': 'section',
+      'document': fname,
+      'identifier': section.identifier,
+      'title': section.title,
+      'depth': section.depth,
+      'content': section.content,
+      'source_file': None,
+      'source_line': None,
+    }
+    if section.identifier and self.loader is not None:
+      for key in ('source_file', 'source_line'):
+        method = getattr(self.loader, key, None)
+        if method is not None:
+          try:
+            record[key] = method(section.identifier)
+          except Exception:
+            pass
+    return record
@@ -21,9 +21,17 @@
 This module provides utilities for importing Python objects by name.
 """
 
+import ast
+import io
+import linecache
+import os
+import sys
 import types
 import inspect
 
+from .importhooks import profiler
+from .trace import tracer
+
 
 def import_module(name):
   """
@@ -33,7 +41,225 @@ def import_module(name):
 
   # fromlist must not be empty so we get the bottom-level module rather than
   # the top-level module.
-  return __import__(name, fromlist=[''])
+  if not tracer.enabled or name in sys.modules:
+    return __import__(name, fromlist=[''])
+  with tracer.span('import', name):
+    return __import__(name, fromlist=[''])
+
+
+# The package of pydoc-markdown, whose modules are never evicted.
+_PACKAGE = __name__.partition('.')[0]
+
+
+class ModuleEvictor(object):
+  """
+  Removes modules that are no longer needed from #sys.modules while the
+  documentation is generated, so that they (and everything that only they
+  reference) can be garbage collected. A module is needed as long as a
+  section that remains to be loaded is in it. Only modules of the packages
+  of these sections are evicted, and never ones that were imported before
+  the evictor was created or pydoc-markdown's own modules.
+
+  # Attributes
+  evicted (int): The number of modules that have been evicted.
+  """
+
+  def __init__(self):
+    self.keep = set(sys.modules)
+    self.needed = {}
+    self.packages = set()
+    self.evicted = 0
+
+  def expect(self, identifiers):
+    """
+    Adds the *identifiers* of sections that remain to be loaded.
+    """
+
+    for identifier in identifiers:
+      parts = identifier.split('.')
+      self.packages.add(parts[0])
+      for i in range(1, len(parts) + 1):
+        prefix = '.'.join(parts[:i])
+        self.needed[prefix] = self.needed.get(prefix, 0) + 1
+
+  def section_done(self, identifier):
+    """
+    Marks the section *identifier* as loaded.
+    """
+
+    parts = identifier.split('.')
+    for i in range(1, len(parts) + 1):
+      prefix = '.'.join(parts[:i])
+      count = self.needed.get(prefix, 0) - 1
+      if count > 0:
+        self.needed[prefix] = count
+      else:
+        self.needed.pop(prefix, None)
+
+  def evict(self):
+    """
+    Removes all modules from #sys.modules that are no longer needed.
+    """
+
+    for name in list(sys.modules):
+      if name in self.keep or name in self.needed:
+        continue
+      package = name.partition('.')[0]
+      if package not in self.packages or package == _PACKAGE:
+        continue
+      module = sys.modules.pop(name)
+      self.evicted += 1
+      # The parent package references the module as well.
+      parent_name, _, child = name.rpartition('.')
+      parent = sys.modules.get(parent_name)
+      if parent is not None and getattr(parent, child, None) is module:
+        delattr(parent, child)
+
+
+class _SourceFile(object):
+  """
+  The number of lines of a Python source file and the line numbers of the
+  classes defined in it, by their qualified name.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.num_lines = len(self._read().splitlines(True))
+    self._classes = None
+
+  def _read(self):
+    if _filename_in_linecache(self.filename):
+      return ''.join(linecache.cache[self.filename][2])
+    with io.open(self.filename, 'rb') as fp:
+      data = fp.read()
+    return data.decode(_source_encoding(data))
+
+  @property
+  def classes(self):
+    if self._classes is None:
+      self._classes = {}
+      def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+          if isinstance(child, ast.ClassDef):
+            lineno = child.lineno
+            if child.decorator_list:
+              lineno = child.decorator_list[0].lineno
+            # Like inspect, use the first definition of a name.
+            self._classes.setdefault(prefix + child.name, lineno)
+            visit(child, prefix + child.name + '.')
+          elif isinstance(child, (ast.FunctionDef, getattr(ast, 'AsyncFunctionDef', ast.FunctionDef))):
+            visit(child, prefix + child.name + '.<locals>.')
+          else:
+            visit(child, prefix)
+      visit(ast.parse(self._read(), self.filename), '')
+    return self._classes
+
+
+def _filename_in_linecache(filename):
+  return filename in linecache.cache and len(linecache.cache[filename]) == 4
+
+
+def _source_encoding(data):
+  try:
+    from tokenize import detect_encoding
+  except ImportError:
+    return 'utf8'  # Python 2, source files are ASCII unless declared.
+  return detect_encoding(io.BytesIO(data).readline)[0]
+
+
+#: The #_SourceFile#s by filename, and the filenames of modules by name.
+#: See #source_lineno().
+_source_files = {}
+_module_files = {}
+
+
+def _source_file(filename):
+  try:
+    return _source_files[filename]
+  except KeyError:
+    pass
+  source = None
+  if filename and (_filename_in_linecache(filename) or
+                   (filename.endswith('.py') and os.path.isfile(filename))):
+    try:
+      source = _SourceFile(filename)
+    except (IOError, OSError, SyntaxError, UnicodeDecodeError, ValueError):
+      pass
+  _source_files[filename] = source
+  return source
+
+
+def _module_file(name):
+  try:
+    return _module_files[name]
+  except KeyError:
+    pass
+  try:
+    filename = inspect.getsourcefile(sys.modules[name])
+  except (KeyError, TypeError):
+    filename = None
+  _module_files[name] = filename
+  return filename
+
+
+def clear_source_cache():
+  """
+  Forgets the line numbers that #source_lineno() read from source files, eg.
+  after the files changed.
+  """
+
+  _source_files.clear()
+  _module_files.clear()
+
+
+def source_lineno(obj):
+  """
+  Returns the line number of the definition of *obj*, like
+  `inspect.getsourcelines(obj)[1]`, or #None if it can not be retrieved.
+  Instead of searching for the definition in the source code for every
+  object, the line numbers of functions are taken from their code object and
+  those of classes from a table of the classes in their module's source
+  file, which is built only once for every file.
+  """
+
+  try:
+    obj = inspect.unwrap(obj)
+  except (AttributeError, ValueError):
+    pass
+  if inspect.ismethod(obj):
+    obj = obj.__func__
+  lineno = None
+  if inspect.isfunction(obj):
+    code = obj.__code__
+    source = _source_file(code.co_filename)
+    if source is not None and 0 < code.co_firstlineno <= source.num_lines:
+      lineno = code.co_firstlineno
+  elif isinstance(obj, type) and _CLASS_LINES:
+    source = _source_file(_module_file(getattr(obj, '__module__', None)))
+    if source is not None:
+      if _CLASS_LINES == 'firstlineno':
+        lineno = vars(obj).get('__firstlineno__')
+        if lineno is None or lineno > source.num_lines:
+          return None
+      else:
+        lineno = source.classes.get(getattr(obj, '__qualname__', None))
+  if lineno is not None:
+    return lineno
+  try:
+    return inspect.getsourcelines(obj)[1]
+  except Exception:
+    return None
+
+
+# Since Python 3.9, inspect locates classes by their qualified name with the
+# ast module and reports the line of their first decorator. Since 3.13, it
+# uses the __firstlineno__ of the class, which classes implemented in C lack.
+if sys.version_info >= (3, 13):
+  _CLASS_LINES = 'firstlineno'
+elif sys.version_info >= (3, 9):
+  _CLASS_LINES = 'ast'
+else:
+  _CLASS_LINES = None
 
 
 def import_object(name):
@@ -57,6 +283,13 @@ def import_object_with_scope(name):
     tuple may be the same object.
   """
 
+  if profiler.enabled:
+    with profiler.attribute(name):
+      return _import_object_with_scope(name)
+  return _import_object_with_scope(name)
+
+
+def _import_object_with_scope(name):
   # Import modules until we can no longer import them. Prefer existing
   # attributes over importing modules at each step.
   parts = name.split('.')
@@ -90,43 +323,155 @@ def force_lazy_import(name):
         import_object(name + '.' + key)
 
 
+class SymbolGraph(object):
+  """
+  Builds the tree of documentable members of Python objects. Every object is
+  walked at most once, no matter how many names it is reached by or how
+  often its members are requested, which keeps index building linear in the
+  number of symbols.
+
+  # Attributes
+  visits (int): The number of objects that have been walked.
+  """
+
+  def __init__(self):
+    self.visits = 0
+    self._objects = {}
+    self._nodes = {}
+
+  def resolve(self, name):
+    """
+    Returns the object for the absolute identifier *name*. Members of objects
+    that have already been walked are not imported again by their full name.
+    """
+
+    try:
+      return self._objects[name]
+    except KeyError:
+      pass
+    parent_name, _, key = name.rpartition('.')
+    parent = self._objects.get(parent_name)
+    obj = None
+    if parent is not None and id(parent) in self._nodes:
+      obj = getattr(parent, key, None)
+    if obj is None:
+      obj = import_object(name)
+    self._objects[name] = obj
+    return obj
+
+  def members(self, name, sort_order, need_docstrings=True):
+    """
+    Returns the names of the members of the object *name* that should be
+    documented. See #dir_object() for the meaning of the arguments.
+    """
+
+    node = self._node(self.resolve(name), name)
+    by_name = []
+    by_lineno = []
+    for member in node.members:
+      if node.prefix is not None and member.module != node.prefix:
+        continue
+      # If we have a type, we only want to skip it if it doesn't have
+      # any documented members.
+      if not (member.is_type and self._has_documented_members(member)):
+        if need_docstrings and not member.has_doc: continue
+        if node.all is not None and member.key not in node.all: continue
+      if sort_order == 'line':
+        lineno = member.lineno()
+        if lineno is None:
+          by_name.append(member.key)
+        else:
+          by_lineno.append((member.key, lineno))
+      else:
+        by_name.append(member.key)
+    by_name = sorted(by_name, key=lambda s: s.lower())
+    by_lineno = [key for key, lineno in sorted(by_lineno, key=lambda r: r[1])]
+    return by_name + by_lineno
+
+  def _node(self, obj, name):
+    try:
+      return self._nodes[id(obj)]
+    except KeyError:
+      pass
+    self.visits += 1
+    node = self._nodes[id(obj)] = _SymbolNode(obj, name)
+    for member in node.members:
+      if member.is_type:
+        self._objects.setdefault(member.name, member.value)
+    return node
+
+  def _has_documented_members(self, member):
+    if member.documented is None:
+      # Guard against reference cycles between classes.
+      member.documented = False
+      node = self._node(member.value, member.name)
+      member.documented = any(
+        (node.prefix is None or m.module == node.prefix) and (
+          (m.is_type and self._has_documented_members(m)) or
+          (m.has_doc and (node.all is None or m.key in node.all)))
+        for m in node.members)
+    return member.documented
+
+
+class _SymbolNode(object):
+
+  def __init__(self, obj, name):
+    self.obj = obj
+    self.prefix = obj.__name__ if isinstance(obj, types.ModuleType) else None
+    self.all = getattr(obj, '__all__', None)
+
+    # Resolve any lazily imported members first, otherwise the object will
+    # change while we iterate over it (see #force_lazy_import()).
+    for key, value in list(getattr(obj, '__dict__', {}).items()):
+      if getattr(value, '__module__', None):
+        try:
+          getattr(obj, key)
+        except AttributeError:
+          import_object(name + '.' + key)
+
+    self.members = []
+    for key, value in getattr(obj, '__dict__', {}).items():
+      if isinstance(value, (staticmethod, classmethod)):
+        value = value.__func__
+      if key.startswith('_'): continue
+      if not hasattr(value, '__doc__'): continue
+      self.members.append(_SymbolMember(name + '.' + key, key, value))
+
+
+class _SymbolMember(object):
+
+  def __init__(self, name, key, value):
+    self.name = name
+    self.key = key
+    self.value = value
+    self.is_type = isinstance(value, type)
+    self.has_doc = bool(value.__doc__)
+    self.module = getattr(value, '__module__', None)
+    self.documented = None
+    self._lineno = False
+
+  def lineno(self):
+    if self._lineno is False:
+      # some members don't have (retrievable) line numbers (e.g., properties)
+      # so fall back to sorting those first, and by name
+      self._lineno = source_lineno(self.value)
+    return self._lineno
+
+
 def dir_object(name, sort_order, need_docstrings=True):
-  prefix = None
-  obj = import_object(name)
-  if isinstance(obj, types.ModuleType):
-    prefix = obj.__name__
-  all = getattr(obj, '__all__', None)
-
-  # Import any modules attached to this object so that this will work with lazy imports.  Otherwise
-  # the block below will fail because the object will change while it's being iterated.
-  force_lazy_import(name)
-
-  by_name = []
-  by_lineno = []
-  for key, value in getattr(obj, '__dict__', {}).items():
-    if isinstance(value, (staticmethod, classmethod)):
-      value = value.__func__
-    if key.startswith('_'): continue
-    if not hasattr(value, '__doc__'): continue
-
-    # If we have a type, we only want to skip it if it doesn't have
-    # any documented members.
-    if not (isinstance(value, type) and dir_object(name + '.' + key, sort_order, True)):
-      if need_docstrings and not value.__doc__: continue
-      if all is not None and key not in all: continue
-
-    if prefix is not None and getattr(value, '__module__', None) != prefix:
-      continue
-    if sort_order == 'line':
-      try:
-        by_lineno.append((key, inspect.getsourcelines(value)[1]))
-      except Exception:
-        # some members don't have (retrievable) line numbers (e.g., properties)
-        # so fall back to sorting those first, and by name
-        by_name.append(key)
-    else:
-      by_name.append(key)
-  by_name = sorted(by_name, key=lambda s: s.lower())
-  by_lineno = [key for key, lineno in sorted(by_lineno, key=lambda r: r[1])]
-
-  return by_name + by_lineno
+  """
+  Returns the names of the members of the object *name* that should be
+  documented with the `+` syntax.
+
+  # Arguments
+  name (str): The absolute identifier of the object.
+  sort_order (str): Either `'line'` or `'name'`. Members without a line
+    number are sorted by name before all others.
+  need_docstrings (bool): Skip members that have no docstring. Classes with
+    documented members are always included.
+
+  # Returns
+  list of str: The names of the members, relative to *name*.
+  """
+
+  return SymbolGraph().members(name, sort_order, need_docstrings)
@@ -0,0 +1,320 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the #sys.meta_path hooks that are used while the
+documentation is loaded: the #ImportProfiler (`--imports`), which measures
+how long importing every module takes and which documented object caused
+it, and the #StubFinder (`mock_modules` option), which replaces modules with
+stubs so that documenting a package doesn't import its heavy dependencies.
+"""
+
+from __future__ import print_function
+
+import sys
+import types
+
+try:
+  import importlib.util as importlib_util
+except ImportError:
+  importlib_util = None  # Python 2
+
+from .trace import clock
+
+
+class _NullContext(object):
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _Owner(object):
+
+  def __init__(self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+
+  def __enter__(self):
+    self.profiler.owner = self.name
+    return self
+
+  def __exit__(self, *exc_info):
+    self.profiler.owner = None
+    return False
+
+
+class _TimedLoader(object):
+  """
+  Wraps the loader of a module spec to measure the time spent executing
+  the module. The original loader is restored on the module afterwards.
+  """
+
+  def __init__(self, profiler, loader):
+    self._profiler = profiler
+    self._loader = loader
+
+  def __getattr__(self, name):
+    return getattr(self._loader, name)
+
+  def create_module(self, spec):
+    return self._loader.create_module(spec)
+
+  def exec_module(self, module):
+    module.__loader__ = self._loader
+    spec = getattr(module, '__spec__', None)
+    if spec is not None:
+      spec.loader = self._loader
+    self._profiler._exec_module(self._loader, module)
+
+
+class ImportProfiler(object):
+  """
+  A #sys.meta_path finder that measures the time spent executing every
+  module that is imported while it is enabled, like `python -X importtime`.
+  Imports are attributed to the documented object that was being imported
+  when they happened, see #attribute(). Only available on Python 3.
+
+  # Attributes
+  enabled (bool): Whether the profiler is installed.
+  owner (str): The object that imports are currently attributed to.
+  modules (dict): Maps module names to their cumulative (including the
+    modules that they import) and self time in seconds.
+  owners (dict): Maps object names to the time spent importing modules
+    for them and the number of these modules.
+  """
+
+  def __init__(self):
+    self.enabled = False
+    self.owner = None
+    self.modules = {}
+    self.owners = {}
+    self._stack = []
+
+  def enable(self):
+    if not self.enabled and importlib_util is not None:
+      sys.meta_path.insert(0, self)
+      self.enabled = True
+
+  def disable(self):
+    if self.enabled:
+      sys.meta_path.remove(self)
+      self.enabled = False
+
+  def attribute(self, name):
+    """
+    Returns a context manager in which imports are attributed to the object
+    *name*, unless they are already attributed to another object.
+    """
+
+    if not self.enabled or self.owner is not None:
+      return _NULL_CONTEXT
+    return _Owner(self, name)
+
+  def find_spec(self, fullname, path=None, target=None):
+    for finder in sys.meta_path:
+      if finder is self or not hasattr(finder, 'find_spec'):
+        continue
+      spec = finder.find_spec(fullname, path, target)
+      if spec is not None:
+        if hasattr(spec.loader, 'exec_module'):
+          spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+    return None
+
+  def _exec_module(self, loader, module):
+    start = clock()
+    self._stack.append(0.0)
+    try:
+      loader.exec_module(module)
+    finally:
+      elapsed = clock() - start
+      children = self._stack.pop()
+      self.modules[module.__name__] = (elapsed, elapsed - children)
+      if self._stack:
+        self._stack[-1] += elapsed
+      owner = self.owners.setdefault(self.owner or '(pydocmd)', [0.0, 0])
+      owner[1] += 1
+      if not self._stack:
+        owner[0] += elapsed
+
+  def report(self, count, stream=sys.stderr):
+    """
+    Prints the *count* objects that took the longest to import and the
+    *count* modules with the highest self time.
+    """
+
+    print('Import cost by object:', file=stream)
+    ranked = sorted(self.owners.items(), key=lambda x: -x[1][0])[:count]
+    for name, (seconds, modules) in ranked:
+      print('  {:>9.3f}s  {} ({} modules)'.format(seconds, name, modules), file=stream)
+    print('Slowest imported modules:', file=stream)
+    ranked = sorted(self.modules.items(), key=lambda x: -x[1][1])[:count]
+    for name, (cumulative, self_time) in ranked:
+      print('  {:>9.3f}s  {} (cumulative {:.3f}s)'.format(self_time, name, cumulative),
+            file=stream)
+
+
+#: The profiler that is enabled with the `--imports` option.
+profiler = ImportProfiler()
+
+
+class Stub(object):
+  """
+  An object of a stubbed module. Every attribute of a stub is another stub,
+  calling a stub returns a new stub, except if it is used as a decorator,
+  in which case the decorated function or class is returned unchanged.
+  Classes that inherit from a stub inherit from a plain class instead.
+  """
+
+  __doc__ = None
+
+  def __new__(cls, *args, **kwargs):
+    # Subclassing a stub on Python versions without __mro_entries__.
+    if len(args) == 3 and isinstance(args[1], tuple) and isinstance(args[2], dict):
+      bases = tuple(b._stub_class() if isinstance(b, Stub) else b for b in args[1])
+      return type(args[0], bases, args[2])
+    return object.__new__(cls)
+
+  def __init__(self, name):
+    self._stub_name = name
+    self._stub_type = None
+
+  def __getattr__(self, key):
+    if key.startswith('__') and key.endswith('__'):
+      raise AttributeError(key)
+    value = Stub(self._stub_name + '.' + key)
+    setattr(self, key, value)
+    return value
+
+  def __call__(self, *args, **kwargs):
+    if len(args) == 1 and not kwargs and isinstance(args[0], (types.FunctionType, type)):
+      return args[0]
+    return Stub(self._stub_name + '()')
+
+  def __mro_entries__(self, bases):
+    return (self._stub_class(),)
+
+  def _stub_class(self):
+    if self._stub_type is None:
+      module, _, name = self._stub_name.rpartition('.')
+      self._stub_type = type(name, (object,), {'__module__': module, '__doc__': None})
+    return self._stub_type
+
+  def __getitem__(self, key):
+    return self
+
+  def __or__(self, other):
+    return self
+
+  __ror__ = __or__
+
+  def __iter__(self):
+    return iter(())
+
+  def __repr__(self):
+    return '<stub {}>'.format(self._stub_name)
+
+
+class StubModule(types.ModuleType):
+  """
+  A stubbed module, all of its attributes are #Stub#s.
+  """
+
+  def __init__(self, name):
+    types.ModuleType.__init__(self, name)
+    self.__path__ = []
+    self.__all__ = []
+
+  def __getattr__(self, key):
+    if key.startswith('__') and key.endswith('__'):
+      raise AttributeError(key)
+    value = Stub(self.__name__ + '.' + key)
+    setattr(self, key, value)
+    return value
+
+
+class StubFinder(object):
+  """
+  A #sys.meta_path finder that imports a #StubModule for the modules *names*
+  and their submodules instead of the actual modules.
+
+  # Attributes
+  names (set of str): The names of the stubbed modules.
+  stubbed (list of str): The modules that have been stubbed so far.
+  """
+
+  def __init__(self, names):
+    self.names = set(names)
+    self.stubbed = []
+
+  def matches(self, fullname):
+    parts = fullname.split('.')
+    return any('.'.join(parts[:i]) in self.names for i in range(1, len(parts) + 1))
+
+  def find_spec(self, fullname, path=None, target=None):
+    if not self.matches(fullname):
+      return None
+    return importlib_util.spec_from_loader(fullname, self, is_package=True)
+
+  def create_module(self, spec):
+    return StubModule(spec.name)
+
+  def exec_module(self, module):
+    self.stubbed.append(module.__name__)
+
+  # Python 2 finder and loader protocol.
+
+  def find_module(self, fullname, path=None):
+    return self if self.matches(fullname) else None
+
+  def load_module(self, fullname):
+    if fullname not in sys.modules:
+      module = sys.modules[fullname] = StubModule(fullname)
+      module.__loader__ = self
+      self.stubbed.append(fullname)
+    return sys.modules[fullname]
+
+
+def install_stubs(names):
+  """
+  Installs a #StubFinder for the modules *names* (a list or a comma
+  separated string, as per the `mock_modules` option), unless *names* is
+  empty. Modules that have already been imported are not replaced.
+
+  # Returns
+  StubFinder, None: The installed finder.
+  """
+
+  if isinstance(names, str):
+    names = [x.strip() for x in names.split(',')]
+  names = [x for x in names or () if x]
+  if not names:
+    return None
+  for finder in sys.meta_path:
+    if isinstance(finder, StubFinder) and finder.names == set(names):
+      return finder
+  finder = StubFinder(names)
+  sys.meta_path.insert(0, finder)
+  return finder
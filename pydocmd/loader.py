@@ -25,8 +25,10 @@ that name, but is not supposed to apply preprocessing.
 """
 
 from __future__ import print_function
-from .imp import import_object_with_scope
+from .imp import import_object_with_scope, source_lineno, SymbolGraph
+from .static import StaticImporter, format_signature
 import inspect
+import os
 import types
 
 function_types = (types.FunctionType, types.LambdaType, types.MethodType,
@@ -61,6 +63,7 @@ class PythonLoader(object):
   """
   def __init__(self, config):
     self.config = config
+    self.graph = SymbolGraph()
 
   def load_section(self, section):
     """
@@ -90,6 +93,138 @@ class PythonLoader(object):
       sig = get_function_signature(obj, scope if inspect.isclass(scope) else None)
       section.content = '```python\n{}\n```\n'.format(sig) + section.content
 
+  def dir_object(self, name, sort_order, need_docstrings=True):
+    """
+    Returns the names of the members of the object *name* that are to be
+    documented with the `+` syntax. See #pydocmd.imp.dir_object().
+    """
+
+    return self.graph.members(name, sort_order, need_docstrings)
+
+  def object_key(self, identifier):
+    """
+    Returns a key that identifies the module, class or function
+    *identifier* independent of the name it is imported by, or #None for
+    other objects and objects that can not be imported.
+    """
+
+    try:
+      obj = import_object_with_scope(identifier)[0]
+    except Exception:
+      return None
+    if inspect.ismodule(obj):
+      return obj.__name__
+    if inspect.isclass(obj) or inspect.isfunction(obj):
+      qualname = getattr(obj, '__qualname__', None)
+      if qualname and '<locals>' not in qualname:
+        return '{}.{}'.format(obj.__module__, qualname)
+    return None
+
+  def source_file(self, identifier):
+    """
+    Returns the name of the source file that defines the object
+    *identifier*, or #None if it can not be determined.
+    """
+
+    obj, scope = import_object_with_scope(identifier)
+    for value in (obj, scope):
+      try:
+        filename = inspect.getsourcefile(value)
+      except TypeError:
+        continue
+      if filename:
+        return os.path.abspath(filename)
+    return None
+
+  def source_line(self, identifier):
+    """
+    Returns the line number of the definition of the object *identifier*
+    in its #source_file(), or #None if it can not be determined.
+    """
+
+    obj = import_object_with_scope(identifier)[0]
+    if isinstance(obj, property):
+      obj = obj.fget
+    if inspect.ismodule(obj):
+      return 1
+    return source_lineno(obj)
+
+
+class StaticLoader(object):
+  """
+  Like the #PythonLoader, but reads docstrings, signatures and members from
+  the Python source files with the #ast module instead of importing them.
+  Use it with `loader: pydocmd.loader.StaticLoader` when importing the
+  documented modules is expensive or has side effects.
+  """
+
+  def __init__(self, config):
+    self.config = config
+    self.importer = StaticImporter()
+
+  def load_section(self, section):
+    """
+    Loads the contents of a #Section, see #PythonLoader.load_section().
+    The `section.loader_context` contains #pydocmd.static.StaticObject#s.
+    """
+
+    assert section.identifier is not None
+    obj, scope = self.importer.resolve(section.identifier)
+
+    if obj.kind == 'module':
+      section.title = obj.qualname
+    elif obj.kind == 'data':
+      section.title = section.identifier.rsplit('.', 1)[-1]
+    else:
+      section.title = obj.name
+    section.content = trim(obj.docstring)
+    section.loader_context = {'obj': obj, 'scope': scope}
+
+    if obj.is_callable:
+      owner = scope if scope is not None and scope.is_class else None
+      sig = format_signature(obj, owner)
+      section.content = '```python\n{}\n```\n'.format(sig) + section.content
+
+  def dir_object(self, name, sort_order, need_docstrings=True):
+    """
+    Returns the names of the members of the object *name* that are to be
+    documented with the `+` syntax. See
+    #pydocmd.static.StaticImporter.dir_object().
+    """
+
+    return self.importer.dir_object(name, sort_order, need_docstrings)
+
+  def object_key(self, identifier):
+    """
+    Returns the name that the module, class or function *identifier* is
+    defined by (following imports), or #None for other objects and names
+    that can not be resolved. See #PythonLoader.object_key().
+    """
+
+    try:
+      obj = self.importer.resolve(identifier)[0]
+    except ImportError:
+      return None
+    if obj.kind in ('module', 'class', 'function'):
+      return obj.qualname
+    return None
+
+  def source_file(self, identifier):
+    """
+    Returns the name of the source file that defines the object
+    *identifier*, or #None for namespace packages.
+    """
+
+    filename = self.importer.resolve(identifier)[0].filename
+    return os.path.abspath(filename) if filename else None
+
+  def source_line(self, identifier):
+    """
+    Returns the line number of the definition of the object *identifier*.
+    """
+
+    return self.importer.resolve(identifier)[0].lineno
+
 
 def get_docstring(function):
   if hasattr(function, '__name__') or isinstance(function, property):
@@ -120,7 +255,11 @@ def get_function_signature(function, owner_class=None, show_module=False):
   if isclass:
     function = getattr(function, '__init__', None)
   if hasattr(inspect, 'signature'):
-    sig = str(inspect.signature(function))
+    try:
+      sig = str(inspect.signature(function))
+    except ValueError:
+      # Builtins without signature information.
+      sig = '(...)'
   else:
     try:
       argspec = inspect.getargspec(function)
@@ -0,0 +1,202 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module runs `pydocmd build` and `pydocmd gh-deploy` in-process with
+the MkDocs Python API (MkDocs 1.0 and newer). The MkDocs configuration is
+derived from the pydoc-markdown configuration without a temporary
+`mkdocs.yml`, and the generated documents are handed to MkDocs from
+memory by the #GeneratedPages plugin.
+
+Importing this module raises an #ImportError if MkDocs is not installed or
+too old, in which case the `mkdocs` command is run instead.
+"""
+
+from __future__ import print_function
+
+import io
+import logging
+import os
+import sys
+
+from mkdocs.commands import build
+from mkdocs.config import load_config
+from mkdocs.exceptions import MkDocsException
+from mkdocs.plugins import BasePlugin
+from mkdocs.structure.files import File
+
+#: The options of `mkdocs build` and `mkdocs gh-deploy` that are supported
+#: in-process, and where they go: the MkDocs configuration, #build.build()
+#: or #gh_deploy(). Flags are mapped to their value.
+_OPTIONS = {
+  '-c': ('build', 'dirty', False), '--clean': ('build', 'dirty', False),
+  '--dirty': ('build', 'dirty', True),
+  '-s': ('config', 'strict', True), '--strict': ('config', 'strict', True),
+  '-d': ('config', 'site_dir', None), '--site-dir': ('config', 'site_dir', None),
+  '-t': ('config', 'theme', None), '--theme': ('config', 'theme', None),
+  '-q': ('log', 'level', logging.ERROR), '--quiet': ('log', 'level', logging.ERROR),
+  '-v': ('log', 'level', logging.DEBUG), '--verbose': ('log', 'level', logging.DEBUG),
+}
+_DEPLOY_OPTIONS = {
+  '-m': ('deploy', 'message', None), '--message': ('deploy', 'message', None),
+  '-b': ('config', 'remote_branch', None), '--remote-branch': ('config', 'remote_branch', None),
+  '-r': ('config', 'remote_name', None), '--remote-name': ('config', 'remote_name', None),
+  '--force': ('deploy', 'force', True),
+}
+
+# MkDocs 1.6 can keep files in memory, older versions read the source of
+# every page from its file unless a plugin provides it.
+_GENERATED_FILES = hasattr(File, 'generated')
+
+
+def parse_options(command, subargs):
+  """
+  Parses the MkDocs command-line options *subargs* of *command* (`build`
+  or `gh-deploy`).
+
+  # Returns
+  dict, None: The options by where they go (`config`, `build`, `deploy` and
+  `log`), or #None if *subargs* contain options that are only supported by
+  the `mkdocs` command.
+  """
+
+  known = dict(_OPTIONS)
+  if command == 'gh-deploy':
+    known.update(_DEPLOY_OPTIONS)
+  elif command != 'build':
+    return None
+  options = {'config': {}, 'build': {}, 'deploy': {}, 'log': {}}
+  it = iter(subargs)
+  for value in it:
+    name, _, arg = value.partition('=')
+    if name not in known:
+      return None
+    group, key, flag = known[name]
+    if flag is None:
+      if not arg:
+        try: arg = next(it)
+        except StopIteration: return None
+      options[group][key] = arg
+    elif arg:
+      return None
+    else:
+      options[group][key] = flag
+  return options
+
+
+def mkdocs_config(config):
+  """
+  Returns the MkDocs configuration for the pydoc-markdown *config*, like
+  #pydocmd.__main__.write_temp_mkdocs_config().
+  """
+
+  result = {key: config[key] for key in ('site_name', 'site_dir', 'theme')}
+  result['docs_dir'] = config['gens_dir']
+  for key in ('markdown_extensions', 'repo_url'):
+    if key in config:
+      result[key] = config[key]
+  if 'pages' in config:
+    result['nav'] = config['pages']
+  return result
+
+
+class GeneratedPages(BasePlugin):
+  """
+  A MkDocs plugin that adds the generated documents *pages* (a dictionary
+  that maps filenames relative to the `docs_dir` to their content) to the
+  files of the site, replacing files of the same name.
+  """
+
+  def __init__(self, pages):
+    BasePlugin.__init__(self)
+    self.pages = {os.path.normpath(k): v for k, v in pages.items()}
+
+  def on_files(self, files, config, **kwargs):
+    for fname in self.pages:
+      existing = files.get_file_from_path(fname)
+      if existing is not None:
+        files.remove(existing)
+      if _GENERATED_FILES:
+        files.append(File.generated(config, fname.replace(os.sep, '/'),
+                                    content=self.pages[fname]))
+      else:
+        files.append(File(fname, config['docs_dir'], config['site_dir'],
+                          config['use_directory_urls']))
+    return files
+
+  if not _GENERATED_FILES:
+    def on_page_read_source(self, page, config, **kwargs):
+      return self.pages.get(os.path.normpath(page.file.src_path))
+
+
+def _log_handler(level):
+  handler = logging.StreamHandler(sys.stderr)
+  handler.setFormatter(logging.Formatter('%(levelname)-7s -  %(message)s'))
+  logger = logging.getLogger('mkdocs')
+  logger.addHandler(handler)
+  logger.setLevel(level)
+  logger.propagate = False
+  return handler
+
+
+def run(command, config, pages, options, log=print):
+  """
+  Runs the MkDocs *command* (`build` or `gh-deploy`) with the *options*
+  from #parse_options().
+
+  # Arguments
+  command (str): The command to run.
+  config (dict): The pydoc-markdown configuration. It is used if *pages* is
+    specified, otherwise MkDocs reads `mkdocs.yml`.
+  pages (dict): The generated documents by filename, or #None if they have
+    been written to the `gens_dir` (and `mkdocs.yml` is used).
+  options (dict): See #parse_options().
+  log (callable): Used to report errors.
+
+  # Returns
+  int: The exit code.
+  """
+
+  handler = _log_handler(options['log'].get('level', logging.INFO))
+  try:
+    if pages is None:
+      mkconfig = load_config(**options['config'])
+    else:
+      overrides = mkdocs_config(config)
+      overrides.update(options['config'])
+      mkconfig = load_config(io.StringIO(u'{}'), **overrides)
+      mkconfig['plugins']['pydocmd-pages'] = GeneratedPages(pages)
+    dirty = options['build'].get('dirty', False)
+    plugins = mkconfig['plugins']
+    if hasattr(plugins, 'on_startup'):
+      plugins.on_startup(command=command, dirty=dirty)
+    try:
+      build.build(mkconfig, dirty=dirty)
+    finally:
+      if hasattr(plugins, 'on_shutdown'):
+        plugins.on_shutdown()
+    if command == 'gh-deploy':
+      from mkdocs.commands import gh_deploy
+      gh_deploy.gh_deploy(mkconfig, **options['deploy'])
+  except MkDocsException as exc:
+    log('Error: {}'.format(exc))
+    return 1
+  finally:
+    logging.getLogger('mkdocs').removeHandler(handler)
+  return 0
@@ -0,0 +1,293 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the sinks that generated documents are written to:
+a directory (the `gens_dir`), a single tar or zip archive
+(`pydocmd generate -o docs.tar.gz`) or memory. A #BackgroundWriter applies
+the writes to a sink in a separate thread, so that writing overlaps with
+loading the next documents.
+"""
+
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+try:
+  import queue
+except ImportError:
+  import Queue as queue  # Python 2
+
+from .sync import _replace, _temp_file, sync_file, write_file_if_changed
+
+#: The archive formats of #ArchiveSink by filename suffix.
+ARCHIVE_FORMATS = {
+  '.tar': 'w|', '.tar.gz': 'w|gz', '.tgz': 'w|gz', '.tar.bz2': 'w|bz2',
+  '.tar.xz': 'w|xz', '.zip': 'zip',
+}
+
+
+def archive_format(filename):
+  """
+  Returns the format of the archive *filename* (see #ARCHIVE_FORMATS), or
+  #None if it is not the name of a supported archive.
+  """
+
+  for suffix, mode in ARCHIVE_FORMATS.items():
+    if filename.endswith(suffix):
+      return mode
+  return None
+
+
+class Sink(object):
+  """
+  The interface of the sinks. Filenames are relative to the root of the
+  sink and use forward slashes.
+
+  # Attributes
+  written (int): The number of documents written.
+  changed (int): The number of documents whose content changed.
+  """
+
+  def __init__(self):
+    self.written = 0
+    self.changed = 0
+
+  def read(self, fname):
+    """
+    Returns the current content of the document *fname*, or #None.
+    """
+
+    return None
+
+  def write(self, fname, content):
+    """
+    Writes the document *fname* with the string *content*.
+    """
+
+    raise NotImplementedError
+
+  def copy(self, src, fname):
+    """
+    Adds the file *src* as *fname*.
+    """
+
+    raise NotImplementedError
+
+  def close(self):
+    pass
+
+
+class DirectorySink(Sink):
+  """
+  Writes documents to files in *directory*. Files that already have the
+  right content are not touched, see #write_file_if_changed().
+  """
+
+  def __init__(self, directory, copy_mode='copy'):
+    Sink.__init__(self)
+    self.directory = directory
+    self.copy_mode = copy_mode
+
+  def _path(self, fname):
+    return os.path.join(self.directory, os.path.normpath(fname))
+
+  def read(self, fname):
+    try:
+      with open(self._path(fname)) as fp:
+        return fp.read()
+    except (IOError, OSError, UnicodeDecodeError):
+      return None
+
+  def write(self, fname, content):
+    self.written += 1
+    if write_file_if_changed(self._path(fname), content):
+      self.changed += 1
+
+  def copy(self, src, fname):
+    dst = self._path(fname)
+    if not os.path.isdir(os.path.dirname(dst)):
+      os.makedirs(os.path.dirname(dst))
+    sync_file(src, dst, self.copy_mode)
+
+
+class ArchiveSink(Sink):
+  """
+  Streams documents into a tar or zip archive *filename* (see
+  #ARCHIVE_FORMATS). The archive is written to a temporary file and moved
+  into place on #close().
+
+  # Raises
+  ValueError: If *filename* is not the name of a supported archive.
+  """
+
+  def __init__(self, filename):
+    Sink.__init__(self)
+    self.filename = filename
+    self.format = archive_format(filename)
+    if self.format is None:
+      raise ValueError('unsupported archive: {!r}'.format(filename))
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+      os.makedirs(dirname)
+    self._tmpname = _temp_file(filename)
+    if self.format == 'zip':
+      self._archive = zipfile.ZipFile(self._tmpname, 'w', zipfile.ZIP_DEFLATED)
+    else:
+      self._archive = tarfile.open(self._tmpname, self.format)
+    self._closed = False
+
+  def write(self, fname, content):
+    data = content.encode('utf8')
+    if self.format == 'zip':
+      info = zipfile.ZipInfo(fname, time.localtime()[:6])
+      info.compress_type = zipfile.ZIP_DEFLATED
+      info.external_attr = 0o644 << 16
+      self._archive.writestr(info, data)
+    else:
+      info = tarfile.TarInfo(fname)
+      info.size = len(data)
+      info.mtime = int(time.time())
+      info.mode = 0o644
+      self._archive.addfile(info, io.BytesIO(data))
+    self.written += 1
+    self.changed += 1
+
+  def copy(self, src, fname):
+    if self.format == 'zip':
+      self._archive.write(src, fname)
+    else:
+      self._archive.add(src, fname, recursive=False)
+
+  def close(self, discard=False):
+    """
+    Completes the archive and moves it to its filename, or removes it if
+    *discard* is #True.
+    """
+
+    if self._closed:
+      return
+    self._closed = True
+    self._archive.close()
+    if discard:
+      os.remove(self._tmpname)
+    else:
+      _replace(self._tmpname, self.filename)
+
+
+class MemorySink(Sink):
+  """
+  Keeps the documents in memory, for use of pydoc-markdown as a library.
+
+  # Attributes
+  files (dict): Maps filenames to the content of the documents (strings)
+    and copied files (bytes).
+  """
+
+  def __init__(self):
+    Sink.__init__(self)
+    self.files = {}
+
+  def read(self, fname):
+    content = self.files.get(fname)
+    return content if isinstance(content, str) else None
+
+  def write(self, fname, content):
+    self.written += 1
+    if self.files.get(fname) != content:
+      self.changed += 1
+    self.files[fname] = content
+
+  def copy(self, src, fname):
+    with open(src, 'rb') as fp:
+      self.files[fname] = fp.read()
+
+
+class BackgroundWriter(object):
+  """
+  Applies the writes to a *sink* in a background thread. Writes are queued
+  (at most *max_pending*, after which #write() blocks) and applied in
+  batches. The first error is raised from the next #write() or #close().
+  #read() goes straight to the sink.
+  """
+
+  def __init__(self, sink, max_pending=64):
+    self.sink = sink
+    self._queue = queue.Queue(max_pending)
+    self._error = None
+    self._thread = threading.Thread(target=self._run, name='pydocmd-writer')
+    self._thread.daemon = True
+    self._thread.start()
+
+  @property
+  def written(self):
+    return self.sink.written
+
+  @property
+  def changed(self):
+    return self.sink.changed
+
+  def _run(self):
+    while True:
+      batch = [self._queue.get()]
+      try:
+        while True:
+          batch.append(self._queue.get_nowait())
+      except queue.Empty:
+        pass
+      for item in batch:
+        if item is None:
+          return
+        if self._error is None:
+          try:
+            getattr(self.sink, item[0])(*item[1:])
+          except Exception as exc:
+            self._error = exc
+
+  def _check(self):
+    if self._error is not None:
+      raise self._error
+
+  def read(self, fname):
+    return self.sink.read(fname)
+
+  def write(self, fname, content):
+    self._check()
+    self._queue.put(('write', fname, content))
+
+  def copy(self, src, fname):
+    self._check()
+    self._queue.put(('copy', src, fname))
+
+  def close(self):
+    """
+    Applies the remaining writes, stops the thread and closes the sink.
+    """
+
+    if self._thread.is_alive():
+      self._queue.put(None)
+      self._thread.join()
+    if self._error is not None:
+      if isinstance(self.sink, ArchiveSink):
+        self.sink.close(discard=True)
+      raise self._error
+    self.sink.close()
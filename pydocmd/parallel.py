@@ -0,0 +1,179 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements loading and preprocessing sections in a pool of
+worker processes (`pydocmd generate -j N`). Every worker rebuilds the
+structure of the #Index, loads and preprocesses the sections that it is
+given and sends back their title, content and references, which are then
+merged into the #Index of the parent process in the original order.
+"""
+
+import multiprocessing
+import sys
+
+from .build import add_placeholder_sections, generate_sections
+from .document import Index
+from .imp import import_object
+from .importhooks import install_stubs
+from .preprocessor import load_preprocessor
+from .trace import tracer
+
+#: The maximum number of sections that are sent to a worker at once.
+CHUNK_SIZE = 32
+
+_worker = None
+
+
+def cpu_count():
+  try:
+    return multiprocessing.cpu_count()
+  except NotImplementedError:
+    return 1
+
+
+def index_layout(index):
+  """
+  Returns a picklable description of the structure of *index* from which
+  #index_from_layout() can rebuild it (without any section contents).
+  """
+
+  return [(fname, doc.url, [(s.identifier, s.depth) for s in doc.sections])
+          for fname, doc in index.documents.items()]
+
+
+def placeholder_layout(index):
+  """
+  Returns the layout of the sections of *index* that are not part of a
+  document in `index.documents`, see #add_placeholder_sections().
+  """
+
+  documents = set(id(doc) for doc in index.documents.values())
+  layout = {}
+  for section in index.sections.values():
+    doc = section.doc
+    if doc is not None and id(doc) not in documents:
+      if id(doc) not in layout:
+        layout[id(doc)] = (doc.filename, doc.url, [])
+      layout[id(doc)][2].append((section.identifier, section.depth))
+  return list(layout.values())
+
+
+def index_from_layout(layout):
+  index = Index()
+  for fname, url, sections in layout:
+    doc = index.new_document(fname, url)
+    for identifier, depth in sections:
+      index.new_section(doc, identifier, depth=depth)
+  return index
+
+
+class _Worker(object):
+
+  def __init__(self, config, layout, placeholders):
+    install_stubs(config.get('mock_modules'))
+    self.index = index_from_layout(layout)
+    add_placeholder_sections(self.index, placeholders)
+    self.loader = import_object(config['loader'])(config)
+    self.preproc = load_preprocessor(config)
+
+  def __call__(self, task):
+    fname, indices = task
+    doc = self.index.documents[fname]
+    result = []
+    for i in indices:
+      section = doc.sections[i]
+      generate_sections([section], self.loader, self.preproc, loader_context='drop')
+      result.append((section.title, section.content, section.references))
+    return result, tracer.drain(), self._drain_memo()
+
+  def _drain_memo(self):
+    # The hits and misses of the PreprocessorMemo since the last task.
+    preproc = self.preproc
+    if not hasattr(preproc, 'hits'):
+      return (0, 0)
+    counts = (preproc.hits, preproc.misses)
+    preproc.hits = preproc.misses = 0
+    return counts
+
+
+def _init_worker(config, layout, placeholders, path, trace_epoch):
+  global _worker
+  sys.path[:] = path
+  if trace_epoch is not None:
+    tracer.enable(trace_epoch)
+  _worker = _Worker(config, layout, placeholders)
+
+
+def _run_task(task):
+  return _worker(task)
+
+
+def load_sections(index, sections, config, jobs, progress=None, callback=None,
+                  memo=None):
+  """
+  Loads and preprocesses *sections*, which must all be part of *index*, in
+  *jobs* worker processes and stores the title, content and references in
+  the sections of *index*. The `loader_context` of these sections is #None
+  afterwards. If the #tracer is enabled, the events of the workers are
+  added to it.
+  *progress* and *callback* are used as in #generate_sections(). The hits
+  and misses of the #PreprocessorMemo of the workers are added to *memo*.
+  """
+
+  positions = {}
+  for doc in index.documents.values():
+    for i, section in enumerate(doc.sections):
+      positions[id(section)] = i
+
+  # Split the sections into chunks that belong to the same document.
+  fnames = {id(doc): fname for fname, doc in index.documents.items()}
+  tasks = []
+  chunk_sections = []
+  for section in sections:
+    fname = fnames[id(section.doc)]
+    if not tasks or tasks[-1][0] != fname or len(tasks[-1][1]) >= CHUNK_SIZE:
+      tasks.append((fname, []))
+      chunk_sections.append([])
+    tasks[-1][1].append(positions[id(section)])
+    chunk_sections[-1].append(section)
+
+  trace_epoch = tracer.epoch if tracer.enabled else None
+  pool = multiprocessing.Pool(jobs, _init_worker,
+    (config, index_layout(index), placeholder_layout(index), list(sys.path),
+     trace_epoch))
+  try:
+    for chunk, (results, events, counts) in zip(chunk_sections, pool.imap(_run_task, tasks)):
+      for section, (title, content, references) in zip(chunk, results):
+        section.title = title
+        section.content = content
+        section.references = references
+        section.loader_context = None
+        if callback is not None:
+          callback(section)
+      tracer.events.extend(events)
+      if memo is not None:
+        memo.hits += counts[0]
+        memo.misses += counts[1]
+      if progress is not None:
+        progress.update(len(chunk))
+    pool.close()
+  finally:
+    pool.terminate()
+    pool.join()
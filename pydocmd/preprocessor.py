@@ -24,6 +24,68 @@ it to fully markdown compatible markup.
 
 import re
 
+from collections import OrderedDict
+
+from .document import Section
+from .imp import import_object
+
+# How to render the lines of a section that declare an argument, attribute,
+# exception or return type, by the lower-case section title.
+_DECLARATION_STYLES = {
+  'arguments': '- __{0}__:{1}',
+  'parameters': '- __{0}__:{1}',
+  'attributes': '- `{0}`:{1}',
+  'members': '- `{0}`:{1}',
+  'raises': '- `{0}`:{1}',
+  'returns': '`{0}`:{1}',
+}
+
+_RUN_END = re.compile(r'[\\:]')
+_WHITESPACE = re.compile(r'\s*')
+_REF = re.compile(r'(?:(?<=[ \t])|^)#(::|\d*~)?([\w.]+)(\(\))?(?:#(\w+))?')
+
+
+def match_declaration(line):
+  r"""
+  Matches a declaration line of the form `ident [(types)]: text`. This is
+  equivalent to searching for the regular expression
+
+      \s*([^\\:]+)(\s*\(.+\))?:(.*)$
+
+  in *line* (which must not contain newlines), except that it runs in
+  linear time. The regular expression backtracks heavily on long lines
+  without a colon.
+
+  # Returns
+  (int, str, str): The index where the match starts, the identifier and
+    the text after the colon, or #None if the line does not match.
+  """
+
+  n = len(line)
+  last_pair = line.rfind('):')
+  pos = 0
+  while pos < n:
+    match = _RUN_END.search(line, pos)
+    end = match.start() if match else n
+    if end > pos:
+      # The identifier can only be part of the run of characters that are
+      # neither colons nor backslashes. Leading whitespace is skipped, but
+      # the identifier must contain at least one character.
+      ident_start = _WHITESPACE.match(line, pos, end).end()
+      if end < n and line[end] == ':':
+        if ident_start == end:
+          ident_start -= 1
+        return pos, line[ident_start:end], line[end + 1:]
+      if last_pair >= 0:
+        # The identifier is followed by a parenthesized part that ends with
+        # the last "):" in the line.
+        paren = line.rfind('(', pos, min(end, last_pair - 1))
+        if paren > ident_start or (paren == ident_start and ident_start > pos):
+          ident_start = min(ident_start, paren - 1)
+          return pos, line[ident_start:paren], line[last_pair + 2:]
+    pos = end + 1
+  return None
+
 
 class Preprocessor(object):
   """
@@ -37,49 +99,218 @@ class Preprocessor(object):
     """
     Preprocess the contents of *section*.
     """
-    lines = []
+
+    if section.references is None:
+      section.references = []
+    if '#' not in section.content:
+      return  # No headers and no references, nothing to do.
+    lines = section.content.split('\n')
+    section.content = '\n'.join(self.preprocess_lines(lines, section))
+
+  def preprocess_sections(self, sections):
+    """
+    Preprocesses all *sections*, see #preprocess_sections().
+    """
+
+    for section in sections:
+      self.preprocess_section(section)
+
+  def preprocess_lines(self, lines, section=None):
+    """
+    Converts the Markdown-like docstring *lines* in a single pass. Section
+    headers and declarations in argument lists are only transformed outside
+    of code blocks, cross-references are transformed everywhere. References
+    are linked if they can be resolved in the index of *section*, and added
+    to `section.references`.
+    """
+
+    if section is not None and section.references is None:
+      section.references = []
     codeblock_opened = False
     current_section = None
-    for line in section.content.split('\n'):
-      if line.startswith("```"):
-        codeblock_opened = (not codeblock_opened)
+    style = None
+    first = True
+    for line in lines:
+      if line.startswith('```'):
+        codeblock_opened = not codeblock_opened
       if not codeblock_opened:
-        line, current_section = self._preprocess_line(line, current_section)
-      lines.append(line)
-    section.content = self._preprocess_refs('\n'.join(lines))
-
-  def _preprocess_line(self, line, current_section):
-    match = re.match(r'# (.*)$', line)
-    if match:
-      current_section = match.group(1).strip().lower()
-      line = re.sub(r'# (.*)$', r'__\1__\n', line)
-
-    # TODO: Parse type names in parentheses after the argument/attribute name.
-    if current_section in ('arguments', 'parameters'):
-      style = r'- __\1__:\3'
-    elif current_section in ('attributes', 'members', 'raises'):
-      style = r'- `\1`:\3'
-    elif current_section in ('returns',):
-      style = r'`\1`:\3'
-    else:
-      style = None
-    if style:
-      #                  | ident  | types     | doc
-      line = re.sub(r'\s*([^\\:]+)(\s*\(.+\))?:(.*)$', style, line)
+        suffix = ''
+        if line.startswith('# '):
+          current_section = line[2:].strip().lower()
+          style = _DECLARATION_STYLES.get(current_section)
+          line = '__' + line[2:] + '__'
+          suffix = '\n'
+        if style:
+          match = match_declaration(line)
+          if match:
+            line = line[:match[0]] + style.format(match[1], match[2])
+        line += suffix
+      if '#' in line:
+        line = self._preprocess_refs(line, first, section)
+      first = False
+      yield line
 
-    return line, current_section
+  def _preprocess_refs(self, line, first_line, section=None):
+    resolver = None
+    scope = None
+    if section is not None and section.doc is not None:
+      resolver = section.index.resolver
+      scope = section.identifier
 
-  def _preprocess_refs(self, content):
-    # TODO: Generate links to the referenced symbols.
     def handler(match):
-      ref = match.group('ref')
-      parens = match.group('parens') or ''
+      if match.start() == 0 and not first_line:
+        # Only the start of the whole docstring counts as a word boundary.
+        return match.group(0)
+      prefix, ref, parens, suffix = match.groups()
+      parens = parens or ''
       has_trailing_dot = False
-      if not parens and ref.endswith('.'):
+      if not parens and not suffix and ref.endswith('.'):
         ref = ref[:-1]
         has_trailing_dot = True
-      result = '`{}`'.format(ref + parens)
+      name = ref
+      if prefix and prefix != '::':
+        keep = int(prefix[:-1] or 1)
+        name = '.'.join(ref.split('.')[-keep:])
+      result = '`{}`'.format(name + parens) + (suffix or '')
+      if resolver is not None:
+        section.references.append((ref, prefix == '::'))
+        target = resolver.resolve(ref, scope, absolute=(prefix == '::'))
+        if target is not None:
+          result = '[{}]({})'.format(result, resolver.link(target, section.doc))
       if has_trailing_dot:
         result += '.'
-      return (match.group('prefix') or '') + result
-    return re.sub('(?P<prefix>^| |\t)#(?P<ref>[\w\d\._]+)(?P<parens>\(\))?', handler, content)
+      return result
+    return _REF.sub(handler, line)
+
+
+class PreprocessorChain(object):
+  """
+  Runs several preprocessors (*stages*) one after another as a single pass
+  over the lines of every docstring. The lines of a section are split and
+  joined only once: every stage with a `preprocess_lines(lines, section)`
+  method consumes the lines that the previous stage yields. Other stages
+  are passed the section, which costs them a join and a split.
+
+  Used if the `preprocessor` option is a list, see #load_preprocessor().
+  """
+
+  def __init__(self, stages):
+    self.stages = list(stages)
+    self._funcs = [getattr(stage, 'preprocess_lines', None) for stage in self.stages]
+
+  def preprocess_section(self, section):
+    self.preprocess_sections([section])
+
+  def preprocess_sections(self, sections):
+    """
+    Preprocesses all *sections*, see #preprocess_sections().
+    """
+
+    for section in sections:
+      lines = section.content.split('\n')
+      section.content = '\n'.join(self.preprocess_lines(lines, section))
+
+  def preprocess_lines(self, lines, section=None):
+    for stage, func in zip(self.stages, self._funcs):
+      if func is not None:
+        lines = func(lines, section)
+      else:
+        if section is None:
+          section = Section(None)
+        section.content = '\n'.join(lines)
+        stage.preprocess_section(section)
+        lines = section.content.split('\n')
+    return lines
+
+
+class PreprocessorMemo(object):
+  """
+  Remembers the result of the preprocessor *preproc* for the last *size*
+  distinct docstrings and reuses it for sections with the same content, as
+  large code bases repeat many docstrings (overridden methods, generated
+  classes, "See base class."). Every memo belongs to one preprocessor
+  instance, so its configuration is part of the key implicitly.
+
+  Docstrings with cross-references are only memoized for sections outside
+  of an #Index, as the references are resolved relative to the section. The
+  title of the section is not memoized.
+
+  # Attributes
+  hits (int): The number of sections that were taken from the memo.
+  misses (int): The number of sections that could have been taken from the
+    memo, but were preprocessed.
+  """
+
+  def __init__(self, preproc, size):
+    self.preproc = preproc
+    self.size = size
+    self.hits = 0
+    self.misses = 0
+    self._results = OrderedDict()
+
+  def preprocess_section(self, section):
+    content = section.content
+    if '#' in content and section.doc is not None and _REF.search(content):
+      self.preproc.preprocess_section(section)
+      return
+    results = self._results
+    result = results.pop(content, None)
+    if result is None:
+      self.misses += 1
+      self.preproc.preprocess_section(section)
+      # Memoized docstrings have no resolved references, but remember if
+      # the preprocessor reports them at all.
+      result = (section.content, section.references is not None)
+      if len(results) >= self.size:
+        results.popitem(last=False)
+    else:
+      self.hits += 1
+      section.content = result[0]
+      if result[1] and section.references is None:
+        section.references = []
+    results[content] = result
+
+  def preprocess_sections(self, sections):
+    for section in sections:
+      self.preprocess_section(section)
+
+  def summary(self):
+    """
+    Returns a line that reports the hit rate, for the build summary.
+    """
+
+    total = self.hits + self.misses
+    return 'Preprocessor memo: {} hits, {} misses ({:.0%} hit rate)'.format(
+      self.hits, self.misses, float(self.hits) / total if total else 0)
+
+
+def load_preprocessor(config):
+  """
+  Creates the preprocessor named by the `preprocessor` option of *config*,
+  or a #PreprocessorChain if it is a list of names. If the `preprocess_memo`
+  option is set, it is wrapped in a #PreprocessorMemo of that size.
+  """
+
+  names = config['preprocessor']
+  if not isinstance(names, (list, tuple)):
+    names = [names]
+  stages = [import_object(name)(config) for name in names]
+  preproc = stages[0] if len(stages) == 1 else PreprocessorChain(stages)
+  if config.get('preprocess_memo'):
+    preproc = PreprocessorMemo(preproc, int(config['preprocess_memo']))
+  return preproc
+
+
+def preprocess_sections(preproc, sections):
+  """
+  Preprocesses all *sections* with *preproc*. Preprocessors may implement a
+  `preprocess_sections()` method to handle many sections at once, otherwise
+  `preprocess_section()` is called for every section.
+  """
+
+  func = getattr(preproc, 'preprocess_sections', None)
+  if func is not None:
+    func(sections)
+  else:
+    for section in sections:
+      preproc.preprocess_section(section)
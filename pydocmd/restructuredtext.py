@@ -24,6 +24,26 @@ it to fully markdown compatible markup.
 
 import re
 
+from .docstyle import detect_style
+
+# A field of a field list, eg. `:param int x: text`: the field name, its
+# argument and the text.
+_FIELD = re.compile(r':(\w+)(?:[ \t]+([^:]*?))?[ \t]*:(.*)$')
+
+# The section that the fields are listed in, by field name. Fields whose
+# name is not in here (or in _TYPE_FIELDS) are left alone.
+_SECTIONS = {
+  'param': 'Arguments', 'parameter': 'Arguments', 'arg': 'Arguments',
+  'argument': 'Arguments', 'key': 'Keyword Arguments',
+  'keyword': 'Keyword Arguments', 'raise': 'Raises', 'raises': 'Raises',
+  'except': 'Raises', 'exception': 'Raises', 'return': 'Returns',
+  'returns': 'Returns', 'ivar': 'Attributes', 'var': 'Attributes',
+  'cvar': 'Attributes',
+}
+
+# Fields that declare the type of another field.
+_TYPE_FIELDS = ('type', 'vartype', 'rtype')
+
 
 class Preprocessor(object):
   """
@@ -34,67 +54,111 @@ class Preprocessor(object):
 
   def preprocess_section(self, section):
     """
-    Preprocessors a given section into it's components.
+    Preprocessors a given section into it's components. Docstrings without
+    reST fields are left untouched. This preprocessor resolves no
+    cross-references, so it leaves `section.references` empty.
     """
-    lines = []
+    if section.references is None:
+      section.references = []
+    if detect_style(section.content) != 'rest':
+      return
+    section.content = '\n'.join(self.preprocess_lines(section.content.split('\n')))
+
+  def preprocess_sections(self, sections):
+    """
+    Preprocesses all *sections*.
+    """
+    for section in sections:
+      self.preprocess_section(section)
+
+  def preprocess_lines(self, lines, section=None):
+    """
+    Converts the reST docstring *lines* and returns the list of lines. The
+    fields are matched with a single pattern and dispatched on their name.
+    """
+    if section is not None and section.references is None:
+      section.references = []
+    lines = list(lines)
+    result = []
     in_codeblock = False
-    keyword = None
+    found = False
+    current = None
     components = {}
-    for line in section.content.split('\n'):
+    order = []
+    types = {}
+    rtype = None
+    for line in lines:
       line = line.strip()
 
       if line.startswith("```"):
         in_codeblock = not in_codeblock
 
-      if not in_codeblock:
-        match = re.match(r':(?:param|parameter)\s+(\w+)\s*:(.*)?$', line)
-        if match:
-          keyword = 'Arguments'
-          param = match.group(1)
-          text = match.group(2)
-          text = text.strip()
-
-          component = components.get(keyword, [])
-          component.append('- `{}`: {}'.format(param, text))
-          components[keyword] = component
-          continue
-
-        match = re.match(r':(?:return|returns)\s*:(.*)?$', line)
-        if match:
-          keyword = 'Returns'
-          text = match.group(1)
-          text = text.strip()
-
-          component = components.get(keyword, [])
-          component.append(text)
-          components[keyword] = component
-          continue
-
-        match = re.match(':(?:raises|raise)\s+(\w+)\s*:(.*)?$', line)
-        if match:
-          keyword = 'Raises'
-          exception = match.group(1)
-          text = match.group(2)
-          text = text.strip()
-
-          component = components.get(keyword, [])
-          component.append('- `{}`: {}'.format(exception, text))
-          components[keyword] = component
+      if not in_codeblock and line.startswith(':'):
+        match = _FIELD.match(line)
+        field = match.group(1) if match else None
+        arg = (match.group(2) or '').split() if match else ()
+        if field in _TYPE_FIELDS and (arg or field == 'rtype'):
+          found = True
+          # Continuation lines are folded into the type.
+          current = [None, None, [match.group(3).strip()]]
+          if field == 'rtype':
+            rtype = current[2]
+            key = 'Returns'
+          else:
+            key = 'Attributes' if field == 'vartype' else 'Arguments'
+            types[key, arg[-1]] = current[2]
+            continue
+        elif field in _SECTIONS and (arg or _SECTIONS[field] == 'Returns'):
+          found = True
+          key = _SECTIONS[field]
+          name = arg[-1] if arg and key != 'Returns' else None
+          type_ = ' '.join(arg[:-1]) or None
+          current = [name, type_, [match.group(3).strip()]]
+        else:
+          key = None
+        if key is not None:
+          if key not in components:
+            components[key] = []
+            order.append(key)
+          if field != 'rtype':
+            components[key].append(current)
           continue
 
-      if keyword is not None:
-        components[keyword].append(line)
+      if current is not None:
+        current[2].append(line)
       else:
-        lines.append(line)
+        result.append(line)
 
-    for key in components:
-      self._append_section(lines, key, components)
+    if not found:
+      return lines
+    for key in order:
+      self._append_section(result, key, self._render(key, components[key], types, rtype))
+    return result
 
-    section.content = '\n'.join(lines)
+  @staticmethod
+  def _render(key, entries, types, rtype):
+    rtype = rtype and ' '.join(filter(None, rtype))
+    lines = []
+    for name, type_, text in entries:
+      if name is None:
+        first = text[0]
+        if key == 'Returns' and rtype:
+          first = '`{}`: {}'.format(rtype, first) if first else '`{}`'.format(rtype)
+      else:
+        type_ = type_ or ' '.join(filter(None, types.get(
+          ('Attributes' if key == 'Attributes' else 'Arguments', name), ())))
+        if type_:
+          first = '- `{}` (`{}`): {}'.format(name, type_, text[0])
+        else:
+          first = '- `{}`: {}'.format(name, text[0])
+      lines.append(first)
+      lines.extend(text[1:])
+    if not lines and key == 'Returns' and rtype:
+      lines.append('`{}`'.format(rtype))
+    return lines
 
   @staticmethod
-  def _append_section(lines, key, sections):
-    section = sections.get(key)
+  def _append_section(lines, key, section):
     if not section:
       return
 
@@ -0,0 +1,460 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module provides utilities for reading Python objects from their source
+code with the #ast module, without importing them. It is the counterpart of
+#pydocmd.imp for the #pydocmd.loader.StaticLoader.
+"""
+
+import ast
+import io
+import os
+import sys
+
+try:
+  from collections import OrderedDict
+except ImportError:
+  OrderedDict = dict
+
+_function_nodes = (ast.FunctionDef,)
+if hasattr(ast, 'AsyncFunctionDef'):
+  _function_nodes += (ast.AsyncFunctionDef,)
+
+_MAX_ALIAS_DEPTH = 32
+
+
+class StaticObject(object):
+  """
+  Represents a Python object as it was found in the source code.
+
+  # Attributes
+  kind (str): One of `'module'`, `'class'`, `'function'`, `'property'`,
+    `'data'` or `'alias'`.
+  name (str): The name of the object inside its parent.
+  qualname (str): The absolute dotted name of the object.
+  module (str): The name of the module that defines the object.
+  filename (str, None): The source file that defines the object.
+  lineno (int, None): The line number of the definition. For decorated
+    functions and classes, this is the line of the first decorator (which
+    matches what #inspect.getsourcelines() reports).
+  docstring (str, None): The raw docstring of the object.
+  node (ast.AST, None): The AST node of the definition.
+  members (OrderedDict): The members of modules and classes.
+  decorators (list of str): The names of the decorators of a function.
+  all (list of str, None): The `__all__` of a module, if statically known.
+  target (str, None): For aliases, the absolute name that is referenced.
+  """
+
+  def __init__(self, kind, name, qualname, module, filename=None,
+               lineno=None, docstring=None, node=None):
+    self.kind = kind
+    self.name = name
+    self.qualname = qualname
+    self.module = module
+    self.filename = filename
+    self.lineno = lineno
+    self.docstring = docstring
+    self.node = node
+    self.members = OrderedDict()
+    self.decorators = []
+    self.all = None
+    self.target = None
+    self.is_package = False
+
+  def __repr__(self):
+    return '<StaticObject {} {!r}>'.format(self.kind, self.qualname)
+
+  @property
+  def is_class(self):
+    return self.kind == 'class'
+
+  @property
+  def is_callable(self):
+    return self.kind in ('class', 'function')
+
+
+class StaticImporter(object):
+  """
+  Locates and parses Python source files on #sys.path without importing
+  them. Every file is parsed at most once.
+  """
+
+  def __init__(self, path=None):
+    self.path = path
+    self._modules = {}
+
+  def find_module_file(self, name):
+    """
+    Finds the source file of the module *name*. Parent packages are looked
+    up the same way, nothing is imported.
+
+    # Returns
+    (str, bool): The filename and whether the module is a package. The
+      filename is #None for namespace packages.
+
+    # Raises
+    ImportError: If the module source could not be found.
+    """
+
+    parts = name.split('.')
+    search_path = self.path if self.path is not None else sys.path
+    for i, part in enumerate(parts):
+      found = None
+      namespace_dirs = []
+      for directory in search_path:
+        directory = directory or '.'
+        pkgdir = os.path.join(directory, part)
+        initfile = os.path.join(pkgdir, '__init__.py')
+        if os.path.isfile(initfile):
+          found = (initfile, True, [pkgdir])
+          break
+        modfile = os.path.join(directory, part + '.py')
+        if os.path.isfile(modfile):
+          found = (modfile, False, [])
+          break
+        if os.path.isdir(pkgdir):
+          namespace_dirs.append(pkgdir)
+      if found is None and namespace_dirs:
+        found = (None, True, namespace_dirs)
+      if found is None or (i < len(parts) - 1 and not found[1]):
+        raise ImportError('No module named {}'.format('.'.join(parts[:i+1])))
+      search_path = found[2]
+    return found[0], found[1]
+
+  def module(self, name):
+    """
+    Returns the #StaticObject for the module *name*.
+
+    # Raises
+    ImportError: If the module source could not be found.
+    """
+
+    try:
+      return self._modules[name]
+    except KeyError:
+      pass
+    filename, is_package = self.find_module_file(name)
+    module = StaticObject('module', name.rpartition('.')[2], name, name,
+                          filename, lineno=1)
+    module.is_package = is_package
+    if filename is not None:
+      with io.open(filename, 'rb') as fp:
+        tree = ast.parse(fp.read(), filename)
+      module.node = tree
+      module.docstring = ast.get_docstring(tree, clean=False)
+      _ModuleBuilder(module, is_package).visit_body(tree.body, module)
+    self._modules[name] = module
+    return module
+
+  def resolve(self, name, _depth=0):
+    """
+    Resolves the absolute identifier *name* to a #StaticObject, following
+    aliases created by import statements.
+
+    # Returns
+    (StaticObject, StaticObject): The object and the object that contains
+      it, like #pydocmd.imp.import_object_with_scope().
+
+    # Raises
+    ImportError: If *name* can not be resolved.
+    """
+
+    if _depth > _MAX_ALIAS_DEPTH:
+      raise ImportError('alias chain too deep resolving {}'.format(name))
+    parts = name.split('.')
+    current_name = parts[0]
+    obj = self.module(current_name)
+    scope = None
+    for part in parts[1:]:
+      current_name += '.' + part
+      member = obj.members.get(part)
+      if member is not None and member.kind == 'alias':
+        try:
+          member = self.resolve(member.target, _depth + 1)[0]
+        except ImportError:
+          member = None
+      if member is not None:
+        scope, obj = obj, member
+      elif obj.kind == 'module' and obj.is_package:
+        obj = scope = self.module(current_name)
+      else:
+        raise ImportError(current_name)
+    return obj, scope
+
+  def dir_object(self, name, sort_order, need_docstrings=True):
+    """
+    The static equivalent of #pydocmd.imp.dir_object(). Only functions,
+    classes, properties and variables that are followed by a docstring
+    are taken into account, as the value of other variables can not be
+    determined without executing the code.
+    """
+
+    obj = self.resolve(name)[0]
+    prefix = obj.qualname if obj.kind == 'module' else None
+    all = obj.all if obj.kind == 'module' else None
+
+    by_name = []
+    by_lineno = []
+    for key, value in obj.members.items():
+      if key.startswith('_'): continue
+      if value.kind == 'alias': continue
+      if value.kind == 'data' and not value.docstring: continue
+      if not (value.is_class and self.dir_object(name + '.' + key, sort_order, True)):
+        if need_docstrings and not value.docstring: continue
+        if all is not None and key not in all: continue
+      if prefix is not None and value.module != prefix:
+        continue
+      if sort_order == 'line' and value.kind != 'property' and value.lineno:
+        by_lineno.append((key, value.lineno))
+      else:
+        by_name.append(key)
+    by_name = sorted(by_name, key=lambda s: s.lower())
+    by_lineno = [key for key, lineno in sorted(by_lineno, key=lambda r: r[1])]
+
+    return by_name + by_lineno
+
+
+class _ModuleBuilder(object):
+  """
+  Collects the members of a module or class body into #StaticObject#s.
+  """
+
+  def __init__(self, module, is_package):
+    self.module = module
+    self.is_package = is_package
+
+  def visit_body(self, body, parent):
+    previous = None
+    for stmt in body:
+      if isinstance(stmt, ast.Expr) and previous is not None and \
+          _is_string(stmt.value):
+        # Attribute docstring, eg. a string literal following an assignment.
+        previous.docstring = _string_value(stmt.value)
+        previous = None
+        continue
+      previous = None
+      if isinstance(stmt, _function_nodes):
+        self.add_function(stmt, parent)
+      elif isinstance(stmt, ast.ClassDef):
+        self.add_class(stmt, parent)
+      elif isinstance(stmt, ast.Assign):
+        previous = self.add_assign(stmt, stmt.targets, parent)
+      elif getattr(ast, 'AnnAssign', None) and isinstance(stmt, ast.AnnAssign):
+        previous = self.add_assign(stmt, [stmt.target], parent)
+      elif isinstance(stmt, ast.AugAssign):
+        self.add_augassign(stmt, parent)
+      elif parent.kind == 'module' and isinstance(stmt, ast.Import):
+        for alias in stmt.names:
+          if alias.asname:
+            self.add_alias(alias.asname, alias.name, stmt, parent)
+          else:
+            top = alias.name.partition('.')[0]
+            self.add_alias(top, top, stmt, parent)
+      elif parent.kind == 'module' and isinstance(stmt, ast.ImportFrom):
+        base = self.resolve_relative(stmt.module, stmt.level or 0)
+        for alias in stmt.names:
+          if alias.name == '*': continue
+          target = base + '.' + alias.name if base else alias.name
+          self.add_alias(alias.asname or alias.name, target, stmt, parent)
+      elif isinstance(stmt, ast.If):
+        # We can't tell which branch is taken, assume the first one is (so
+        # we visit it last and its definitions take precedence).
+        self.visit_body(stmt.orelse, parent)
+        self.visit_body(stmt.body, parent)
+      else:
+        # Same for try/except, where the handlers are usually fallbacks.
+        for handler in getattr(stmt, 'handlers', None) or []:
+          self.visit_body(handler.body, parent)
+        for field in ('body', 'orelse', 'finalbody'):
+          sub = getattr(stmt, field, None)
+          if isinstance(sub, list):
+            self.visit_body(sub, parent)
+
+  def resolve_relative(self, modname, level):
+    if not level:
+      return modname
+    parts = self.module.qualname.split('.')
+    if not self.is_package:
+      parts = parts[:-1]
+    if level > 1:
+      parts = parts[:-(level - 1)]
+    base = '.'.join(parts)
+    if modname:
+      base = base + '.' + modname if base else modname
+    return base
+
+  def new_object(self, kind, name, node, parent):
+    obj = StaticObject(kind, name, parent.qualname + '.' + name,
+                       self.module.qualname, self.module.filename,
+                       lineno=getattr(node, 'lineno', None), node=node)
+    decorators = getattr(node, 'decorator_list', None)
+    if decorators:
+      obj.lineno = min(obj.lineno, min(d.lineno for d in decorators))
+      obj.decorators = [_dotted_name(d) for d in decorators]
+    parent.members[name] = obj
+    return obj
+
+  def add_function(self, node, parent):
+    kind = 'function'
+    decorators = [_dotted_name(d) for d in node.decorator_list]
+    if parent.kind == 'class':
+      if 'property' in decorators or 'cached_property' in decorators \
+          or 'functools.cached_property' in decorators:
+        kind = 'property'
+      elif any(d.endswith(('.setter', '.getter', '.deleter')) for d in decorators):
+        # The property object keeps the docstring of the getter.
+        existing = parent.members.get(node.name)
+        if existing is not None and existing.kind == 'property':
+          return
+    obj = self.new_object(kind, node.name, node, parent)
+    obj.docstring = ast.get_docstring(node, clean=False)
+
+  def add_class(self, node, parent):
+    obj = self.new_object('class', node.name, node, parent)
+    obj.docstring = ast.get_docstring(node, clean=False)
+    self.visit_body(node.body, obj)
+
+  def add_assign(self, node, targets, parent):
+    result = None
+    for target in targets:
+      if isinstance(target, ast.Name):
+        if parent.kind == 'module' and target.id == '__all__':
+          parent.all = _string_list(getattr(node, 'value', None))
+          continue
+        result = self.new_object('data', target.id, node, parent)
+    return result
+
+  def add_augassign(self, node, parent):
+    if parent.kind == 'module' and isinstance(node.target, ast.Name) and \
+        node.target.id == '__all__' and isinstance(node.op, ast.Add):
+      extra = _string_list(node.value)
+      if parent.all is not None and extra is not None:
+        parent.all = parent.all + extra
+
+  def add_alias(self, name, target, node, parent):
+    obj = StaticObject('alias', name, parent.qualname + '.' + name,
+                       self.module.qualname, self.module.filename,
+                       lineno=node.lineno, node=node)
+    obj.target = target
+    parent.members[name] = obj
+
+
+def _is_string(node):
+  if hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+    return isinstance(node.value, str)
+  return isinstance(node, getattr(ast, 'Str', ()))
+
+
+def _string_value(node):
+  return node.value if hasattr(ast, 'Constant') and \
+    isinstance(node, ast.Constant) else node.s
+
+
+def _string_list(node):
+  if not isinstance(node, (ast.List, ast.Tuple)):
+    return None
+  if not all(_is_string(x) for x in node.elts):
+    return None
+  return [_string_value(x) for x in node.elts]
+
+
+def _dotted_name(node):
+  if isinstance(node, ast.Call):
+    node = node.func
+  parts = []
+  while isinstance(node, ast.Attribute):
+    parts.append(node.attr)
+    node = node.value
+  if isinstance(node, ast.Name):
+    parts.append(node.id)
+  return '.'.join(reversed(parts))
+
+
+def _source(node):
+  if hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+    return repr(node.value)
+  if hasattr(ast, 'unparse'):
+    return ast.unparse(node)
+  return '...'
+
+
+def format_signature(obj, owner_class=None):
+  """
+  Formats the signature of a function or class #StaticObject like
+  #pydocmd.loader.get_function_signature() would for the imported object.
+  """
+
+  name_parts = []
+  if owner_class is not None:
+    name_parts.append(owner_class.name)
+  name_parts.append(obj.name)
+  name = '.'.join(name_parts)
+
+  skip_first = False
+  function = obj
+  if obj.kind == 'class':
+    function = obj.members.get('__init__')
+    if function is None or function.kind != 'function':
+      return name + '(self, /, *args, **kwargs)'
+  elif owner_class is not None and 'classmethod' in obj.decorators:
+    skip_first = True
+
+  return name + _format_arguments(function.node, skip_first)
+
+
+def _format_arguments(node, skip_first=False):
+  args = node.args
+  result = []
+
+  def arg(a, default=None):
+    if isinstance(a, str):
+      return a
+    text = getattr(a, 'arg', None) or getattr(a, 'id', '')
+    annotation = getattr(a, 'annotation', None)
+    if annotation is not None:
+      text += ': ' + _source(annotation)
+      if default is not None:
+        text += ' = ' + _source(default)
+    elif default is not None:
+      text += '=' + _source(default)
+    return text
+
+  posonly = list(getattr(args, 'posonlyargs', []))
+  positional = posonly + list(args.args)
+  defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+  for i, (a, default) in enumerate(zip(positional, defaults)):
+    if i == 0 and skip_first:
+      continue
+    result.append(arg(a, default))
+    if posonly and i == len(posonly) - 1:
+      result.append('/')
+  if args.vararg:
+    result.append('*' + arg(args.vararg))
+  elif getattr(args, 'kwonlyargs', None):
+    result.append('*')
+  for a, default in zip(getattr(args, 'kwonlyargs', []), getattr(args, 'kw_defaults', [])):
+    result.append(arg(a, default))
+  if args.kwarg:
+    result.append('**' + arg(args.kwarg))
+
+  sig = '(' + ', '.join(result) + ')'
+  if getattr(node, 'returns', None) is not None:
+    sig += ' -> ' + _source(node.returns)
+  return sig
@@ -0,0 +1,222 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements incrementally mirroring files into the `gens_dir`.
+Files are only copied (or linked) if they changed, and files that are no
+longer produced by the build can be pruned.
+"""
+
+import filecmp
+import os
+import shutil
+import tempfile
+
+try:
+  from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+  ThreadPoolExecutor = None
+
+#: The supported values for the `copy_mode` configuration key.
+COPY_MODES = ('copy', 'hardlink', 'symlink')
+
+#: Below this number of files, copying in parallel is not worth it.
+PARALLEL_THRESHOLD = 64
+
+
+# mkstemp() creates files that only the owner can read, but the files that
+# we write should get the usual permissions.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _temp_file(dst):
+  # A new file next to *dst* that is moved into its place with _replace().
+  # Its name is unique, so that threads writing the same *dst* don't share it.
+  fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(dst) or '.',
+                                 prefix='.' + os.path.basename(dst) + '.', suffix='.tmp')
+  os.close(fd)
+  os.chmod(tmpname, 0o666 & ~_UMASK)
+  return tmpname
+
+
+def _replace(tmpname, dst):
+  if hasattr(os, 'replace'):
+    os.replace(tmpname, dst)
+  else:
+    if os.name == 'nt' and os.path.lexists(dst):
+      os.remove(dst)
+    os.rename(tmpname, dst)
+
+
+def _same_file(src, dst, src_stat):
+  try:
+    dst_stat = os.lstat(dst)
+  except OSError:
+    return False
+  if os.path.islink(dst):
+    return False
+  if dst_stat.st_size != src_stat.st_size:
+    return False
+  if dst_stat.st_mtime == src_stat.st_mtime:
+    return True
+  if filecmp.cmp(src, dst, shallow=False):
+    # Same content, only the timestamp is off (eg. after a checkout).
+    os.utime(dst, (src_stat.st_atime, src_stat.st_mtime))
+    return True
+  return False
+
+
+def sync_file(src, dst, mode='copy'):
+  """
+  Makes *dst* a copy of (or a link to) *src*, unless it already is one. The
+  destination is replaced atomically, which also makes sure that we never
+  write through a hardlink into the source file.
+
+  # Arguments
+  src (str): The source filename.
+  dst (str): The destination filename. Parent directories must exist.
+  mode (str): One of #COPY_MODES. Hardlinks fall back to copying if the
+    files are on different devices.
+
+  # Returns
+  bool: #True if *dst* was updated, #False if it was already up to date.
+
+  # Raises
+  ValueError: If *mode* is invalid.
+  """
+
+  if mode not in COPY_MODES:
+    raise ValueError('invalid copy mode: {!r}'.format(mode))
+
+  if mode == 'symlink':
+    target = os.path.abspath(src)
+    if os.path.islink(dst) and os.readlink(dst) == target:
+      return False
+    tmpname = _temp_file(dst)
+    os.remove(tmpname)
+    os.symlink(target, tmpname)
+    _replace(tmpname, dst)
+    return True
+
+  if mode == 'hardlink':
+    if os.path.exists(dst) and not os.path.islink(dst) and os.path.samefile(src, dst):
+      return False
+    tmpname = _temp_file(dst)
+    os.remove(tmpname)
+    try:
+      os.link(src, tmpname)
+    except (OSError, AttributeError):
+      pass  # Fall back to copying.
+    else:
+      _replace(tmpname, dst)
+      return True
+
+  if _same_file(src, dst, os.stat(src)):
+    return False
+  tmpname = _temp_file(dst)
+  try:
+    shutil.copy2(src, tmpname)
+    _replace(tmpname, dst)
+  except BaseException:
+    os.remove(tmpname)
+    raise
+  return True
+
+
+def sync_files(pairs, mode='copy', jobs=1):
+  """
+  Calls #sync_file() for every `(src, dst)` pair in *pairs*, creating the
+  parent directories of the destination files as necessary. If *jobs* is
+  greater than one and there are enough files, they are processed by a
+  pool of threads.
+
+  # Returns
+  int: The number of files that were updated.
+  """
+
+  pairs = list(pairs)
+  for dirname in set(os.path.dirname(dst) for _, dst in pairs):
+    if dirname and not os.path.isdir(dirname):
+      os.makedirs(dirname)
+
+  def worker(pair):
+    return sync_file(pair[0], pair[1], mode)
+
+  if jobs > 1 and ThreadPoolExecutor and len(pairs) >= PARALLEL_THRESHOLD:
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+      results = list(executor.map(worker, pairs))
+  else:
+    results = [worker(pair) for pair in pairs]
+  return sum(results)
+
+
+def write_file_if_changed(filename, content):
+  """
+  Writes the string *content* to *filename*, unless the file already has
+  exactly that content. The file is replaced atomically so that readers
+  (eg. `mkdocs serve`) never see a partially written file, and its mtime
+  only changes when its content does.
+
+  # Returns
+  bool: #True if the file was written, #False if it was up to date.
+  """
+
+  try:
+    with open(filename) as fp:
+      if fp.read() == content:
+        return False
+  except (IOError, OSError, UnicodeDecodeError):
+    pass
+
+  dirname = os.path.dirname(filename)
+  if dirname and not os.path.isdir(dirname):
+    os.makedirs(dirname)
+  tmpname = _temp_file(filename)
+  try:
+    with open(tmpname, 'w') as fp:
+      fp.write(content)
+    _replace(tmpname, filename)
+  except BaseException:
+    os.remove(tmpname)
+    raise
+  return True
+
+
+def prune_directory(directory, keep):
+  """
+  Removes all files in *directory* whose path relative to *directory* is not
+  in the set *keep*, and all directories that end up empty.
+
+  # Returns
+  list of str: The relative paths of the removed files.
+  """
+
+  keep = set(os.path.normpath(x) for x in keep)
+  removed = []
+  for root, dirs, files in os.walk(directory, topdown=False):
+    for fname in files:
+      path = os.path.join(root, fname)
+      rel_path = os.path.normpath(os.path.relpath(path, directory))
+      if rel_path not in keep:
+        os.remove(path)
+        removed.append(rel_path)
+    if root != directory and not os.listdir(root):
+      os.rmdir(root)
+  return sorted(removed)
@@ -0,0 +1,240 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements tracing a build (`--trace FILE` and `--timings N`).
+Spans are recorded as complete events of the Chrome trace event format,
+which can be viewed with `chrome://tracing` or https://ui.perfetto.dev.
+
+The module-level #tracer is disabled by default, in which case opening a
+span costs a single attribute lookup.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+  from time import perf_counter as clock
+except ImportError:
+  clock = time.time  # Python 2
+
+
+class _NullSpan(object):
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+  def __init__(self, tracer, category, name, args):
+    self.tracer = tracer
+    self.category = category
+    self.name = name
+    self.args = args
+
+  def __enter__(self):
+    self.ts = time.time()
+    self.start = clock()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.tracer.add(self.category, self.name, self.ts, clock() - self.start, self.args)
+    return False
+
+
+class Tracer(object):
+  """
+  Records spans of a build.
+
+  # Attributes
+  enabled (bool): Whether spans are recorded.
+  epoch (float): The time that event timestamps are relative to. Worker
+    processes use the epoch of the parent process so that their events
+    line up.
+  events (list of dict): The recorded trace events.
+  """
+
+  def __init__(self):
+    self.enabled = False
+    self.epoch = None
+    self.events = []
+
+  def enable(self, epoch=None):
+    self.enabled = True
+    self.epoch = time.time() if epoch is None else epoch
+
+  def span(self, category, name, **args):
+    """
+    Returns a context manager that records the time spent in it as a span
+    of the *category* (eg. `load`) and *name* (eg. the section identifier).
+    """
+
+    if not self.enabled:
+      return _NULL_SPAN
+    return _Span(self, category, name, args)
+
+  def add(self, category, name, ts, duration, args=None):
+    event = {
+      'name': name, 'cat': category, 'ph': 'X',
+      'ts': int((ts - self.epoch) * 1e6), 'dur': int(duration * 1e6),
+      'pid': os.getpid(), 'tid': threading.current_thread().ident,
+    }
+    if args:
+      event['args'] = args
+    self.events.append(event)
+
+  def drain(self):
+    """
+    Returns the recorded events and forgets them.
+    """
+
+    events, self.events = self.events, []
+    return events
+
+  def save(self, filename):
+    """
+    Saves the recorded events in the Chrome trace event format.
+    """
+
+    with open(filename, 'w') as fp:
+      json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, fp)
+
+  def durations(self, *categories):
+    """
+    Returns a dictionary that maps the names of the spans of the specified
+    *categories* to the total time spent in them (in seconds).
+    """
+
+    result = {}
+    for event in self.events:
+      if event['cat'] in categories:
+        result[event['name']] = result.get(event['name'], 0) + event['dur'] / 1e6
+    return result
+
+
+#: The tracer used by the build.
+tracer = Tracer()
+
+
+def span(category, name, **args):
+  """
+  Shortcut for `tracer.span()`.
+  """
+
+  return tracer.span(category, name, **args)
+
+
+def module_of(identifier, modules):
+  """
+  Returns the longest prefix of *identifier* that is in *modules*, or
+  #None.
+  """
+
+  parts = identifier.split('.')
+  for i in range(len(parts), 0, -1):
+    name = '.'.join(parts[:i])
+    if name in modules:
+      return name
+  return None
+
+
+def print_timings(count, stream=sys.stderr):
+  """
+  Prints the *count* slowest sections (loading and preprocessing) and the
+  *count* slowest modules (importing plus their sections) recorded by the
+  #tracer.
+  """
+
+  sections = tracer.durations('load', 'preprocess')
+  imports = tracer.durations('import')
+  modules = {}
+  for name, duration in imports.items():
+    modules[name] = [duration, 0, 0.0]
+  known = set(modules) | set(sys.modules)
+  for identifier, duration in sections.items():
+    module = module_of(identifier, known) or identifier.rpartition('.')[0] or identifier
+    entry = modules.setdefault(module, [0.0, 0, 0.0])
+    entry[1] += 1
+    entry[2] += duration
+
+  print('Slowest sections:', file=stream)
+  for identifier, duration in sorted(sections.items(), key=lambda x: -x[1])[:count]:
+    print('  {:>9.3f}s  {}'.format(duration, identifier), file=stream)
+  print('Slowest modules:', file=stream)
+  ranked = sorted(modules.items(), key=lambda x: -(x[1][0] + x[1][2]))[:count]
+  for name, (import_time, num_sections, section_time) in ranked:
+    print('  {:>9.3f}s  {} (import {:.3f}s, {} sections {:.3f}s)'.format(
+      import_time + section_time, name, import_time, num_sections,
+      section_time), file=stream)
+
+
+class Progress(object):
+  """
+  Displays a progress line with the throughput and the estimated remaining
+  time on *stream*, if it is a terminal.
+
+  # Arguments
+  total (int): The total number of items.
+  label (str): What the items are, eg. `sections`.
+  stream (file): The stream to write to, defaults to #sys.stderr.
+  """
+
+  #: The minimum number of seconds between two updates of the line.
+  interval = 0.1
+
+  def __init__(self, total, label='items', stream=None):
+    self.total = total
+    self.label = label
+    self.stream = stream or sys.stderr
+    self.enabled = total > 0 and hasattr(self.stream, 'isatty') and self.stream.isatty()
+    self.done = 0
+    self.start = clock()
+    self._last = 0
+
+  def update(self, count=1):
+    self.done += count
+    if not self.enabled:
+      return
+    now = clock()
+    if now - self._last < self.interval and self.done < self.total:
+      return
+    self._last = now
+    elapsed = now - self.start
+    rate = self.done / elapsed if elapsed > 0 else 0.0
+    eta = (self.total - self.done) / rate if rate else 0.0
+    self.stream.write('\r[{}/{}] {:.1f} {}/s, ETA {:.0f}s\x1b[K'.format(
+      self.done, self.total, rate, self.label, eta))
+    self.stream.flush()
+
+  def close(self):
+    if self.enabled and self._last:
+      self.stream.write('\r\x1b[K')
+      self.stream.flush()
@@ -0,0 +1,344 @@
+# Copyright (c) 2017  Niklas Rosenstein
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+This module implements the watch mode (`pydocmd generate --watch`, also used
+by `pydocmd serve`). It remembers the source file of every section and, when
+one of these files changes, reloads the file and regenerates only the
+documents that contain sections defined in it.
+"""
+
+from __future__ import print_function
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+
+from .build import add_sections, generate_sections
+from .imp import clear_source_cache, import_object
+from .preprocessor import load_preprocessor
+
+try:
+  from importlib import reload as reload_module
+except ImportError:
+  reload_module = reload  # Python 2
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingObserver(object):
+  """
+  Detects changes of files by comparing their modification time and size
+  every *interval* seconds.
+  """
+
+  def __init__(self, interval=0.25):
+    self.interval = interval
+    self._stats = {}
+
+  def _stat(self, filename):
+    try:
+      st = os.stat(filename)
+    except OSError:
+      return None
+    return (st.st_mtime, st.st_size)
+
+  def set_files(self, filenames):
+    """
+    Sets the files to watch.
+    """
+
+    self._stats = {f: self._stats.get(f) or self._stat(f) for f in filenames}
+
+  def wait(self, timeout=None):
+    """
+    Blocks until at least one file changed or *timeout* seconds passed.
+
+    # Returns
+    set of str: The changed files.
+    """
+
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+      changed = set()
+      for filename, old in self._stats.items():
+        new = self._stat(filename)
+        if new != old:
+          self._stats[filename] = new
+          changed.add(filename)
+      if changed or (deadline is not None and time.time() >= deadline):
+        return changed
+      time.sleep(self.interval)
+
+  def close(self):
+    pass
+
+
+class InotifyObserver(object):
+  """
+  Detects changes of files with the Linux inotify API. The directories that
+  contain the files are watched, so files that editors replace on save are
+  still detected.
+
+  # Raises
+  OSError: If inotify is not available.
+  """
+
+  #: Time to wait for more events after the first change, as editors often
+  #: write a file in multiple steps.
+  debounce = 0.05
+
+  def __init__(self):
+    libc_name = ctypes.util.find_library('c')
+    if not sys.platform.startswith('linux') or not libc_name:
+      raise OSError(errno.ENOSYS, 'inotify is not available')
+    self._libc = ctypes.CDLL(libc_name, use_errno=True)
+    self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1() failed')
+    self._dirs = {}
+    self._wds = {}
+    self._files = set()
+
+  def set_files(self, filenames):
+    self._files = set(filenames)
+    mask = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+    for dirname in set(os.path.dirname(f) for f in self._files):
+      if dirname in self._dirs:
+        continue
+      path = dirname.encode(sys.getfilesystemencoding())
+      wd = self._libc.inotify_add_watch(self._fd, path, mask)
+      if wd < 0:
+        continue
+      self._dirs[dirname] = wd
+      self._wds[wd] = dirname
+
+  def _read_events(self):
+    changed = set()
+    while True:
+      try:
+        data = os.read(self._fd, 65536)
+      except OSError as exc:
+        if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+          break
+        raise
+      offset = 0
+      while offset < len(data):
+        wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip(b'\0')
+        offset += length
+        dirname = self._wds.get(wd)
+        if dirname is not None and name:
+          filename = os.path.join(dirname, name.decode(sys.getfilesystemencoding()))
+          if filename in self._files:
+            changed.add(filename)
+    return changed
+
+  def wait(self, timeout=None):
+    deadline = None if timeout is None else time.time() + timeout
+    changed = set()
+    while True:
+      remaining = None if deadline is None else max(0, deadline - time.time())
+      if changed:
+        remaining = self.debounce
+      ready = select.select([self._fd], [], [], remaining)[0]
+      if not ready:
+        if changed or deadline is not None:
+          return changed
+        continue
+      changed |= self._read_events()
+
+  def close(self):
+    os.close(self._fd)
+
+
+def create_observer():
+  """
+  Returns an #InotifyObserver if inotify is available, otherwise a
+  #PollingObserver.
+  """
+
+  try:
+    return InotifyObserver()
+  except (OSError, AttributeError):
+    return PollingObserver()
+
+
+def reload_modules(filenames):
+  """
+  Reloads all modules in #sys.modules that are loaded from one of the
+  *filenames* (absolute paths).
+  """
+
+  for name, module in sorted(sys.modules.items()):
+    filename = getattr(module, '__file__', None)
+    if not filename:
+      continue
+    if filename.endswith(('.pyc', '.pyo')):
+      filename = filename[:-1]
+    if os.path.abspath(filename) in filenames:
+      reload_module(module)
+  clear_source_cache()
+
+
+class Watcher(object):
+  """
+  Regenerates the documents of an #Index when the source files of their
+  sections change.
+
+  # Arguments
+  config (dict): The pydoc-markdown configuration.
+  index (Index): The index with all sections loaded.
+  pages (dict): Maps the filename of every document to the object names
+    that it has been built from, as in the `generate` option.
+  write_document (callable): Called with the filename and the #Document
+    after a document has been regenerated.
+  log (callable): Used to report progress and errors.
+  select (Selection): The sections that are generated, see
+    #pydocmd.build.add_sections().
+  """
+
+  def __init__(self, config, index, pages, write_document, log=print, select=None):
+    self.config = config
+    self.index = index
+    self.pages = pages
+    self.write_document = write_document
+    self.log = log
+    self.select = select
+    self.loader = import_object(config['loader'])(config)
+    self.preproc = load_preprocessor(config)
+    self.observer = create_observer()
+    self.sources = {}
+    for doc in index.documents.values():
+      for section in doc.sections:
+        if section.identifier:
+          self.sources[section.identifier] = self.source_file(section.identifier)
+    self._update_observer()
+
+  def source_file(self, identifier):
+    get_source_file = getattr(self.loader, 'source_file', None)
+    if get_source_file is None:
+      return None
+    try:
+      return get_source_file(identifier)
+    except Exception:
+      return None
+
+  def _update_observer(self):
+    self.observer.set_files(set(f for f in self.sources.values() if f))
+
+  def run(self, keep_running=None):
+    """
+    Watches the source files until *keep_running* returns #False or the
+    user interrupts the process.
+    """
+
+    self.log('Watching {} source files for changes...'.format(
+      len(set(f for f in self.sources.values() if f))))
+    try:
+      while keep_running is None or keep_running():
+        changed = self.observer.wait(timeout=1.0)
+        if changed:
+          self.regenerate(changed)
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self.observer.close()
+
+  def regenerate(self, changed):
+    """
+    Reloads the *changed* files and regenerates the documents that contain
+    sections defined in them.
+    """
+
+    start = time.time()
+    try:
+      reload_modules(changed)
+    except Exception:
+      self.log(traceback.format_exc())
+      self.log('Failed to reload {}'.format(', '.join(sorted(changed))))
+      return
+
+    # Fresh loader, so that it doesn't keep stale objects around.
+    self.loader = import_object(self.config['loader'])(self.config)
+    fnames = [fname for fname, doc in self.index.documents.items()
+              if any(self.sources.get(s.identifier) in changed for s in doc.sections)]
+    for fname in fnames:
+      try:
+        self.regenerate_document(fname, changed)
+      except Exception:
+        self.log(traceback.format_exc())
+        self.log('Failed to regenerate {}'.format(fname))
+    self._update_observer()
+    self.log('Regenerated {} documents in {:.3f}s'.format(
+      len(fnames), time.time() - start))
+
+  def regenerate_document(self, fname, changed):
+    doc = self.index.documents[fname]
+    old_sections = list(doc.sections)
+    old = {s.identifier: s for s in old_sections if s.identifier}
+    ids = set(id(s) for s in old_sections)
+    old_objects = {k: s for k, s in self.index.objects.items() if id(s) in ids}
+    try:
+      self.index.clear_document(doc)
+      add_sections(self.index, doc, self.pages[fname], self.loader, self.config,
+                   select=self.select)
+      pending = []
+      sources = {}
+      for section in doc.sections:
+        if not section.identifier or section.alias_of is not None:
+          continue
+        source = sources[section.identifier] = self.source_file(section.identifier)
+        previous = old.get(section.identifier)
+        # Sections of a pipeline build have been released after writing.
+        if previous is not None and previous.content is not None and \
+            source not in changed and source == self.sources.get(section.identifier):
+          section.title = previous.title
+          section.content = previous.content
+        else:
+          pending.append(section)
+      generate_sections(pending, self.loader, self.preproc,
+                        loader_context=self.config.get('loader_context', 'keep'))
+    except Exception:
+      # Restore the previous state of the document.
+      self.index.clear_document(doc)
+      for section in old_sections:
+        doc.sections.append(section)
+        if section.identifier:
+          self.index.sections[section.identifier] = section
+      self.index.objects.update(old_objects)
+      raise
+    for identifier in old:
+      self.sources.pop(identifier, None)
+    self.sources.update(sources)
+    self.write_document(fname, doc)
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def bench(monkeypatch):
+  monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+  import run
+  return run
+
+
+@pytest.mark.parametrize('style', ['markdown', 'rest', 'mixed'])
+def test_synthetic_benchmark(bench, tmpdir, monkeypatch, style):
+  name = 'synthbench_' + style
+  output = str(tmpdir.join('result.json'))
+  bench.main(['--name', name, '--modules', '3', '--classes', '2', '--methods', '2',
+              '--functions', '1', '--style', style, '--repeat', '2', '-o', output])
+  for module in [m for m in sys.modules if m.startswith(name)]:
+    monkeypatch.delitem(sys.modules, module)
+
+  with open(output) as fp:
+    result = json.load(fp)
+  assert result['documents'] == 3
+  # Module, functions and per class: the class, its property and its methods.
+  assert result['sections'] == 3 * (1 + 1 + 2 * (1 + 1 + 2))
+  assert set(result['phases']) == set(bench.PHASES)
+  assert len(result['phases']['load']['runs']) == 2
+
+
+def test_simple_startup(monkeypatch):
+  monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+  import startup
+  result = startup.main(['--repeat', '3', '--budget', '1.0'])
+  assert result['unneeded_modules'] == []
@@ -0,0 +1,139 @@
+import io
+import sys
+
+import pytest
+
+from pydocmd.build import (add_placeholder_sections, add_sections, generate_sections,
+                           splice_document, DocumentWriter, MarkdownStream, Selection)
+from pydocmd.document import Index
+from pydocmd.loader import PythonLoader, StaticLoader
+from pydocmd.preprocessor import Preprocessor
+
+
+def make_index():
+  index = Index()
+  for fname, identifiers in [('a.md', ['testmodule', 'testmodule.add']),
+                             ('b.md', ['testmodule.Breakfast'])]:
+    doc = index.new_document(fname)
+    for identifier in identifiers:
+      index.new_section(doc, identifier)
+  return index
+
+
+def test_markdown_stream():
+  reference = make_index()
+  generate_sections([s for doc in reference.documents.values() for s in doc.sections],
+                    PythonLoader({}), Preprocessor({}))
+  expected = ''.join(doc.render_to_string() for doc in reference.documents.values())
+
+  index = make_index()
+  sections = [s for doc in index.documents.values() for s in doc.sections]
+  stream = io.StringIO()
+  markdown = MarkdownStream(stream, index, sections)
+  written = []
+  def callback(section):
+    markdown.section_done(section)
+    written.append(len(stream.getvalue()))
+  generate_sections(sections, PythonLoader({}), Preprocessor({}), callback=callback)
+  markdown.close()
+
+  # Every section is written as soon as it is complete, and then released.
+  assert 0 < written[0] < written[1] < written[2]
+  assert stream.getvalue() == expected
+  assert all(s.content is None for s in sections)
+
+
+def test_document_writer():
+  index = make_index()
+  sections = [s for doc in index.documents.values() for s in doc.sections]
+  documents = {}
+  def write_document(fname, doc):
+    documents[fname] = doc.render_to_string()
+
+  writer = DocumentWriter(index, write_document, sections[1:])
+  writer.flush()
+  assert documents == {}
+  writer.section_done(sections[2])
+  assert documents == {}  # a.md is not complete yet.
+  writer.section_done(sections[1])
+  assert sorted(documents) == ['a.md', 'b.md']
+  assert '*Nothing to see here.*' in documents['a.md']
+  assert all(s.content is None for s in sections)
+
+
+def test_selection():
+  select = Selection(['pkg.mod.*', 'other.?x'])
+  assert select.match('pkg.mod.Class')
+  assert not select.match('pkg.mod')
+  assert select.match('other.ax')
+  assert select.may_contain('pkg') and select.may_contain('pkg.mod')
+  assert select.may_contain('other')
+  assert not select.may_contain('pkg.module')
+  assert not select.may_contain('pk')
+
+
+def test_add_sections_select():
+  index = Index()
+  doc = index.new_document('a.md')
+  visited = []
+  class Loader(PythonLoader):
+    def dir_object(self, name, sort_order, need_docstrings):
+      visited.append(name)
+      return PythonLoader.dir_object(self, name, sort_order, need_docstrings)
+  add_sections(index, doc, ['testmodule++'], Loader({}), {},
+               select=Selection(['testmodule.Breakfast.*']))
+  full = Index()
+  add_sections(full, full.new_document('a.md'), ['testmodule++'], PythonLoader({}), {})
+  expected = [x for x in full.sections if x.startswith('testmodule.Breakfast.')]
+  assert expected and [s.identifier for s in doc.sections] == expected
+  # Members of the other classes are not enumerated.
+  assert visited == ['testmodule', 'testmodule.Breakfast']
+
+
+def test_selective_build():
+  reference = make_index()
+  generate_sections(list(reference.sections.values()), PythonLoader({}), Preprocessor({}))
+  text = reference.documents['a.md'].render_to_string()
+
+  from pydocmd.parallel import index_layout
+  index = Index()
+  doc = index.new_document('a.md')
+  section = index.new_section(doc, 'testmodule.add', content='See #testmodule and #Breakfast.')
+  add_placeholder_sections(index, index_layout(reference))
+  assert list(index.documents) == ['a.md']
+  Preprocessor({}).preprocess_section(section)
+  assert section.content == 'See [`testmodule`](#testmodule) and [`Breakfast`](b.md#testmodule.Breakfast).'
+
+  section.title = 'add'
+  spliced = splice_document(text, doc)
+  before, after = text.split('<a name="testmodule.add"></a>')
+  assert spliced == before + section.doc.render_to_string()
+  assert splice_document('', doc) == doc.render_to_string()
+
+
+@pytest.mark.parametrize('loader_class', [PythonLoader, StaticLoader])
+def test_aliases_are_documented_once(tmpdir, monkeypatch, loader_class):
+  pkg = tmpdir.mkdir('aliaspkg_' + loader_class.__name__)
+  pkg.join('__init__.py').write('"""\nThe package.\n"""\nfrom .sub import Foo\n')
+  pkg.join('sub.py').write(
+    'class Foo(object):\n  """\n  A class.\n  """\n\n'
+    '  def method(self):\n    """\n    A method.\n    """\n')
+  monkeypatch.syspath_prepend(str(tmpdir))
+  name = pkg.basename
+
+  index = Index()
+  api = index.new_document('api.md')
+  sub = index.new_document('sub/index.md')
+  loader = loader_class({})
+  add_sections(index, sub, [name + '.sub++'], loader, {})
+  add_sections(index, api, [name, name + '.Foo+', name + '.sub.Foo'], loader, {})
+
+  assert [s.identifier for s in sub.sections] == \
+    [name + '.sub', name + '.sub.Foo', name + '.sub.Foo.method']
+  assert [(s.identifier, s.alias_of) for s in api.sections] == [
+    (name, None), (name + '.Foo', sub.sections[1]), (None, sub.sections[1])]
+  assert api.sections[1].content == \
+    'Alias of [`{0}.sub.Foo`](sub/index.md#{0}.sub.Foo).'.format(name)
+  assert api.sections[1].title == 'Foo'
+  for module in [m for m in sys.modules if m.startswith(name)]:
+    monkeypatch.delitem(sys.modules, module)
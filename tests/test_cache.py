@@ -0,0 +1,105 @@
+import os
+
+from pydocmd.cache import BuildCache
+from pydocmd.document import Index, Section
+from pydocmd.preprocessor import Preprocessor
+
+
+class FileLoader(object):
+
+  def __init__(self, filename):
+    self.filename = filename
+
+  def source_file(self, identifier):
+    return self.filename
+
+
+def test_cache_invalidated_by_source_change(tmpdir):
+  source = tmpdir.join('mod.py')
+  source.write('def foo(): pass\n')
+  dbfile = str(tmpdir.join('_build', 'cache.sqlite'))
+  config = {'loader': 'FileLoader'}
+
+  cache = BuildCache(dbfile, config, FileLoader(str(source)))
+  section = Section(None, 'mod.foo')
+  assert not cache.load(section)
+  section.title, section.content = 'foo', 'Foo content.'
+  cache.store(section)
+  cache.close()
+
+  cache = BuildCache(dbfile, config, FileLoader(str(source)))
+  section = Section(None, 'mod.foo')
+  assert cache.load(section)
+  assert (section.title, section.content) == ('foo', 'Foo content.')
+  assert (cache.hits, cache.misses) == (1, 0)
+  cache.close()
+
+  source.write('def foo(): return 42\n')
+  os.utime(str(source), (0, 0))
+  cache = BuildCache(dbfile, config, FileLoader(str(source)))
+  assert not cache.load(Section(None, 'mod.foo'))
+  cache.close()
+
+  cache = BuildCache(dbfile, dict(config, sort='name'), FileLoader(str(source)))
+  assert not cache.load(Section(None, 'mod.foo'))
+  cache.close()
+
+
+class OpaquePreprocessor(object):
+  # Does not report the references of the sections.
+
+  def __init__(self, config):
+    pass
+
+  def preprocess_section(self, section):
+    pass
+
+
+def _build(dbfile, source, preproc, layout):
+  index = Index()
+  for fname, identifiers in layout:
+    doc = index.new_document(fname)
+    for identifier in identifiers:
+      content = 'See #b.bar.' if identifier == 'a.foo' else 'Text.'
+      index.new_section(doc, identifier, content=content)
+  config = {'loader': 'FileLoader', 'preprocessor': type(preproc).__name__}
+  cache = BuildCache(dbfile, config, FileLoader(source), index)
+  hits = []
+  for identifier in ('a.foo', 'a.baz', 'b.bar'):
+    section = index.sections[identifier]
+    if cache.load(section):
+      hits.append(identifier)
+    else:
+      preproc.preprocess_section(section)
+      cache.store(section)
+  cache.close()
+  return hits, index
+
+
+def test_cache_invalidated_by_moved_references(tmpdir):
+  source = tmpdir.join('mod.py')
+  source.write('')
+  dbfile = str(tmpdir.join('cache.sqlite'))
+  preproc = Preprocessor({})
+  layout = [('a.md', ['a.foo', 'a.baz']), ('b.md', ['b.bar'])]
+  assert _build(dbfile, str(source), preproc, layout)[0] == []
+  assert _build(dbfile, str(source), preproc, layout)[0] == ['a.foo', 'a.baz', 'b.bar']
+
+  # Adding a section does not change what the references link to.
+  layout = [('a.md', ['a.foo', 'a.baz']), ('b.md', ['b.bar', 'b.new'])]
+  hits, index = _build(dbfile, str(source), preproc, layout)
+  assert hits == ['a.foo', 'a.baz', 'b.bar']
+  assert index.sections['a.foo'].content == 'See [`b.bar`](b.md#b.bar).'
+
+  # Moving the target of a reference does.
+  layout = [('a.md', ['a.foo', 'a.baz']), ('c.md', ['b.bar', 'b.new'])]
+  hits, index = _build(dbfile, str(source), preproc, layout)
+  assert hits == ['a.baz', 'b.bar']
+  assert index.sections['a.foo'].content == 'See [`b.bar`](c.md#b.bar).'
+
+  # Without reported references, any change to the index invalidates.
+  preproc = OpaquePreprocessor({})
+  assert _build(dbfile, str(source), preproc, layout)[0] == []
+  assert _build(dbfile, str(source), preproc, layout)[0] == ['a.foo', 'a.baz', 'b.bar']
+  layout = [('a.md', ['a.foo', 'a.baz']), ('c.md', ['b.bar'])]
+  assert _build(dbfile, str(source), preproc, layout)[0] == []
@@ -0,0 +1,122 @@
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+from pydocmd import client
+from pydocmd.daemon import Daemon
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def daemon(tmpdir):
+  if not hasattr(socket, 'AF_UNIX'):
+    pytest.skip('Unix sockets are not available')
+  path = str(tmpdir.join('daemon.sock'))
+  env = dict(os.environ, PYTHONPATH=ROOT)
+  proc = subprocess.Popen([sys.executable, '-m', 'pydocmd', 'daemon', '--socket', path],
+                          cwd=str(tmpdir), env=env)
+  deadline = time.time() + 10
+  while client.ping(path) is None:
+    assert proc.poll() is None and time.time() < deadline
+    time.sleep(0.05)
+  yield path
+  client.stop(path)
+  proc.wait()
+
+
+def test_daemon_reloads_changed_modules(daemon, tmpdir, capsys):
+  tmpdir.join('daemonmod.py').write('def foo():\n  "Foo."\n')
+  assert client.request(daemon, ['simple', 'daemonmod+'], str(tmpdir)) == 0
+  assert 'Foo.' in capsys.readouterr().out
+
+  assert client.request(daemon, ['simple', 'daemonmod+'], str(tmpdir)) == 0
+  assert 'Cache: 2 hits, 0 misses' in capsys.readouterr().err
+
+  tmpdir.join('daemonmod.py').write('def foo():\n  "New foo."\n\ndef bar():\n  "Bar."\n')
+  assert client.request(daemon, ['simple', 'daemonmod+'], str(tmpdir)) == 0
+  out, err = capsys.readouterr()
+  assert 'New foo.' in out and 'Bar.' in out
+  assert 'Reloaded 1 modules.' in err
+  assert client.ping(daemon)['reloaded'] == 1
+
+
+def test_daemon_detects_changes_with_the_static_loader(daemon, tmpdir, capsys):
+  argv = ['simple', 'dstaticmod+', '-c', 'loader=pydocmd.loader.StaticLoader']
+  tmpdir.join('dstaticmod.py').write('def foo():\n  "Foo."\n')
+  assert client.request(daemon, argv, str(tmpdir)) == 0
+  assert 'Foo.' in capsys.readouterr().out
+  assert client.request(daemon, argv, str(tmpdir)) == 0
+  assert 'Cache: 2 hits, 0 misses' in capsys.readouterr().err
+
+  # Make sure that the modification time changes.
+  time.sleep(0.01)
+  tmpdir.join('dstaticmod.py').write('def foo():\n  "New foo."\n')
+  assert client.request(daemon, argv, str(tmpdir)) == 0
+  out, err = capsys.readouterr()
+  assert 'New foo.' in out
+  assert 'Cache: 0 hits, 2 misses' in err
+
+
+def test_daemon_socket_is_private(daemon):
+  assert stat.S_IMODE(os.stat(daemon).st_mode) == 0o600
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='no user ids')
+def test_socket_dir_is_private(tmpdir, monkeypatch):
+  monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+  monkeypatch.setattr(tempfile, 'tempdir', str(tmpdir))
+  path = client.socket_dir()
+  assert path == str(tmpdir.join('pydocmd-{}'.format(os.getuid())))
+  assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+  os.chmod(path, 0o755)
+  with pytest.raises(RuntimeError):
+    client.socket_dir()
+  os.rmdir(path)
+  os.symlink(str(tmpdir.mkdir('elsewhere')), path)
+  with pytest.raises(RuntimeError):
+    client.socket_dir()
+
+
+def test_daemon_rejects_mkdocs_commands(daemon, tmpdir, capsys):
+  assert client.request(daemon, ['build'], str(tmpdir)) == 2
+  assert 'the daemon only runs' in capsys.readouterr().err
+  assert client.ping(daemon)['requests'] == 1
+
+
+def test_daemon_only_serves_its_directory(daemon, tmpdir, tmpdir_factory, monkeypatch, capsys):
+  other = tmpdir_factory.mktemp('other')
+  tmpdir.join('samemod.py').write('def foo():\n  "Mine."\n')
+  other.join('samemod.py').write('def foo():\n  "Other."\n')
+  assert client.request(daemon, ['simple', 'samemod+'], str(other)) == 2
+  out, err = capsys.readouterr()
+  assert 'Other.' not in out and 'the daemon serves' in err
+  assert client.request(daemon, ['simple', 'samemod+'], str(tmpdir)) == 0
+  assert 'Mine.' in capsys.readouterr().out
+  assert client.ping(daemon)['requests'] == 1
+
+  monkeypatch.delenv(client.SOCKET_VARIABLE, raising=False)
+  assert client.default_socket_path(str(tmpdir)) != client.default_socket_path(str(other))
+
+
+def test_daemon_restores_sys_path(tmpdir, monkeypatch):
+  if not hasattr(socket, 'socketpair'):
+    pytest.skip('socket.socketpair() is not available')
+  monkeypatch.chdir(tmpdir)
+  def main(argv, session):
+    sys.path.insert(0, str(tmpdir))
+  daemon = Daemon(str(tmpdir.join('unused.sock')), main, log=lambda *a: None)
+  conn, peer = socket.socketpair()
+  path = list(sys.path)
+  client._send(peer, {'argv': ['simple'], 'cwd': str(tmpdir)})
+  assert daemon.handle(conn)
+  assert sys.path == path
+  conn.close()
+  peer.close()
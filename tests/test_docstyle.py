@@ -0,0 +1,18 @@
+import pytest
+
+from pydocmd.docstyle import detect_style
+
+
+@pytest.mark.parametrize('content,style', [
+  (':param x: The value.\n:return: Nothing.', 'rest'),
+  ('See #foo().\n\n:rtype: int', 'rest'),
+  ('Parameters\n----------\nx : int\n    The value.', 'numpy'),
+  ('Returns\n-------\nint', 'numpy'),
+  ('Args:\n  x (int): The value.\n\nReturns:\n  Nothing.', 'google'),
+  ('# Arguments\nx (int): The value.', 'markdown'),
+  ('Calls #foo().', 'markdown'),
+  ('Just text: with a colon.', 'plain'),
+  ('', 'plain'),
+])
+def test_detect_style(content, style):
+  assert detect_style(content) == style
@@ -0,0 +1,79 @@
+import gc
+import sys
+import time
+import weakref
+
+import pytest
+
+from pydocmd.document import Index, Section
+
+
+def test_resolve_references():
+  index = Index()
+  doc = index.new_document('a.md')
+  for identifier in ['a', 'a.b', 'a.b.c', 'x.b.c', 'x.d']:
+    index.new_section(doc, identifier)
+  resolver = index.resolver
+  assert resolver.resolve('c', 'a.b').identifier == 'a.b.c'
+  assert resolver.resolve('b.c', 'x').identifier == 'x.b.c'
+  assert resolver.resolve('d').identifier == 'x.d'
+  assert resolver.resolve('b.c') is None  # ambiguous
+  assert resolver.resolve('b.c', absolute=True) is None
+  assert resolver.resolve('a.b.c', 'x', absolute=True).identifier == 'a.b.c'
+
+  # The resolver is rebuilt when the index changes.
+  index.new_section(doc, 'y.e')
+  assert index.resolver is not resolver
+  assert index.resolver.resolve('e').identifier == 'y.e'
+
+
+def test_resolve_scales_with_index_size():
+  def measure(num_sections):
+    index = Index()
+    doc = index.new_document('api.md')
+    for i in range(num_sections):
+      index.new_section(doc, 'pkg.mod{}.Class{}.method'.format(i % 100, i))
+    resolver = index.resolver
+    start = time.perf_counter()
+    for i in range(10000):
+      resolver.resolve('Class{}.method'.format(i), 'pkg.mod0.Class0.other')
+    return time.perf_counter() - start
+
+  measure(100)  # warm up
+  small, large = min(measure(1000) for _ in range(3)), min(measure(100000) for _ in range(3))
+  assert large < 5 * max(small, 1e-3)
+
+
+def test_sections_are_compact():
+  index = Index()
+  doc = index.new_document('a.md')
+  section = index.new_section(doc, ''.join(['pkg.', 'mod']))
+  assert section.identifier is sys.intern('pkg.mod')
+  with pytest.raises(AttributeError):
+    section.unknown_attribute = True
+  with pytest.raises(AttributeError):
+    doc.unknown_attribute = True
+
+
+def test_release_loader_context():
+  class Object(object):
+    pass
+
+  section = Section(None, 'x')
+  obj = Object()
+  section.loader_context = {'obj': obj, 'value': 42}
+  section.release_loader_context('keep')
+  assert section.loader_context == {'obj': obj, 'value': 42}
+
+  section.release_loader_context('weak')
+  assert section.loader_context == {'obj': obj, 'value': None}
+  ref = weakref.ref(obj)
+  del obj
+  gc.collect()
+  assert ref() is None
+  assert section.loader_context == {'obj': None, 'value': None}
+
+  section.release_loader_context('drop')
+  assert section.loader_context is None
+  with pytest.raises(ValueError):
+    section.release_loader_context('forget')
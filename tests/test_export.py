@@ -0,0 +1,35 @@
+import io
+import json
+
+from pydocmd.document import Index
+from pydocmd.export import JsonLinesWriter
+from pydocmd.loader import PythonLoader
+
+
+def test_stream_in_index_order():
+  index = Index()
+  doc = index.new_document('api.md')
+  a = index.new_section(doc, 'testmodule', content='a')
+  b = index.new_section(doc, 'testmodule.add', content='b', depth=2)
+  c = index.new_section(index.new_document('other.md'), 'testmodule.Breakfast', content='c')
+  index.new_document('empty.md')
+
+  stream = io.StringIO()
+  writer = JsonLinesWriter(stream, index, PythonLoader({}), pending=[b, c])
+  writer.flush()
+  assert writer.written == 2  # The first document and section are complete.
+  writer.section_done(c)
+  assert writer.written == 2  # Waits for the section before it.
+  writer.section_done(b)
+  writer.close()
+
+  records = [json.loads(line) for line in stream.getvalue().splitlines()]
+  assert [(r['type'], r.get('filename') or r['identifier']) for r in records] == [
+    ('document', 'api.md'), ('section', 'testmodule'), ('section', 'testmodule.add'),
+    ('document', 'other.md'), ('section', 'testmodule.Breakfast'),
+    ('document', 'empty.md')]
+  assert records[0] == {'type': 'document', 'filename': 'api.md', 'url': 'api', 'sections': 2}
+  assert records[2]['depth'] == 2
+  assert records[2]['content'] == 'b'
+  assert records[2]['source_file'].endswith('__init__.py')
+  assert records[2]['source_line'] == 64
@@ -0,0 +1,131 @@
+import inspect
+import sys
+import types
+
+import pytest
+
+from pydocmd import imp
+
+
+def make_module(name, num_classes, num_methods):
+  """
+  Generates a module with *num_classes* documented classes that each have
+  *num_methods* documented methods and a documented nested class.
+  """
+
+  module = types.ModuleType(name)
+  for i in range(num_classes):
+    namespace = {'__module__': name, '__doc__': 'Class {}.'.format(i)}
+    for j in range(num_methods):
+      def method(self):
+        pass
+      method.__doc__ = 'Method {}.'.format(j)
+      namespace['method_{}'.format(j)] = method
+    namespace['Nested'] = type('Nested', (object,), {'__module__': name, '__doc__': 'Nested.'})
+    setattr(module, 'Class{}'.format(i), type('Class{}'.format(i), (object,), namespace))
+  return module
+
+
+@pytest.fixture
+def synthetic_modules(monkeypatch):
+  def factory(name, num_classes, num_methods):
+    module = make_module(name, num_classes, num_methods)
+    monkeypatch.setitem(sys.modules, name, module)
+    return module
+  return factory
+
+
+def expand(graph, name, depth):
+  count = 1
+  if depth > 0:
+    for sub in graph.members(name, 'name', True):
+      count += expand(graph, name + '.' + sub, depth - 1)
+  return count
+
+
+def test_dir_object(synthetic_modules):
+  synthetic_modules('synthmod', 2, 2)
+  assert imp.dir_object('synthmod', 'name') == ['Class0', 'Class1']
+  assert imp.dir_object('synthmod.Class0', 'name') == ['method_0', 'method_1', 'Nested']
+
+
+@pytest.mark.parametrize('num_classes', [50, 200, 800])
+def test_symbol_graph_scales_linearly(synthetic_modules, monkeypatch, num_classes):
+  # Benchmark in terms of work done rather than wall time: every object must
+  # be walked and imported exactly once, no matter the package size.
+  synthetic_modules('synthmod', num_classes, 10)
+  imports = []
+  original = imp.import_object
+  monkeypatch.setattr(imp, 'import_object', lambda name: imports.append(name) or original(name))
+
+  graph = imp.SymbolGraph()
+  symbols = expand(graph, 'synthmod', 3)
+  assert symbols == 1 + num_classes * (1 + 10 + 1)
+  assert graph.visits == symbols
+  assert imports == ['synthmod']
+
+
+def test_module_evictor(synthetic_modules, monkeypatch):
+  evictor = imp.ModuleEvictor()
+  synthetic_modules('synthpkg', 1, 1)
+  synthetic_modules('synthpkg.a', 1, 1)
+  synthetic_modules('synthpkg.b', 1, 1)
+  sys.modules['synthpkg'].a = sys.modules['synthpkg.a']
+  evictor.expect(['synthpkg.a.Class0', 'synthpkg.b.Class0'])
+
+  evictor.section_done('synthpkg.a.Class0')
+  evictor.evict()
+  assert 'synthpkg.a' not in sys.modules
+  assert not hasattr(sys.modules['synthpkg'], 'a')
+  assert 'synthpkg' in sys.modules and 'synthpkg.b' in sys.modules
+  assert 'pytest' in sys.modules  # Imported before the evictor was created.
+  assert evictor.evicted == 1
+
+
+def test_module_evictor_keeps_pydocmd(monkeypatch):
+  # eg. when documenting pydoc-markdown itself, with modules of it that are
+  # imported lazily during the build.
+  evictor = imp.ModuleEvictor()
+  monkeypatch.setitem(sys.modules, 'pydocmd.lazy', types.ModuleType('pydocmd.lazy'))
+  evictor.expect(['pydocmd.lazy.func'])
+  evictor.section_done('pydocmd.lazy.func')
+  evictor.evict()
+  assert 'pydocmd.lazy' in sys.modules
+  assert evictor.evicted == 0
+
+
+def test_source_lineno_matches_inspect(tmpdir, monkeypatch):
+  tmpdir.join('linemod.py').write(
+    'import functools\n'
+    '\n'
+    'def deco(func):\n'
+    '  @functools.wraps(func)\n'
+    '  def wrapper(*a):\n'
+    '    return func(*a)\n'
+    '  return wrapper\n'
+    '\n'
+    'class Outer(object):\n'
+    '  @property\n'
+    '  def prop(self):\n'
+    '    pass\n'
+    '  @deco\n'
+    '  def wrapped(self):\n'
+    '    pass\n'
+    '  class Inner(object):\n'
+    '    def method(self):\n'
+    '      pass\n'
+    '\n'
+    '@deco\n'
+    'def function():\n'
+    '  pass\n')
+  monkeypatch.syspath_prepend(str(tmpdir))
+  monkeypatch.delitem(sys.modules, 'linemod', raising=False)
+  import linemod
+  imp.clear_source_cache()
+
+  objects = [linemod.Outer, linemod.Outer.wrapped, linemod.Outer.Inner,
+             linemod.Outer.Inner.method, linemod.function, linemod.deco]
+  for obj in objects:
+    assert imp.source_lineno(obj) == inspect.getsourcelines(obj)[1]
+  assert imp.source_lineno(linemod.Outer.prop) is None
+  assert imp.dir_object('linemod.Outer', 'line', False) == ['prop', 'wrapped', 'Inner']
@@ -0,0 +1,63 @@
+import sys
+import textwrap
+
+import pytest
+
+from pydocmd.imp import dir_object, import_object
+from pydocmd.importhooks import ImportProfiler, install_stubs
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+  monkeypatch.syspath_prepend(str(tmp_path))
+  monkeypatch.setattr(sys, 'meta_path', list(sys.meta_path))
+  def write(name, source):
+    tmp_path.joinpath(name + '.py').write_text(textwrap.dedent(source))
+  yield write
+  for name in list(sys.modules):
+    if name.startswith(('heavy_dep', 'stubbed_project', 'profiled_')):
+      del sys.modules[name]
+
+
+def test_stub_modules(project):
+  project('stubbed_project', '''
+    """A module with a heavy dependency."""
+    import heavy_dep
+    from heavy_dep.nn import Module
+
+    class Model(Module):
+      """A model."""
+      def __init__(self, size, layers=2):
+        pass
+
+    @heavy_dep.jit
+    def forward(x):
+      """Computes things."""
+
+    Tensor = heavy_dep.Tensor[int]
+  ''')
+  finder = install_stubs('heavy_dep')
+  assert install_stubs(['heavy_dep']) is finder
+  module = import_object('stubbed_project')
+  assert finder.stubbed == ['heavy_dep', 'heavy_dep.nn']
+  assert module.forward.__doc__ == 'Computes things.'
+  assert module.Model.__mro__[1].__module__ == 'heavy_dep.nn'
+  assert dir_object('stubbed_project', 'line') == ['Model', 'forward']
+
+
+def test_import_profiler(project):
+  project('profiled_b', 'import time; time.sleep(0.02)')
+  project('profiled_a', 'import profiled_b')
+  profiler = ImportProfiler()
+  profiler.enable()
+  try:
+    with profiler.attribute('profiled_a.thing'):
+      with profiler.attribute('ignored'):
+        __import__('profiled_a')
+  finally:
+    profiler.disable()
+  cumulative, self_time = profiler.modules['profiled_a']
+  assert cumulative >= 0.02 and self_time < 0.02
+  assert profiler.modules['profiled_b'][1] >= 0.02
+  assert profiler.owners == {'profiled_a.thing': [cumulative, 2]}
+  assert sys.modules['profiled_a'].__loader__.__class__.__name__ == 'SourceFileLoader'
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip('mkdocs.plugins')
+
+from pydocmd import mkdocs_site
+
+
+def test_parse_options():
+  options = mkdocs_site.parse_options('gh-deploy', ['--dirty', '-s', '-m', 'Deploy', '--site-dir=out'])
+  assert options['build'] == {'dirty': True}
+  assert options['config'] == {'strict': True, 'site_dir': 'out'}
+  assert options['deploy'] == {'message': 'Deploy'}
+  assert mkdocs_site.parse_options('build', ['-m', 'Deploy']) is None
+  assert mkdocs_site.parse_options('build', ['--config-file', 'mkdocs.yml']) is None
+
+
+def test_run_builds_pages_from_memory(tmpdir, monkeypatch):
+  monkeypatch.chdir(tmpdir)
+  tmpdir.mkdir('gens').join('index.md').write('# Home\n')
+  config = {'site_name': 'Test', 'site_dir': 'site', 'theme': 'mkdocs', 'gens_dir': 'gens',
+            'pages': [{'Home': 'index.md'}, {'API': 'api/module.md'}]}
+  pages = {'api/module.md': '# The API\n'}
+  options = mkdocs_site.parse_options('build', ['-q'])
+  assert mkdocs_site.run('build', config, pages, options) == 0
+  assert not tmpdir.join('gens', 'api').check()
+  assert 'The API' in tmpdir.join('site', 'api', 'module', 'index.html').read()
+  assert 'Home' in tmpdir.join('site', 'index.html').read()
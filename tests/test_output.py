@@ -0,0 +1,75 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from pydocmd.output import (archive_format, ArchiveSink, BackgroundWriter,
+                            DirectorySink, MemorySink, Sink)
+
+
+def test_archive_format():
+  assert archive_format('docs.tar.gz') == 'w|gz'
+  assert archive_format('docs.zip') == 'zip'
+  assert archive_format('docs') is None
+  with pytest.raises(ValueError):
+    ArchiveSink('docs.rar')
+
+
+@pytest.mark.parametrize('filename', ['docs.tar', 'docs.tar.gz', 'docs.zip'])
+def test_archive_sink(tmpdir, filename):
+  src = tmpdir.join('extra.md')
+  src.write('Extra')
+  filename = str(tmpdir.join('out', filename))
+  writer = BackgroundWriter(ArchiveSink(filename), max_pending=2)
+  writer.copy(str(src), 'index.md')
+  for i in range(10):
+    writer.write('api/{}.md'.format(i), u'# Module {}\n'.format(i))
+  assert not os.path.exists(filename)
+  writer.close()
+  assert writer.written == 10
+  assert os.listdir(os.path.dirname(filename)) == [os.path.basename(filename)]
+
+  if filename.endswith('.zip'):
+    archive = zipfile.ZipFile(filename)
+    read = lambda name: archive.read(name).decode('utf8')
+    names = archive.namelist()
+  else:
+    archive = tarfile.open(filename)
+    read = lambda name: archive.extractfile(name).read().decode('utf8')
+    names = archive.getnames()
+  assert sorted(names) == sorted(['index.md'] + ['api/{}.md'.format(i) for i in range(10)])
+  assert read('index.md') == 'Extra'
+  assert read('api/3.md') == '# Module 3\n'
+  archive.close()
+
+
+def test_directory_and_memory_sinks(tmpdir):
+  for sink in (DirectorySink(str(tmpdir)), MemorySink()):
+    assert sink.read('a/b.md') is None
+    sink.write('a/b.md', 'Hello')
+    sink.write('a/b.md', 'Hello')
+    assert sink.read('a/b.md') == 'Hello'
+    assert (sink.written, sink.changed) == (2, 1)
+  assert tmpdir.join('a', 'b.md').read() == 'Hello'
+
+
+class FailingSink(Sink):
+
+  def write(self, fname, content):
+    raise IOError('disk full')
+
+
+def test_background_writer_raises_errors(tmpdir):
+  writer = BackgroundWriter(FailingSink())
+  writer.write('a.md', 'Hello')
+  with pytest.raises(IOError):
+    writer.close()
+
+  filename = str(tmpdir.join('docs.zip'))
+  sink = ArchiveSink(filename)
+  writer = BackgroundWriter(sink)
+  writer.copy(str(tmpdir.join('missing.md')), 'missing.md')
+  with pytest.raises(OSError):
+    writer.close()
+  assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,43 @@
+from pydocmd.__main__ import default_config
+from pydocmd.document import Index
+from pydocmd.imp import import_object
+from pydocmd.parallel import load_sections
+from pydocmd.preprocessor import load_preprocessor
+
+
+def build_index(config):
+  index = Index()
+  loader = import_object(config['loader'])(config)
+  for fname, name in [('a.md', 'testmodule'), ('b.md', 'pydocmd.document')]:
+    doc = index.new_document(fname)
+    index.new_section(doc, name)
+    for member in loader.dir_object(name, 'line'):
+      index.new_section(doc, name + '.' + member, depth=2)
+  return index, loader
+
+
+def test_parallel_output_matches_serial():
+  config = default_config({})
+  serial, loader = build_index(config)
+  preproc = import_object(config['preprocessor'])(config)
+  for doc in serial.documents.values():
+    for section in doc.sections:
+      loader.load_section(section)
+      preproc.preprocess_section(section)
+
+  parallel, _ = build_index(config)
+  sections = [s for doc in parallel.documents.values() for s in doc.sections]
+  load_sections(parallel, sections, config, 3)
+
+  for fname, doc in serial.documents.items():
+    assert parallel.documents[fname].render_to_string() == doc.render_to_string()
+
+
+def test_parallel_memo_counts():
+  config = default_config({'preprocess_memo': 100})
+  index, _ = build_index(config)
+  sections = [s for doc in index.documents.values() for s in doc.sections]
+  memo = load_preprocessor(config)
+  load_sections(index, sections, config, 2, memo=memo)
+  assert memo.hits + memo.misses > 0
+  assert memo.misses <= len(sections)
@@ -0,0 +1,228 @@
+import random
+import re
+import time
+
+import pytest
+
+from pydocmd.document import Index, Section
+from pydocmd.preprocessor import (Preprocessor, PreprocessorChain, PreprocessorMemo,
+                                  load_preprocessor, match_declaration, preprocess_sections)
+from pydocmd.restructuredtext import Preprocessor as RestructuredTextPreprocessor
+
+
+@pytest.fixture
+def preprocessor():
+  return Preprocessor(None)
+
+
+def reference_preprocess(content):
+  """
+  The regular expression based implementation that the single-pass
+  preprocessor must be equivalent to.
+  """
+
+  lines = []
+  codeblock_opened = False
+  current_section = None
+  for line in content.split('\n'):
+    if line.startswith("```"):
+      codeblock_opened = (not codeblock_opened)
+    if not codeblock_opened:
+      match = re.match(r'# (.*)$', line)
+      if match:
+        current_section = match.group(1).strip().lower()
+        line = re.sub(r'# (.*)$', r'__\1__\n', line)
+      if current_section in ('arguments', 'parameters'):
+        style = r'- __\1__:\3'
+      elif current_section in ('attributes', 'members', 'raises'):
+        style = r'- `\1`:\3'
+      elif current_section in ('returns',):
+        style = r'`\1`:\3'
+      else:
+        style = None
+      if style:
+        line = re.sub(r'\s*([^\\:]+)(\s*\(.+\))?:(.*)$', style, line)
+    lines.append(line)
+
+  def handler(match):
+    ref = match.group('ref')
+    parens = match.group('parens') or ''
+    suffix = match.group('suffix') or ''
+    has_trailing_dot = False
+    if not parens and not suffix and ref.endswith('.'):
+      ref = ref[:-1]
+      has_trailing_dot = True
+    if match.group('keep'):
+      ref = '.'.join(ref.split('.')[-int(match.group('keep')[:-1] or 1):])
+    result = '`{}`'.format(ref + parens) + suffix
+    if has_trailing_dot:
+      result += '.'
+    return (match.group('prefix') or '') + result
+  return re.sub(r'(?P<prefix>^| |\t)#(?:::|(?P<keep>\d*~))?(?P<ref>[\w\d\._]+)'
+                r'(?P<parens>\(\))?(?:#(?P<suffix>\w+))?',
+                handler, '\n'.join(lines))
+
+
+def preprocess(preprocessor, content):
+  section = Section(None, content=content)
+  preprocessor.preprocess_section(section)
+  return section.content
+
+
+def test_preprocess_section(preprocessor):
+  content = '\n'.join([
+    'Does #things with #Foo.bar(). See #Foo.',
+    '',
+    '# Arguments',
+    'a (int): The first argument.',
+    'b: The second argument.',
+    '',
+    '# Returns',
+    'str: A string.',
+    '',
+    '```python',
+    '# Arguments',
+    'c: not an argument',
+    '```',
+  ])
+  assert preprocess(preprocessor, content) == '\n'.join([
+    'Does `things` with `Foo.bar()`. See `Foo`.',
+    '',
+    '__Arguments__',
+    '',
+    '- __a (int)__: The first argument.',
+    '- __b__: The second argument.',
+    '',
+    '__Returns__',
+    '',
+    '`str`: A string.',
+    '',
+    '```python',
+    '# Arguments',
+    'c: not an argument',
+    '```',
+  ])
+
+
+@pytest.mark.parametrize('line', [
+  'a: b', '  a: b', ' : b', 'a (int): b', 'a\\b: c', 'a (b\\c): d', ' (x): y',
+  'a (b: c', 'no colon', 'a (b) c', '\\: x', '(x):', 'x ( y ):z):w',
+])
+def test_match_declaration(line):
+  match = re.search(r'\s*([^\\:]+)(\s*\(.+\))?:(.*)$', line)
+  expected = (match.start(), match.group(1), match.group(3)) if match else None
+  assert match_declaration(line) == expected
+
+
+def test_fuzz_against_reference(preprocessor):
+  tokens = ['#', '# ', ' ', '\t', ':', '\\', '(', ')', '()', '):', 'a', 'b.', '_',
+            '1', 'é', ' ', '`', '```', '\n', '# Arguments\n',
+            '# Returns\n', '# Raises\n', '# Members\n', 'x (int): y\n']
+  rng = random.Random(42)
+  for _ in range(20000):
+    content = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 30)))
+    assert preprocess(preprocessor, content) == reference_preprocess(content), content
+
+
+@pytest.mark.parametrize('pattern', ['a', ' (a)', '(', 'a (', 'a (b) ', 'a\\', '#a '])
+def test_benchmark_pathological_lines(preprocessor, pattern):
+  # The reference implementation needs several seconds for a few thousand
+  # characters of these patterns. We must scale linearly.
+  def measure(length):
+    content = '# Arguments\n' + pattern * (length // len(pattern))
+    start = time.perf_counter()
+    preprocess(preprocessor, content)
+    return time.perf_counter() - start
+
+  measure(1000)  # warm up
+  small, large = min(measure(20000) for _ in range(3)), min(measure(200000) for _ in range(3))
+  assert large < 1.0
+  assert large < 40 * max(small, 1e-4)
+
+
+@pytest.fixture
+def index():
+  index = Index()
+  api = index.new_document('api/mod.md')
+  for identifier in ['pkg.mod', 'pkg.mod.Signal', 'pkg.mod.Signal.emit', 'pkg.mod.connect']:
+    index.new_section(api, identifier)
+  other = index.new_document('other.md')
+  index.new_section(other, 'pkg.other.Foo')
+  return index
+
+
+@pytest.mark.parametrize('content,expected', [
+  ('See #Signal.emit().', 'See [`Signal.emit()`](#pkg.mod.Signal.emit).'),
+  ('See #emit and #connect()', 'See [`emit`](#pkg.mod.Signal.emit) and [`connect()`](#pkg.mod.connect)'),
+  ('All #Signal#s.', 'All [`Signal`s](#pkg.mod.Signal).'),
+  ('Use #::pkg.other.Foo', 'Use [`pkg.other.Foo`](../other.md#pkg.other.Foo)'),
+  ('Use #~pkg.other.Foo', 'Use [`Foo`](../other.md#pkg.other.Foo)'),
+  ('Use #2~pkg.mod.Signal.emit()', 'Use [`Signal.emit()`](#pkg.mod.Signal.emit)'),
+  ('Not #::Signal or #Bar.', 'Not `Signal` or `Bar`.'),
+])
+def test_link_references(preprocessor, index, content, expected):
+  section = index.new_section(index.documents['api/mod.md'], 'pkg.mod.Signal.fire', content=content)
+  preprocessor.preprocess_section(section)
+  assert section.content == expected
+
+
+class UpperCase(object):
+  """ A preprocessor without preprocess_lines(). """
+
+  def __init__(self, config):
+    pass
+
+  def preprocess_section(self, section):
+    section.content = section.content.upper()
+
+
+def test_preprocessor_chain():
+  content = 'Calls #foo().\n\n:param a: The #bar.\n:return: Nothing.'
+  expected = Section(None)
+  expected.content = content
+  RestructuredTextPreprocessor(None).preprocess_section(expected)
+  Preprocessor(None).preprocess_section(expected)
+  UpperCase(None).preprocess_section(expected)
+
+  config = {'preprocessor': ['pydocmd.restructuredtext.Preprocessor',
+                             'pydocmd.preprocessor.Preprocessor',
+                             __name__ + '.UpperCase']}
+  chain = load_preprocessor(config)
+  assert isinstance(chain, PreprocessorChain)
+  sections = [Section(None) for i in range(3)]
+  for section in sections:
+    section.content = content
+  preprocess_sections(chain, sections)
+  assert [s.content for s in sections] == [expected.content] * 3
+  assert '**ARGUMENTS**' in expected.content and '`BAR`' in expected.content
+
+  assert isinstance(load_preprocessor({'preprocessor': 'pydocmd.preprocessor.Preprocessor'}), Preprocessor)
+  assert isinstance(load_preprocessor({'preprocessor': ['pydocmd.preprocessor.Preprocessor']}), Preprocessor)
+
+
+def test_preprocessor_memo(index):
+  calls = []
+
+  class Counting(Preprocessor):
+    def preprocess_section(self, section):
+      calls.append(section.content)
+      Preprocessor.preprocess_section(self, section)
+
+  memo = load_preprocessor({'preprocessor': 'pydocmd.preprocessor.Preprocessor',
+                            'preprocess_memo': 2})
+  assert isinstance(memo, PreprocessorMemo)
+  memo.preproc = Counting(None)
+  doc = index.documents['api/mod.md']
+  contents = ['# Returns\nint: The value.', 'See base class.', '# Returns\nint: The value.',
+              'Other.', 'Third.', 'See base class.', 'See #emit().', 'See #emit().']
+  sections = [index.new_section(doc, 'pkg.mod.Signal.m{}'.format(i), content=c)
+              for i, c in enumerate(contents)]
+  preprocess_sections(memo, sections)
+
+  assert sections[0].content == sections[2].content == '__Returns__\n\n`int`: The value.'
+  # The size of 2 evicted "See base class." before it came up again, and
+  # the references are resolved for every section.
+  assert (memo.hits, memo.misses) == (1, 5)
+  assert len(calls) == 7
+  assert sections[6].content == 'See [`emit()`](#pkg.mod.Signal.emit).'
+  assert memo.summary() == 'Preprocessor memo: 1 hits, 5 misses (17% hit rate)'
@@ -53,3 +53,71 @@ def test_preprocess_section(preprocessor, section):
 
   preprocessor.preprocess_section(section)
   assert section.content == expected
+
+
+def test_preprocess_typed_fields(preprocessor, section):
+  section.content = '\n'.join([
+    'Adds *a* and *b*.',
+    ':unknown x: Stays as it is.',
+    '',
+    ':param a: The first number.',
+    ':type a: int',
+    ':param float b: The second number.',
+    ':keyword scale: Multiplies the result.',
+    ':ivar total: The last result.',
+    ':vartype total: float',
+    ':rtype: float',
+  ])
+
+  preprocessor.preprocess_section(section)
+  assert section.content == '\n'.join([
+    'Adds *a* and *b*.',
+    ':unknown x: Stays as it is.',
+    '',
+    '**Arguments**:',
+    '',
+    '- `a` (`int`): The first number.',
+    '- `b` (`float`): The second number.',
+    '',
+    '**Keyword Arguments**:',
+    '',
+    '- `scale`: Multiplies the result.',
+    '',
+    '**Attributes**:',
+    '',
+    '- `total` (`float`): The last result.',
+    '',
+    '**Returns**:',
+    '',
+    '`float`',
+  ])
+
+
+def test_type_continuation_lines(preprocessor, section):
+  section.content = '\n'.join([
+    ':param a: The first number.',
+    ':type a: int or',
+    '  float',
+    ':returns: The sum.',
+    ':rtype: a very long',
+    '  type name',
+  ])
+
+  preprocessor.preprocess_section(section)
+  assert section.content == '\n'.join([
+    '**Arguments**:',
+    '',
+    '- `a` (`int or float`): The first number.',
+    '',
+    '**Returns**:',
+    '',
+    '`a very long type name`: The sum.',
+  ])
+
+
+def test_other_styles_are_untouched(preprocessor, section):
+  content = 'Args:\n  x: A `:param:` like text.\n\n    indented code'
+  section.content = content
+  preprocessor.preprocess_section(section)
+  assert section.content == content
+  assert preprocessor.preprocess_lines(content.split('\n')) == content.split('\n')
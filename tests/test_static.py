@@ -0,0 +1,55 @@
+import pytest
+
+from pydocmd.document import Section
+from pydocmd.loader import PythonLoader, StaticLoader
+
+
+@pytest.fixture
+def static_loader():
+  return StaticLoader({})
+
+
+@pytest.fixture
+def python_loader():
+  return PythonLoader({})
+
+
+@pytest.mark.parametrize('identifier', [
+  'testmodule',
+  'testmodule.mycoolfunction',
+  'testmodule.Breakfast',
+  'testmodule.Breakfast.cook',
+  'testmodule.Breakfast.price',
+  'testmodule.ClassWithoutDocs.a_classmethod',
+  'testmodule.ClassWithoutDocs.a_staticmethod',
+  'pydocmd.loader.PythonLoader.load_section',
+])
+def test_load_section_matches_python_loader(static_loader, python_loader, identifier):
+  expected = Section(None, identifier)
+  python_loader.load_section(expected)
+  section = Section(None, identifier)
+  static_loader.load_section(section)
+  assert section.title == expected.title
+  assert section.content == expected.content
+
+
+@pytest.mark.parametrize('name', ['testmodule.Breakfast', 'testmodule.ClassWithoutDocs',
+                                  'pydocmd.document', 'pydocmd.imp'])
+@pytest.mark.parametrize('sort_order', ['line', 'name'])
+def test_dir_object_matches_python_loader(static_loader, python_loader, name, sort_order):
+  assert static_loader.dir_object(name, sort_order) == \
+    python_loader.dir_object(name, sort_order)
+
+
+def test_module_members_without_import(static_loader):
+  # Instances like `testmodule.b` can not be detected from the source.
+  members = static_loader.dir_object('testmodule', 'line')
+  assert members == ['function_with_docstring_on_same_line', 'mycoolfunction',
+                     'myothercoolfunction', 'add', 'Breakfast', 'rest_function',
+                     'ClassWithoutDocs']
+
+
+def test_resolve_follows_imports(static_loader):
+  obj, scope = static_loader.importer.resolve('pydocmd.loader.import_object_with_scope')
+  assert obj.qualname == 'pydocmd.imp.import_object_with_scope'
+  assert obj.filename.endswith('imp.py')
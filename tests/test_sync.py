@@ -0,0 +1,62 @@
+import os
+import stat
+import threading
+
+import pytest
+
+from pydocmd.sync import prune_directory, sync_file, sync_files, write_file_if_changed
+
+
+@pytest.mark.parametrize('mode', ['copy', 'hardlink', 'symlink'])
+def test_sync_file_only_updates_changed_files(tmpdir, mode):
+  src = tmpdir.join('src.md')
+  src.write('Hello')
+  dst = str(tmpdir.join('dst.md'))
+  assert sync_file(str(src), dst, mode)
+  assert not sync_file(str(src), dst, mode)
+  src.write('Hello World')
+  if mode == 'copy':
+    assert sync_file(str(src), dst, mode)
+  assert open(dst).read() == 'Hello World'
+
+
+def test_sync_file_never_writes_through_hardlinks(tmpdir):
+  src = tmpdir.join('src.md')
+  src.write('Source')
+  dst = str(tmpdir.join('dst.md'))
+  sync_file(str(src), dst, 'hardlink')
+  other = tmpdir.join('other.md')
+  other.write('Other')
+  sync_file(str(other), dst, 'copy')
+  assert src.read() == 'Source'
+  assert open(dst).read() == 'Other'
+
+
+def test_sync_files_and_prune(tmpdir):
+  sources = tmpdir.mkdir('sources')
+  pairs = []
+  for i in range(100):
+    sources.join('{}.md'.format(i)).write(str(i))
+    pairs.append((str(sources.join('{}.md'.format(i))), str(tmpdir.join('gens', 'sub', '{}.md'.format(i)))))
+  assert sync_files(pairs, jobs=4) == 100
+  assert sync_files(pairs, jobs=4) == 0
+  tmpdir.join('gens', 'stale', 'old.md').ensure().write('old')
+  keep = [os.path.join('sub', '{}.md'.format(i)) for i in range(100)]
+  assert prune_directory(str(tmpdir.join('gens')), keep) == [os.path.join('stale', 'old.md')]
+  assert not tmpdir.join('gens', 'stale').check()
+
+
+def test_concurrent_writes_of_the_same_file(tmpdir):
+  filename = str(tmpdir.join('doc.md'))
+  contents = [str(i) * 100000 for i in range(8)]
+  threads = [threading.Thread(target=write_file_if_changed, args=(filename, c))
+             for c in contents]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert open(filename).read() in contents
+  assert os.listdir(str(tmpdir)) == ['doc.md']
+  umask = os.umask(0)
+  os.umask(umask)
+  assert stat.S_IMODE(os.stat(filename).st_mode) == 0o666 & ~umask
@@ -0,0 +1,76 @@
+import io
+import json
+
+import pytest
+
+from pydocmd import trace
+from pydocmd.build import generate_sections
+from pydocmd.document import Index
+from pydocmd.loader import PythonLoader
+from pydocmd.preprocessor import Preprocessor
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+  tracer = trace.Tracer()
+  tracer.enable()
+  monkeypatch.setattr(trace, 'tracer', tracer)
+  return tracer
+
+
+def test_disabled_tracer_records_nothing():
+  tracer = trace.Tracer()
+  with tracer.span('load', 'x'):
+    pass
+  assert tracer.events == []
+
+
+def test_trace_sections(tracer, monkeypatch, tmpdir):
+  # The build modules use the tracer through pydocmd.trace.span().
+  monkeypatch.setattr('pydocmd.build.span', tracer.span)
+  index = Index()
+  doc = index.new_document('test.md')
+  sections = [index.new_section(doc, 'testmodule.add'),
+              index.new_section(doc, 'testmodule.Breakfast')]
+  progress = trace.Progress(2)
+  generate_sections(sections, PythonLoader({}), Preprocessor({}), progress)
+  assert progress.done == 2
+
+  filename = str(tmpdir.join('trace.json'))
+  tracer.save(filename)
+  with open(filename) as fp:
+    events = json.load(fp)['traceEvents']
+  assert [(e['cat'], e['name'], e['ph']) for e in events] == [
+    ('load', 'testmodule.add', 'X'), ('preprocess', 'testmodule.add', 'X'),
+    ('load', 'testmodule.Breakfast', 'X'), ('preprocess', 'testmodule.Breakfast', 'X')]
+  assert all(e['dur'] >= 0 and e['ts'] >= 0 for e in events)
+
+
+def test_print_timings(tracer):
+  tracer.add('import', 'pkg.slow', tracer.epoch, 2.0)
+  tracer.add('load', 'pkg.slow.Class.method', tracer.epoch, 0.5)
+  tracer.add('preprocess', 'pkg.slow.Class.method', tracer.epoch, 0.25)
+  tracer.add('load', 'pkg.fast.function', tracer.epoch, 0.1)
+  stream = io.StringIO()
+  trace.print_timings(1, stream)
+  assert stream.getvalue().split('\n') == [
+    'Slowest sections:',
+    '      0.750s  pkg.slow.Class.method',
+    'Slowest modules:',
+    '      2.750s  pkg.slow (import 2.000s, 1 sections 0.750s)',
+    '',
+  ]
+
+
+def test_progress_line():
+  class Terminal(io.StringIO):
+    def isatty(self):
+      return True
+  stream = Terminal()
+  progress = trace.Progress(3, 'sections', stream)
+  progress.interval = 0
+  for _ in range(3):
+    progress.update()
+  progress.close()
+  assert '[3/3]' in stream.getvalue()
+  assert 'sections/s, ETA 0s' in stream.getvalue()
@@ -0,0 +1,78 @@
+import sys
+
+import pytest
+
+from pydocmd.__main__ import default_config
+from pydocmd.build import add_sections, generate_sections
+from pydocmd.document import Index
+from pydocmd.imp import import_object
+from pydocmd.watch import PollingObserver, Watcher
+
+
+@pytest.fixture
+def package(tmpdir, monkeypatch):
+  tmpdir.join('watchmod_a.py').write('def foo():\n  "Foo."\n')
+  tmpdir.join('watchmod_b.py').write('def bar():\n  "Bar."\n')
+  monkeypatch.syspath_prepend(str(tmpdir))
+  yield tmpdir
+  for name in ('watchmod_a', 'watchmod_b'):
+    sys.modules.pop(name, None)
+
+
+@pytest.mark.parametrize('loader', ['pydocmd.loader.PythonLoader', 'pydocmd.loader.StaticLoader'])
+def test_watcher_regenerates_affected_documents(package, loader):
+  config = default_config({'loader': loader})
+  pages = {'a.md': ['watchmod_a+'], 'b.md': ['watchmod_b+']}
+  index = Index()
+  loader = import_object(config['loader'])(config)
+  preproc = import_object(config['preprocessor'])(config)
+  for fname in sorted(pages):
+    add_sections(index, index.new_document(fname), pages[fname], loader, config)
+  generate_sections(list(index.sections.values()), loader, preproc)
+
+  written = []
+  watcher = Watcher(config, index, pages, lambda fname, doc: written.append(fname),
+                    log=lambda *a: None)
+  filename = str(package.join('watchmod_a.py'))
+  assert watcher.sources['watchmod_a.foo'] == filename
+
+  package.join('watchmod_a.py').write('def foo():\n  "New foo."\n\ndef baz():\n  "Baz."\n')
+  watcher.regenerate({filename})
+  assert written == ['a.md']
+  assert 'New foo.' in index.sections['watchmod_a.foo'].content
+  assert 'watchmod_a.baz' in index.sections
+  assert index.sections['watchmod_b.bar'].content.endswith('Bar.')
+
+
+def test_failed_regeneration_restores_the_index(package):
+  config = default_config({})
+  pages = {'a.md': ['watchmod_a+']}
+  index = Index()
+  loader = import_object(config['loader'])(config)
+  add_sections(index, index.new_document('a.md'), pages['a.md'], loader, config)
+  generate_sections(list(index.sections.values()), loader, import_object(config['preprocessor'])(config))
+  objects = dict(index.objects)
+  assert objects
+
+  class Failing(object):
+    def preprocess_section(self, section):
+      raise RuntimeError('failed')
+
+  watcher = Watcher(config, index, pages, lambda fname, doc: None, log=lambda *a: None)
+  watcher.preproc = Failing()
+  package.join('watchmod_a.py').write('def foo():\n  "New foo."\n')
+  with pytest.raises(RuntimeError):
+    watcher.regenerate_document('a.md', {str(package.join('watchmod_a.py'))})
+  assert index.objects == objects
+
+
+def test_polling_observer(tmpdir):
+  filename = str(tmpdir.join('file.py'))
+  with open(filename, 'w') as fp:
+    fp.write('a')
+  observer = PollingObserver(interval=0.01)
+  observer.set_files([filename])
+  assert observer.wait(timeout=0.05) == set()
+  with open(filename, 'w') as fp:
+    fp.write('ab')
+  assert observer.wait(timeout=1) == {filename}